@@ -2,13 +2,120 @@
 Agent Lambda Function
 기능:
 1. General Chat (일반 대화)
-2. Deployment Analysis (정적/동적 배포 판단)
+2. Deployment Analysis (정적/동적 배포 판단, 모노레포 일괄 판단)
 3. Cost Estimation (기존: 비용 견적)
+4. Cost Batch (가격 매트릭스 기반 다중 시나리오 견적)
 """
 import json
-import boto3
 import os
-from typing import Dict, Any, List, Optional
+import time
+import threading
+import hashlib
+import random
+import re
+import uuid
+import tomllib
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple, Callable, Union
+from xml.etree import ElementTree
+
+# =============================================================================
+# 0. AWS Client Registry (warm invocation 간 클라이언트/커넥션 풀 재사용)
+# =============================================================================
+# boto3/botocore는 import 비용이 크므로 첫 클라이언트 생성 시점에 로드
+AWS_REGION = os.environ.get('AWS_DEFAULT_REGION', 'ap-northeast-2')
+AWS_CLIENT_MAX_POOL = int(os.environ.get('AWS_CLIENT_MAX_POOL', '16'))
+
+# 서비스별 botocore Config 옵션 (미지정 서비스는 'default')
+CLIENT_CONFIG_OPTIONS = {
+    'default': {
+        'connect_timeout': 5,
+        'read_timeout': 30,
+        'retries': {'mode': 'standard', 'max_attempts': 3}
+    },
+    # LLM 응답 생성 시간이 길어 read_timeout을 넉넉하게
+    # 스로틀링 재시도는 BedrockAgent의 명시적 정책(BEDROCK_RETRY_*)이 담당하므로 botocore 재시도는 끔
+    'bedrock-runtime': {
+        'connect_timeout': 5,
+        'read_timeout': 120,
+        'retries': {'mode': 'standard', 'total_max_attempts': 1}
+    },
+    # 스트리밍 push는 지연에 민감하므로 짧게 실패
+    'apigatewaymanagementapi': {
+        'connect_timeout': 2,
+        'read_timeout': 5,
+        'retries': {'mode': 'standard', 'max_attempts': 2}
+    }
+}
+
+_aws_clients: Dict[Tuple[str, str, Optional[str], Optional[str]], Any] = {}
+_aws_clients_lock = threading.Lock()
+
+def _client_config(service_name: str):
+    from botocore.config import Config
+    options = CLIENT_CONFIG_OPTIONS.get(service_name, CLIENT_CONFIG_OPTIONS['default'])
+    return Config(max_pool_connections=AWS_CLIENT_MAX_POOL, **options)
+
+def _get_or_create(kind: str, service_name: str, region_name: Optional[str], endpoint_url: Optional[str]):
+    region = region_name or AWS_REGION
+    key = (kind, service_name, region, endpoint_url)
+    client = _aws_clients.get(key)
+    if client is None:
+        # 기본 boto3 세션은 스레드 안전하지 않으므로 생성 구간만 잠금
+        with _aws_clients_lock:
+            client = _aws_clients.get(key)
+            if client is None:
+                import boto3
+                factory = boto3.client if kind == 'client' else boto3.resource
+                client = factory(
+                    service_name,
+                    region_name=region,
+                    endpoint_url=endpoint_url,
+                    config=_client_config(service_name)
+                )
+                _aws_clients[key] = client
+    return client
+
+def get_client(service_name: str, region_name: Optional[str] = None, endpoint_url: Optional[str] = None):
+    """지연 생성 + 캐시된 boto3 클라이언트 반환"""
+    return _get_or_create('client', service_name, region_name, endpoint_url)
+
+def get_resource(service_name: str, region_name: Optional[str] = None):
+    """지연 생성 + 캐시된 boto3 리소스 반환"""
+    return _get_or_create('resource', service_name, region_name, None)
+
+# =============================================================================
+# 0-1. Metrics (CloudWatch Embedded Metric Format)
+# =============================================================================
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'Haifu/Agent')
+
+# 프로세스 수명 동안의 deployment_check 누적 통계 (LLM 생략 비율 계산용)
+analysis_stats = {'requests': 0, 'llm_skipped': 0}
+_analysis_stats_lock = threading.Lock()
+
+def emit_metrics(metrics: Dict[str, float], dimensions: Dict[str, str],
+                 properties: Optional[Dict[str, Any]] = None, unit: str = 'None'):
+    """
+    EMF 형식 로그 한 줄 출력 -> CloudWatch가 메트릭으로 추출
+    (Lambda 로거 접두어가 붙지 않도록 print 사용)
+    """
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [list(dimensions.keys())],
+                'Metrics': [{'Name': name, 'Unit': unit} for name in metrics]
+            }]
+        },
+        **dimensions,
+        **(properties or {}),
+        **metrics
+    }
+    print(json.dumps(record))
 
 # =============================================================================
 # AWS App Runner 스펙 상수 및 가격 정보
@@ -17,6 +124,19 @@ RUNTIMES = [
     "PYTHON_3", "NODEJS_16", "NODEJS_18", "NODEJS_20",
     "JAVA_11", "JAVA_17", "DOTNET_6", "GO_1", "PHP_81", "RUBY_31"
 ]
+# RUNTIMES -> App Runner runtime 형식
+RUNTIME_TO_APPRUNNER = {
+    'PYTHON_3': 'python3.11',
+    'NODEJS_16': 'nodejs16',
+    'NODEJS_18': 'nodejs18',
+    'NODEJS_20': 'nodejs20',
+    'JAVA_11': 'java11',
+    'JAVA_17': 'java17',
+    'GO_1': 'go1.21',
+    'DOTNET_6': 'dotnet6',
+    'PHP_81': 'php81',
+    'RUBY_31': 'ruby31'
+}
 CPU_OPTIONS = ["1 vCPU", "2 vCPU", "4 vCPU"]
 MEMORY_OPTIONS = ["2 GB", "3 GB", "4 GB", "6 GB", "8 GB", "10 GB", "12 GB"]
 CPU_MEMORY_COMBINATIONS = {
@@ -30,37 +150,97 @@ PRICE_PER_VCPU_HOUR = 0.064   # USD
 PRICE_PER_GB_HOUR = 0.007     # USD
 HOURS_PER_MONTH = 730         # 월 평균 시간
 
+# 데이터 전송 / 빌드 비용 가정
+# medium traffic = 월 100GB 아웃바운드 (첫 100GB 무료, 이후 $0.09/GB)
+BASE_OUTBOUND_GB = 100
+FREE_OUTBOUND_GB = 100
+PRICE_PER_OUTBOUND_GB = 0.09
+# 월 1-2회 배포 가정: 평균 10분 빌드 * 2회 = 20분, 분당 $0.005
+BUILD_MINUTES_PER_MONTH = 20
+PRICE_PER_BUILD_MINUTE = 0.005
+BUILD_COST = BUILD_MINUTES_PER_MONTH * PRICE_PER_BUILD_MINUTE
+
+# =============================================================================
+# 가격 매트릭스 (import 시 1회 계산)
+# CPU_MEMORY_COMBINATIONS x 가동률 버킷 x 트래픽 버킷의 월 총비용을
+# 평탄화된 double 배열(array('d'))에 저장: index = (spec * U + uptime) * T + traffic
+# =============================================================================
+UPTIME_BUCKETS = tuple(float(u) for u in range(0, 101, 5))           # 0, 5, ..., 100 (%)
+TRAFFIC_BUCKETS = (0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)   # traffic_multiplier
+COST_BATCH_MAX_SCENARIOS = int(os.environ.get('COST_BATCH_MAX_SCENARIOS', '2000'))
+
+SPEC_KEYS: List[Tuple[str, str]] = [
+    (cpu_label, mem_label)
+    for cpu_label, memory_list in CPU_MEMORY_COMBINATIONS.items()
+    for mem_label in memory_list
+]
+SPEC_INDEX: Dict[Tuple[str, str], int] = {spec: i for i, spec in enumerate(SPEC_KEYS)}
+_UPTIME_INDEX = {u: i for i, u in enumerate(UPTIME_BUCKETS)}
+_TRAFFIC_INDEX = {t: i for i, t in enumerate(TRAFFIC_BUCKETS)}
+
+def _hourly_compute_cost(cpu: str, memory: str) -> float:
+    # "1 vCPU" -> 1.0, "2 GB" -> 2.0 (숫자 추출)
+    cpu_val = float(cpu.split()[0])
+    mem_val = float(memory.split()[0])
+    return (cpu_val * PRICE_PER_VCPU_HOUR) + (mem_val * PRICE_PER_GB_HOUR)
+
+def _data_transfer_cost(traffic_multiplier: float) -> float:
+    outbound_gb = BASE_OUTBOUND_GB * traffic_multiplier
+    return max(0, (outbound_gb - FREE_OUTBOUND_GB) * PRICE_PER_OUTBOUND_GB)
+
+def _monthly_compute_cost(hourly_cost: float, uptime_percentage: float) -> float:
+    return hourly_cost * HOURS_PER_MONTH * (uptime_percentage / 100.0)
+
+SPEC_HOURLY_COST = array('d', (_hourly_compute_cost(cpu, mem) for cpu, mem in SPEC_KEYS))
+TRAFFIC_BUCKET_COST = array('d', (_data_transfer_cost(t) for t in TRAFFIC_BUCKETS))
+PRICE_MATRIX = array('d', (
+    _monthly_compute_cost(hourly, uptime) + TRAFFIC_BUCKET_COST[t] + BUILD_COST
+    for hourly in SPEC_HOURLY_COST
+    for uptime in UPTIME_BUCKETS
+    for t in range(len(TRAFFIC_BUCKETS))
+))
+
+def quote_app_runner_cost(cpu: str, memory: str, uptime_percentage: float = 100.0,
+                          traffic_multiplier: float = 1.0) -> Tuple[float, float, float, float]:
+    """
+    (compute, data_transfer, build, total) 월 비용 반환 (반올림 전)
+    버킷에 정확히 일치하면 매트릭스 조회, 아니면 같은 식으로 직접 계산
+    """
+    spec = SPEC_INDEX.get((cpu, memory))
+    hourly = SPEC_HOURLY_COST[spec] if spec is not None else _hourly_compute_cost(cpu, memory)
+    compute = _monthly_compute_cost(hourly, uptime_percentage)
+
+    t = _TRAFFIC_INDEX.get(traffic_multiplier)
+    data_transfer = TRAFFIC_BUCKET_COST[t] if t is not None else _data_transfer_cost(traffic_multiplier)
+
+    u = _UPTIME_INDEX.get(uptime_percentage)
+    if spec is not None and u is not None and t is not None:
+        total = PRICE_MATRIX[(spec * len(UPTIME_BUCKETS) + u) * len(TRAFFIC_BUCKETS) + t]
+    else:
+        total = compute + data_transfer + BUILD_COST
+    return compute, data_transfer, BUILD_COST, total
+
+def _build_app_runner_price_table() -> Dict[str, Dict[str, Dict[str, float]]]:
+    price_table: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for (cpu_label, mem_label), hourly_cost in zip(SPEC_KEYS, SPEC_HOURLY_COST):
+        price_table.setdefault(cpu_label, {})[mem_label] = {
+            "hourly_usd": round(hourly_cost, 4),
+            # 월간 비용 계산 (24/7 가동 기준)
+            "monthly_usd": round(hourly_cost * HOURS_PER_MONTH, 2)
+        }
+    return price_table
+
+APP_RUNNER_PRICE_TABLE = _build_app_runner_price_table()
+
 def get_app_runner_price_table():
     """
     제시된 CPU_MEMORY_COMBINATIONS에 대한 월별 예상 비용 테이블 생성
     기준: AWS App Runner (Seoul Region, ap-northeast-2)
     가정: 24시간/30일(730시간) 내내 활성(Active) 상태로 구동 시
+    (import 시 계산된 테이블의 복사본 반환)
     """
-    price_table = {}
-    
-    for cpu_label, memory_list in CPU_MEMORY_COMBINATIONS.items():
-        # "1 vCPU" -> 1.0 (숫자 추출)
-        cpu_val = float(cpu_label.split()[0])
-        
-        price_table[cpu_label] = {}
-        
-        for mem_label in memory_list:
-            # "2 GB" -> 2.0 (숫자 추출)
-            mem_val = float(mem_label.split()[0])
-            
-            # 시간당 비용 계산
-            hourly_cost = (cpu_val * PRICE_PER_VCPU_HOUR) + (mem_val * PRICE_PER_GB_HOUR)
-            
-            # 월간 비용 계산 (24/7 가동 기준)
-            monthly_cost = hourly_cost * HOURS_PER_MONTH
-            
-            # 결과 저장 (소수점 둘째자리까지)
-            price_table[cpu_label][mem_label] = {
-                "hourly_usd": round(hourly_cost, 4),
-                "monthly_usd": round(monthly_cost, 2)
-            }
-            
-    return price_table
+    return {cpu: {mem: dict(price) for mem, price in mems.items()}
+            for cpu, mems in APP_RUNNER_PRICE_TABLE.items()}
 
 def calculate_app_runner_cost(cpu: str, memory: str, uptime_percentage: float = 100.0, traffic_multiplier: float = 1.0) -> Dict[str, Any]:
     """
@@ -75,37 +255,19 @@ def calculate_app_runner_cost(cpu: str, memory: str, uptime_percentage: float =
     Returns:
         상세 비용 정보
     """
-    # CPU, Memory 숫자 추출
-    cpu_val = float(cpu.split()[0])
-    mem_val = float(memory.split()[0])
-    
-    # 시간당 컴퓨트 비용
-    hourly_compute_cost = (cpu_val * PRICE_PER_VCPU_HOUR) + (mem_val * PRICE_PER_GB_HOUR)
-    
-    # 월간 컴퓨트 비용 (가동률 반영)
-    monthly_compute_cost = hourly_compute_cost * HOURS_PER_MONTH * (uptime_percentage / 100.0)
-    
-    # 데이터 전송 비용 추정 (트래픽에 따라)
-    # 가정: medium traffic = 월 100GB 아웃바운드 (첫 100GB 무료, 이후 $0.09/GB)
-    outbound_gb = 100 * traffic_multiplier
-    data_transfer_cost = max(0, (outbound_gb - 100) * 0.09)
-    
-    # 빌드 비용 (월 1-2회 배포 가정, 분당 $0.005)
-    # 평균 10분 빌드 * 2회 = 20분
-    build_cost = 20 * 0.005
-    
-    # 총 비용
-    total_monthly_cost = monthly_compute_cost + data_transfer_cost + build_cost
+    compute, data_transfer, build, total = quote_app_runner_cost(
+        cpu, memory, uptime_percentage, traffic_multiplier
+    )
     
     return {
         "service": "app_runner",
         "cpu": cpu,
         "memory": memory,
-        "estimated_monthly_cost_usd": round(total_monthly_cost, 2),
+        "estimated_monthly_cost_usd": round(total, 2),
         "breakdown": {
-            "compute": round(monthly_compute_cost, 2),
-            "data_transfer": round(data_transfer_cost, 2),
-            "build": round(build_cost, 2)
+            "compute": round(compute, 2),
+            "data_transfer": round(data_transfer, 2),
+            "build": round(build, 2)
         },
         "pricing_details": {
             "vcpu_price_per_hour": PRICE_PER_VCPU_HOUR,
@@ -116,16 +278,92 @@ def calculate_app_runner_cost(cpu: str, memory: str, uptime_percentage: float =
         }
     }
 
+def quote_cost_batch(scenarios: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    여러 스펙/사용 패턴 시나리오를 한 번에 견적 (LLM 호출 없음)
+    잘못된 시나리오는 전체를 실패시키지 않고 해당 항목에 error만 기록
+    """
+    quotes = []
+    for index, scenario in enumerate(scenarios):
+        cpu = scenario.get('cpu')
+        memory = scenario.get('memory')
+        try:
+            uptime = float(scenario.get('uptime_percentage', 100.0))
+            traffic = float(scenario.get('traffic_multiplier', 1.0))
+        except (TypeError, ValueError):
+            quotes.append({'index': index, 'error': 'uptime_percentage and traffic_multiplier must be numbers'})
+            continue
+
+        # 가격 매트릭스 키는 문자열 - list/dict 값은 조회 시 TypeError가 나므로 먼저 거름
+        if not isinstance(cpu, str) or not isinstance(memory, str):
+            quotes.append({'index': index, 'error': 'cpu and memory must be strings, e.g. "1 vCPU" and "2 GB"'})
+            continue
+        if (cpu, memory) not in SPEC_INDEX:
+            quotes.append({'index': index, 'cpu': cpu, 'memory': memory,
+                           'error': f"Invalid CPU-Memory combination. Allowed: {CPU_MEMORY_COMBINATIONS}"})
+            continue
+        if not 0.0 <= uptime <= 100.0 or traffic < 0:
+            quotes.append({'index': index, 'error': 'uptime_percentage must be 0-100 and traffic_multiplier >= 0'})
+            continue
+
+        compute, data_transfer, build, total = quote_app_runner_cost(cpu, memory, uptime, traffic)
+        quotes.append({
+            'index': index,
+            'cpu': cpu,
+            'memory': memory,
+            'uptime_percentage': uptime,
+            'traffic_multiplier': traffic,
+            'estimated_monthly_cost_usd': round(total, 2),
+            'breakdown': {
+                'compute': round(compute, 2),
+                'data_transfer': round(data_transfer, 2),
+                'build': round(build, 2)
+            }
+        })
+    return quotes
+
+def expand_cost_grid(grid: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    대시보드용 그리드 -> 시나리오 목록
+    {"specs": [{"cpu": "1 vCPU", "memory": "2 GB"}] (생략 시 전체 조합),
+     "uptime_percentages": [...], "traffic_multipliers": [...]}
+    """
+    specs = grid.get('specs') or [{'cpu': cpu, 'memory': mem} for cpu, mem in SPEC_KEYS]
+    uptimes = grid.get('uptime_percentages') or list(UPTIME_BUCKETS)
+    traffics = grid.get('traffic_multipliers') or list(TRAFFIC_BUCKETS)
+    return [
+        {'cpu': spec.get('cpu') if isinstance(spec, dict) else None,
+         'memory': spec.get('memory') if isinstance(spec, dict) else None,
+         'uptime_percentage': uptime, 'traffic_multiplier': traffic}
+        for spec in specs
+        for uptime in uptimes
+        for traffic in traffics
+    ]
+
 # =============================================================================
 # 1. S3 Service (기존 유지)
 # =============================================================================
+IMPORTANT_FILES = {
+    'package.json', 'requirements.txt', 'pyproject.toml',
+    'pom.xml', 'build.gradle', 'go.mod',
+    'Dockerfile', 'docker-compose.yml', 'README.md',
+    'index.html', 'vercel.json', 'next.config.js' # 정적 분석용 추가
+}
+SNAPSHOT_FETCH_WORKERS = int(os.environ.get('SNAPSHOT_FETCH_WORKERS', '8'))
+SNAPSHOT_ETAG_CACHE_SIZE = int(os.environ.get('SNAPSHOT_ETAG_CACHE_SIZE', '512'))
+BATCH_MAX_SNAPSHOTS = int(os.environ.get('BATCH_MAX_SNAPSHOTS', '50'))
+BATCH_ANALYSIS_CONCURRENCY = int(os.environ.get('BATCH_ANALYSIS_CONCURRENCY', '4'))
+
+# (bucket, key) -> (ETag, 디코딩된 내용) : warm invocation 간 유지
+_snapshot_etag_cache: "OrderedDict[Tuple[str, str], Tuple[Optional[str], Optional[str]]]" = OrderedDict()
+
 class S3SnapshotLoader:
     """S3에서 소스 스냅샷 로드"""
-    def __init__(self):
-        self.s3_client = boto3.client(
-            's3',
-            region_name=os.environ.get('S3_REGION', 'ap-northeast-2')
-        )
+    def __init__(self, max_workers: int = SNAPSHOT_FETCH_WORKERS):
+        # 공유 클라이언트의 커넥션 풀(AWS_CLIENT_MAX_POOL)을 넘지 않도록 워커 수 제한
+        self.max_workers = min(max_workers, AWS_CLIENT_MAX_POOL)
+        self.s3_client = get_client('s3', region_name=os.environ.get('S3_REGION', 'ap-northeast-2'))
+        self.last_timings: Dict[str, Any] = {}
     
     def list_files(self, bucket: str, s3_prefix: str, max_files: int = 50) -> List[str]:
         try:
@@ -152,28 +390,241 @@ class S3SnapshotLoader:
             print(f"Error reading S3 file {key}: {e}")
             return None
     
+    def list_objects(self, bucket: str, s3_prefix: str) -> List[Dict[str, Any]]:
+        """prefix 전체를 페이지네이션하여 객체 목록 반환 (디렉터리 마커 제외)"""
+        objects = []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix=s3_prefix):
+            for obj in page.get('Contents', []):
+                if not obj['Key'].endswith('/'):
+                    objects.append(obj)
+        return objects
+
+    @staticmethod
+    def select_manifests(objects: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """중요 파일만 골라 파일명별로 가장 얕은 경로(루트 우선) 하나씩 선택"""
+        selected: Dict[str, Dict[str, Any]] = {}
+        for obj in objects:
+            key = obj['Key']
+            file_name = key.split('/')[-1]
+            if file_name not in IMPORTANT_FILES:
+                continue
+            current = selected.get(file_name)
+            if current is None or (key.count('/'), key) < (current['Key'].count('/'), current['Key']):
+                selected[file_name] = obj
+        return selected
+
+    def _fetch_body(self, bucket: str, key: str, max_size: int = 50000) -> Optional[bytes]:
+        try:
+            response = self.s3_client.get_object(Bucket=bucket, Key=key)
+            return response['Body'].read(max_size)
+        except Exception as e:
+            print(f"Error reading S3 file {key}: {e}")
+            return None
+
+    def fetch_objects(self, bucket: str, objects: List[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        객체들을 병렬로 읽어 디코딩 (key -> 내용)
+        목록의 ETag가 캐시와 같으면 get_object 없이 캐시된 내용을 사용
+        """
+        contents: Dict[str, str] = {}
+        to_fetch: List[Dict[str, Any]] = []
+        etag_hits = 0
+
+        for obj in objects:
+            cached = _snapshot_etag_cache.get((bucket, obj['Key']))
+            if cached and cached[0] == obj.get('ETag'):
+                _snapshot_etag_cache.move_to_end((bucket, obj['Key']))
+                etag_hits += 1
+                if cached[1]:
+                    contents[obj['Key']] = cached[1]
+            else:
+                to_fetch.append(obj)
+
+        fetch_start = time.perf_counter()
+        bodies: Dict[str, Optional[bytes]] = {}
+        if to_fetch:
+            workers = min(self.max_workers, len(to_fetch))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {obj['Key']: executor.submit(self._fetch_body, bucket, obj['Key']) for obj in to_fetch}
+                bodies = {key: future.result() for key, future in futures.items()}
+        fetch_ms = (time.perf_counter() - fetch_start) * 1000
+
+        decode_start = time.perf_counter()
+        for obj in to_fetch:
+            body = bodies.get(obj['Key'])
+            if body is None:
+                continue
+            try:
+                content: Optional[str] = body.decode('utf-8')
+            except UnicodeDecodeError:
+                content = None
+            _snapshot_etag_cache[(bucket, obj['Key'])] = (obj.get('ETag'), content)
+            _snapshot_etag_cache.move_to_end((bucket, obj['Key']))
+            if content:
+                contents[obj['Key']] = content
+        while len(_snapshot_etag_cache) > SNAPSHOT_ETAG_CACHE_SIZE:
+            _snapshot_etag_cache.popitem(last=False)
+        decode_ms = (time.perf_counter() - decode_start) * 1000
+
+        self.last_timings.update({
+            'fetch_ms': round(self.last_timings.get('fetch_ms', 0) + fetch_ms, 1),
+            'decode_ms': round(self.last_timings.get('decode_ms', 0) + decode_ms, 1),
+            'fetched': self.last_timings.get('fetched', 0) + len(to_fetch),
+            'etag_hits': self.last_timings.get('etag_hits', 0) + etag_hits
+        })
+        return contents
+
+    def fetch_manifests(self, bucket: str, manifests: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        """선택된 매니페스트(파일명 -> 객체)를 읽어 파일명 -> 내용으로 반환"""
+        contents = self.fetch_objects(bucket, list(manifests.values()))
+        return {name: contents[obj['Key']] for name, obj in manifests.items() if obj['Key'] in contents}
+
     def load_snapshot(self, bucket: str, s3_prefix: str) -> Dict[str, str]:
-        important_files = [
-            'package.json', 'requirements.txt', 'pyproject.toml',
-            'pom.xml', 'build.gradle', 'go.mod',
-            'Dockerfile', 'docker-compose.yml', 'README.md',
-            'index.html', 'vercel.json', 'next.config.js' # 정적 분석용 추가
-        ]
-        all_files = self.list_files(bucket, s3_prefix)
-        file_contents = {}
-        for file_key in all_files:
-            file_name = file_key.split('/')[-1]
-            if file_name in important_files:
-                content = self.read_file(bucket, file_key)
-                if content:
-                    file_contents[file_name] = content
+        """전체 목록 조회 -> 중요 파일 필터링 -> 병렬 fetch (단계별 소요 시간 기록)"""
+        self.last_timings = {}
+
+        list_start = time.perf_counter()
+        try:
+            objects = self.list_objects(bucket, s3_prefix.rstrip('/') + '/')
+        except Exception as e:
+            print(f"Error listing S3 files: {e}")
+            objects = []
+        self.last_timings['list_ms'] = round((time.perf_counter() - list_start) * 1000, 1)
+
+        manifests = self.select_manifests(objects)
+        self.last_timings.update({'objects_listed': len(objects), 'manifests': len(manifests)})
+
+        file_contents = self.fetch_manifests(bucket, manifests)
+        print(f"Snapshot load timings: {json.dumps(self.last_timings)}")
         return file_contents
 
+# =============================================================================
+# 1-1. Analysis Cache (스냅샷 매니페스트 해시 기반 결과 캐시)
+# =============================================================================
+# 프롬프트 또는 응답 후처리 로직이 바뀌면 버전을 올려 기존 캐시를 일괄 무효화
+ANALYSIS_CACHE_VERSION = "v2"
+ANALYSIS_CACHE_TABLE = os.environ.get('ANALYSIS_CACHE_TABLE', 'analysis-cache')
+ANALYSIS_CACHE_TTL_SECONDS = int(os.environ.get('ANALYSIS_CACHE_TTL_SECONDS', '86400'))
+ANALYSIS_CACHE_LRU_SIZE = int(os.environ.get('ANALYSIS_CACHE_LRU_SIZE', '128'))
+
+class AnalysisCache:
+    """
+    deployment_check 결과 캐시
+    - 1차: 프로세스 내 LRU (warm invocation 간 재사용)
+    - 2차: DynamoDB (TTL 속성 expires_at으로 자동 만료)
+    키: 매니페스트 파일 내용 + 캐시 버전 + 모델 ID의 SHA-256
+    """
+    def __init__(self, table_name: str = ANALYSIS_CACHE_TABLE,
+                 ttl_seconds: int = ANALYSIS_CACHE_TTL_SECONDS,
+                 max_entries: int = ANALYSIS_CACHE_LRU_SIZE):
+        self.table_name = table_name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[str, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+        self._table = None
+        # 일괄 분석(deployment_check_batch)에서 여러 스레드가 공유
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'dynamodb_hits': 0, 'misses': 0, 'writes': 0}
+
+    @staticmethod
+    def make_key(files: Dict[str, str], model_id: str) -> str:
+        """파일명 정렬 후 내용 해시를 누적하여 순서와 무관한 키 생성"""
+        digest = hashlib.sha256(f"{ANALYSIS_CACHE_VERSION}\0{model_id}\0".encode('utf-8'))
+        for name in sorted(files):
+            digest.update(name.encode('utf-8'))
+            digest.update(b'\0')
+            digest.update(hashlib.sha256(files[name].encode('utf-8')).digest())
+        return digest.hexdigest()
+
+    def _get_table(self):
+        if self._table is None:
+            self._table = get_resource('dynamodb').Table(self.table_name)
+        return self._table
+
+    def _remember(self, key: str, value: Dict[str, Any], expires_at: int):
+        with self._lock:
+            self._lru[key] = (expires_at, value)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, key: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """(캐시 값 또는 None, 'memory' | 'dynamodb' | 'miss') 반환"""
+        now = int(time.time())
+
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry and entry[0] <= now:
+                del self._lru[key]
+                entry = None
+            if entry:
+                self._lru.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return entry[1], 'memory'
+
+        try:
+            item = self._get_table().get_item(Key={'cache_key': key}).get('Item')
+        except Exception as e:
+            print(f"Analysis cache read error: {e}")
+            item = None
+
+        # DynamoDB TTL 삭제는 지연될 수 있으므로 expires_at 직접 확인
+        if item and int(item.get('expires_at', 0)) > now:
+            value = json.loads(item['result'])
+            self._remember(key, value, int(item['expires_at']))
+            self._count('dynamodb_hits')
+            return value, 'dynamodb'
+
+        self._count('misses')
+        return None, 'miss'
+
+    def put(self, key: str, value: Dict[str, Any]):
+        expires_at = int(time.time()) + self.ttl_seconds
+        self._remember(key, value, expires_at)
+        try:
+            # float -> Decimal 변환 문제를 피하기 위해 JSON 문자열로 저장
+            self._get_table().put_item(Item={
+                'cache_key': key,
+                'result': json.dumps(value),
+                'cache_version': ANALYSIS_CACHE_VERSION,
+                'expires_at': expires_at,
+                'created_at': datetime.utcnow().isoformat()
+            })
+            self._count('writes')
+        except Exception as e:
+            print(f"Analysis cache write error: {e}")
+
+# warm invocation 간 LRU 유지를 위해 모듈 레벨에서 생성
+analysis_cache = AnalysisCache()
+
 # =============================================================================
 # 2. Repository Analyzer (기존 유지)
 # =============================================================================
+RULE_ENGINE_MIN_CONFIDENCE = float(os.environ.get('RULE_ENGINE_MIN_CONFIDENCE', '0.85'))
+
+# 패키지명 -> framework (scoped 패키지는 이름 마지막 조각이 framework가 아니므로 명시적으로 매핑)
+NODE_SERVER_PACKAGES = {
+    'express': 'express',
+    'fastify': 'fastify',
+    'koa': 'koa',
+    '@nestjs/core': 'nestjs',
+    '@hapi/hapi': 'hapi',
+    'hono': 'hono'
+}
+NODE_SSR_PACKAGES = ['nuxt', '@remix-run/node', '@sveltejs/kit']
+NODE_RUNTIMES = {'16': 'NODEJS_16', '18': 'NODEJS_18', '20': 'NODEJS_20'}
+
 class RepositoryAnalyzer:
-    """Repository 분석"""
+    """
+    Repository 분석
+    매니페스트를 실제 형식대로 파싱(package.json=JSON, pyproject=TOML, pom.xml=XML,
+    go.mod, Dockerfile)하고, 확실한 경우 규칙 기반 배포 설정과 신뢰도를 함께 산출
+    """
     def analyze(self, file_contents: Dict[str, str]) -> Dict[str, Any]:
         result = {
             "framework": "unknown",
@@ -183,62 +634,914 @@ class RepositoryAnalyzer:
             "dependencies": []
         }
         
+        package = self._parse_package_json(file_contents.get("package.json"))
+        python_deps = self._parse_requirements(file_contents.get("requirements.txt"))
+        python_deps += self._parse_pyproject(file_contents.get("pyproject.toml"))
+        pom = self._parse_pom(file_contents.get("pom.xml"))
+        go_mod = self._parse_go_mod(file_contents.get("go.mod"))
+        docker = self._parse_dockerfile(file_contents.get("Dockerfile"))
+        
         # JavaScript/TypeScript
-        if "package.json" in file_contents:
+        if package is not None:
+            deps = self._package_dependencies(package)
+            node_major = self._node_major(package)
             result["language"] = "javascript"
-            pkg = file_contents["package.json"].lower()
-            if "react" in pkg: result.update({"framework": "react", "runtime": "NODEJS_18"})
-            elif "next" in pkg: result.update({"framework": "nextjs", "runtime": "NODEJS_20"})
-            elif "vue" in pkg: result.update({"framework": "vue", "runtime": "NODEJS_18"})
-            elif "express" in pkg: result.update({"framework": "express", "runtime": "NODEJS_18"})
+            result["dependencies"] = sorted(deps)
+            if "next" in deps: result.update({"framework": "nextjs", "runtime": "NODEJS_20"})
+            elif any(p in deps for p in NODE_SSR_PACKAGES): result.update({"framework": "ssr", "runtime": "NODEJS_18"})
+            elif any(p in deps for p in NODE_SERVER_PACKAGES):
+                server = next(p for p in NODE_SERVER_PACKAGES if p in deps)
+                result.update({"framework": NODE_SERVER_PACKAGES[server], "runtime": "NODEJS_18"})
+            elif "react" in deps or "react-scripts" in deps: result.update({"framework": "react", "runtime": "NODEJS_18"})
+            elif "vue" in deps: result.update({"framework": "vue", "runtime": "NODEJS_18"})
+            elif "svelte" in deps: result.update({"framework": "svelte", "runtime": "NODEJS_18"})
             else: result.update({"framework": "nodejs", "runtime": "NODEJS_18"})
+            if node_major:
+                result["runtime"] = NODE_RUNTIMES[node_major]
         
         # Python
-        elif "requirements.txt" in file_contents:
+        elif python_deps:
             result["language"] = "python"
-            req = file_contents["requirements.txt"].lower()
-            if "fastapi" in req: result.update({"framework": "fastapi", "runtime": "PYTHON_3"})
-            elif "django" in req: result.update({"framework": "django", "runtime": "PYTHON_3"})
-            elif "flask" in req: result.update({"framework": "flask", "runtime": "PYTHON_3"})
+            result["dependencies"] = sorted(set(python_deps))
+            if "fastapi" in python_deps: result.update({"framework": "fastapi", "runtime": "PYTHON_3"})
+            elif "django" in python_deps: result.update({"framework": "django", "runtime": "PYTHON_3"})
+            elif "flask" in python_deps: result.update({"framework": "flask", "runtime": "PYTHON_3"})
             else: result.update({"framework": "python", "runtime": "PYTHON_3"})
-            
+        
+        # Java (Maven)
+        elif pom is not None:
+            result["language"] = "java"
+            result["dependencies"] = pom["artifacts"]
+            java_version = pom.get("java_version") or ""
+            runtime = "JAVA_11" if java_version.startswith("11") else "JAVA_17"
+            framework = "spring-boot" if any(a.startswith("spring-boot") for a in pom["artifacts"]) else "java"
+            result.update({"framework": framework, "runtime": runtime})
+        
+        # Go
+        elif go_mod is not None:
+            result["language"] = "go"
+            result["dependencies"] = go_mod["requires"]
+            result.update({"framework": "go", "runtime": "GO_1"})
+        
+        config, confidence, reasons = self._apply_rules(result, file_contents, package, docker)
+        result["confidence"] = confidence
+        result["rule_config"] = config
+        result["rule_reasons"] = reasons
         return result
 
+    # --- 매니페스트 파서 (파싱 실패 시 None / 빈 값) ---
+    @staticmethod
+    def _parse_package_json(text: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not text:
+            return None
+        try:
+            data = json.loads(text)
+            return data if isinstance(data, dict) else None
+        except json.JSONDecodeError:
+            return None
+
+    @staticmethod
+    def _package_dependencies(package: Dict[str, Any]) -> Dict[str, Any]:
+        """dependencies + devDependencies (키가 null이거나 객체가 아니면 무시)"""
+        deps: Dict[str, Any] = {}
+        for field in ("dependencies", "devDependencies"):
+            if isinstance(package.get(field), dict):
+                deps.update(package[field])
+        return deps
+
+    @staticmethod
+    def _node_major(package: Dict[str, Any]) -> Optional[str]:
+        """engines.node 범위의 첫 major 버전 (">=20.16" -> "20", "^18.20" -> "18"), 지원하지 않으면 None"""
+        engines = package.get("engines") if isinstance(package.get("engines"), dict) else {}
+        match = re.search(r'(?:^|[\s^~<>=v|])(\d+)', str(engines.get("node") or ""))
+        return match.group(1) if match and match.group(1) in NODE_RUNTIMES else None
+
+    @staticmethod
+    def _parse_requirements(text: Optional[str]) -> List[str]:
+        names = []
+        for line in (text or "").splitlines():
+            line = line.split('#', 1)[0].strip()
+            if not line or line.startswith('-'):
+                continue
+            name = re.split(r'[\s\[<>=!~;@]', line, 1)[0]
+            if name:
+                names.append(name.lower())
+        return names
+
+    @staticmethod
+    def _parse_pyproject(text: Optional[str]) -> List[str]:
+        if not text:
+            return []
+        try:
+            data = tomllib.loads(text)
+        except tomllib.TOMLDecodeError:
+            return []
+        deps = [re.split(r'[\s\[<>=!~;@]', d, 1)[0].lower()
+                for d in (data.get("project") or {}).get("dependencies") or []]
+        poetry = ((data.get("tool") or {}).get("poetry") or {}).get("dependencies") or {}
+        deps += [name.lower() for name in poetry if name.lower() != "python"]
+        return [d for d in deps if d]
+
+    @staticmethod
+    def _parse_pom(text: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not text:
+            return None
+        try:
+            root = ElementTree.fromstring(text)
+        except ElementTree.ParseError:
+            return None
+        # Maven 네임스페이스 제거 후 태그명으로 탐색
+        for element in root.iter():
+            if '}' in element.tag:
+                element.tag = element.tag.split('}', 1)[1]
+        artifacts = [a.text.strip() for a in root.iter("artifactId") if a.text]
+        java_version = None
+        properties = root.find("properties")
+        if properties is not None:
+            for tag in ("java.version", "maven.compiler.source", "maven.compiler.release"):
+                value = properties.findtext(tag)
+                if value:
+                    java_version = value.strip()
+                    break
+        return {"artifacts": artifacts, "java_version": java_version}
+
+    @staticmethod
+    def _parse_go_mod(text: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not text:
+            return None
+        go_version = None
+        requires = []
+        in_block = False
+        for line in text.splitlines():
+            line = line.split('//', 1)[0].strip()
+            if line.startswith("go "):
+                go_version = line[3:].strip()
+            elif line.startswith("require ("):
+                in_block = True
+            elif in_block and line == ")":
+                in_block = False
+            elif in_block and line:
+                requires.append(line.split()[0])
+            elif line.startswith("require "):
+                requires.append(line.split()[1])
+        return {"go_version": go_version, "requires": requires}
+
+    @staticmethod
+    def _parse_dockerfile(text: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not text:
+            return None
+        info: Dict[str, Any] = {"base_image": None, "port": None, "command": None}
+        for line in text.splitlines():
+            parts = line.strip().split(None, 1)
+            if len(parts) < 2:
+                continue
+            instruction, args = parts[0].upper(), parts[1].strip()
+            if instruction == "FROM":
+                info["base_image"] = args.split()[0]
+            elif instruction == "EXPOSE" and info["port"] is None:
+                port = args.split()[0].split('/')[0]
+                if port.isdigit():
+                    info["port"] = int(port)
+            elif instruction in ("CMD", "ENTRYPOINT"):
+                try:
+                    command = json.loads(args)
+                    info["command"] = " ".join(command) if isinstance(command, list) else str(command)
+                except json.JSONDecodeError:
+                    info["command"] = args
+        return info
+
+    # --- 규칙 엔진 ---
+    def _apply_rules(self, result: Dict[str, Any], file_contents: Dict[str, str],
+                     package: Optional[Dict[str, Any]],
+                     docker: Optional[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], float, List[str]]:
+        """
+        (LLM 응답과 같은 형식의 배포 설정 또는 None, 신뢰도 0-1, 판단 근거) 반환
+        신뢰도가 RULE_ENGINE_MIN_CONFIDENCE 이상이면 LLM 호출 없이 이 설정을 사용
+        """
+        framework = result["framework"]
+        runtime = result["runtime"]
+        reasons: List[str] = []
+        config: Optional[Dict[str, Any]] = None
+        confidence = 0.0
+
+        def static_config(output_dir: str) -> Dict[str, Any]:
+            node_version = (runtime or "NODEJS_18").split('_')[-1]
+            return {
+                "service_type": "static",
+                "build_commands": ["npm install", "npm run build"],
+                "build_output_dir": output_dir,
+                "node_version": node_version
+            }
+
+        def dynamic_config(start_command: str, port: int = 80) -> Dict[str, Any]:
+            config = {
+                "service_type": "dynamic",
+                "runtime": RUNTIME_TO_APPRUNNER.get(runtime or "PYTHON_3"),
+                "start_command": start_command,
+                "cpu": CPU_OPTIONS[0],
+                "memory": CPU_MEMORY_COMBINATIONS[CPU_OPTIONS[0]][0],
+                "port": port
+            }
+            if docker is not None:
+                config["dockerfile"] = "Dockerfile"
+            return config
+
+        if package is not None:
+            deps = self._package_dependencies(package)
+            scripts = package.get("scripts") if isinstance(package.get("scripts"), dict) else {}
+            has_build = "build" in scripts
+
+            if framework == "nextjs":
+                next_config = file_contents.get("next.config.js", "")
+                if re.search(r"output\s*:\s*['\"]export['\"]", next_config) or "next export" in scripts.get("build", ""):
+                    config, confidence = static_config("out"), 0.9
+                    reasons.append("next.js static export")
+                else:
+                    config, confidence = dynamic_config("npm start", 3000), 0.85
+                    reasons.append("next.js server rendering")
+            elif framework in NODE_SERVER_PACKAGES.values():
+                start = "npm start" if "start" in scripts else f"node {package.get('main', 'index.js')}"
+                config = dynamic_config(start, (docker or {}).get("port") or 80)
+                confidence = 0.85 if "start" in scripts else 0.7
+                reasons.append(f"node server framework: {framework}")
+            elif "react-scripts" in deps and has_build:
+                config, confidence = static_config("build"), 0.95
+                reasons.append("create-react-app build")
+            elif "vite" in deps and has_build and framework != "ssr":
+                config, confidence = static_config("dist"), 0.9
+                reasons.append("vite SPA build")
+            elif "@vue/cli-service" in deps and has_build:
+                config, confidence = static_config("dist"), 0.9
+                reasons.append("vue-cli build")
+            elif framework == "ssr":
+                config, confidence = dynamic_config("npm start", 3000), 0.6
+                reasons.append("SSR framework, needs review")
+
+        elif framework == "fastapi":
+            command = (docker or {}).get("command") or "uvicorn main:app --host 0.0.0.0 --port 80"
+            config, confidence = dynamic_config(command, (docker or {}).get("port") or 80), 0.85
+            reasons.append("fastapi application")
+        elif framework in ("flask", "django"):
+            default = "gunicorn -b 0.0.0.0:80 app:app" if framework == "flask" else "gunicorn -b 0.0.0.0:80 config.wsgi"
+            config, confidence = dynamic_config((docker or {}).get("command") or default), 0.7
+            reasons.append(f"{framework} application, entry module unknown")
+        elif framework == "spring-boot":
+            config, confidence = dynamic_config("java -jar app.jar", (docker or {}).get("port") or 8080), 0.8
+            reasons.append("spring boot application")
+        elif framework == "go":
+            config, confidence = dynamic_config("./app", (docker or {}).get("port") or 80), 0.8
+            reasons.append("go module")
+        elif "index.html" in file_contents and result["language"] == "unknown":
+            config, confidence = {**static_config("."), "build_commands": []}, 0.6
+            reasons.append("plain html")
+
+        if config is not None and docker is not None:
+            # 정적 SPA에 Dockerfile이 있으면 컨테이너 배포 의도일 수 있으므로 LLM 판단에 맡김
+            if config["service_type"] == "static":
+                confidence -= 0.3
+                reasons.append("Dockerfile present on static project")
+            else:
+                confidence = min(1.0, confidence + 0.05)
+                reasons.append("Dockerfile present")
+
+        return config, round(max(confidence, 0.0), 2), reasons
+
+# =============================================================================
+# 2-1. Prompt Templates (import 시 1회 컴파일 + Bedrock prompt caching)
+# 정적 시스템 프롬프트 뒤에 cachePoint를 붙여 동일 prefix 토큰을 Bedrock이 재사용하도록 함
+# =============================================================================
+PROMPT_CACHE_ENABLED = os.environ.get('PROMPT_CACHE_ENABLED', 'true').lower() == 'true'
+
+# prompt caching 지원 모델 (모델 ID / inference profile ID / ARN에 포함된 이름으로 판별)
+# Claude 3 Haiku/Sonnet/Opus, Claude 3.5 Sonnet은 미지원 - cachePoint를 보내면 ValidationException
+PROMPT_CACHE_MODELS = tuple(
+    name.strip() for name in os.environ.get(
+        'PROMPT_CACHE_MODELS',
+        'anthropic.claude-3-7-sonnet,anthropic.claude-3-5-haiku,anthropic.claude-sonnet-4,'
+        'anthropic.claude-opus-4,anthropic.claude-haiku-4,amazon.nova-'
+    ).split(',') if name.strip()
+)
+
+# cachePoint 앞 prefix의 최소 토큰 수 - 이보다 짧으면 캐시되지 않으므로 마커를 보내지 않음
+PROMPT_CACHE_MIN_TOKENS = int(os.environ.get('PROMPT_CACHE_MIN_TOKENS', '1024'))
+PROMPT_CACHE_MODEL_MIN_TOKENS = {'anthropic.claude-3-5-haiku': 2048}
+
+# 목록에 있지만 cachePoint를 거부한 모델 (이후 호출은 캐시 마커 없이 전송)
+_prompt_cache_unsupported_models = set()
+
+def prompt_cache_min_tokens(model_id: str) -> int:
+    """모델별 캐시 체크포인트 최소 토큰 수"""
+    return next((tokens for name, tokens in PROMPT_CACHE_MODEL_MIN_TOKENS.items() if name in model_id),
+                PROMPT_CACHE_MIN_TOKENS)
+
+def supports_prompt_cache(model_id: str, template: Optional['PromptTemplate'] = None) -> bool:
+    """cachePoint를 붙여도 되는 모델인지 (template을 주면 prefix가 최소 토큰 수를 넘는지도 확인)"""
+    return (PROMPT_CACHE_ENABLED
+            and any(name in model_id for name in PROMPT_CACHE_MODELS)
+            and model_id not in _prompt_cache_unsupported_models
+            and (template is None or template.cached_tokens >= prompt_cache_min_tokens(model_id)))
+
+def is_prompt_cache_rejection(error: Exception) -> bool:
+    """ValidationException이 cachePoint 거부 때문인지 (다른 검증 오류는 모델을 캐시 불가로 표시하지 않음)"""
+    message = getattr(error, 'response', {}).get('Error', {}).get('Message', '') or str(error)
+    return 'cachepoint' in message.lower() or 'caching' in message.lower()
+
+class PromptTemplate:
+    """
+    정적 시스템 프롬프트
+    - prefix: 여러 템플릿이 공유하는 정적 블록, cachePoint는 그 뒤에 붙어 액션 간에 캐시 항목을 공유
+      (prefix가 없으면 본문 뒤에 붙음)
+    - estimated_tokens: cachePoint 앞 prefix의 글자 수 기반 추정치 (약 4자/토큰)
+    - measured_tokens: 캐시가 읽히거나 쓰인 호출의 cacheRead/cacheWrite 토큰 수 (= cachePoint 앞 prefix 실측 크기)
+    """
+    def __init__(self, name: str, text: str, prefix: str = ''):
+        self.name = name
+        self.text = text
+        self.prefix = prefix
+        self.estimated_tokens = max(1, len(prefix or text) // 4)
+        self.measured_tokens: Optional[int] = None
+
+    @property
+    def cached_tokens(self) -> int:
+        return self.measured_tokens or self.estimated_tokens
+
+    def system_blocks(self, cache: bool = True) -> List[Dict[str, Any]]:
+        blocks: List[Dict[str, Any]] = [{'text': self.prefix or self.text}]
+        if cache:
+            blocks.append({'cachePoint': {'type': 'default'}})
+        if self.prefix:
+            blocks.append({'text': self.text})
+        return blocks
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'estimated_tokens': self.estimated_tokens,
+            'measured_tokens': self.measured_tokens
+        }
+
+def _build_platform_reference() -> str:
+    """두 템플릿이 공유하는 정적 참고 자료 (런타임/스펙/가격 표 + 판단 예시), 상수에서 import 시 1회 생성"""
+    runtime_rows = '\n'.join(f"| {key} | {value} |" for key, value in RUNTIME_TO_APPRUNNER.items())
+    spec_rows = '\n'.join(
+        f"| {cpu} | {memory} | ${prices['hourly_usd']:.4f} | ${prices['monthly_usd']:.2f} |"
+        for cpu, memories in APP_RUNNER_PRICE_TABLE.items()
+        for memory, prices in memories.items()
+    )
+    node_servers = ', '.join(f"{package} -> {framework}" for package, framework in NODE_SERVER_PACKAGES.items())
+    return f"""# HAIFU PLATFORM REFERENCE
+This reference describes the deployment platform. It is shared by every analysis task; follow the task instructions that come after it.
+
+## Deployment targets
+- static: the build output is uploaded to S3 and served through CloudFront. No server process runs, so there is no runtime, CPU or memory to choose. Client-side routing (React Router, Vue Router) works because missing paths fall back to index.html.
+- dynamic: the source is built by CodeBuild and run on AWS App Runner as a long-running HTTP service. The service must listen on the configured port on 0.0.0.0. App Runner scales instances with concurrent requests and can pause between requests.
+
+## App Runner managed runtimes (RUNTIMES key | App Runner runtime)
+| RUNTIMES | App Runner |
+|---|---|
+{runtime_rows}
+
+## App Runner instance specs (Seoul, ap-northeast-2, 24/7 active)
+| CPU | Memory | Hourly | Monthly |
+|---|---|---|---|
+{spec_rows}
+- Price per vCPU-hour: ${PRICE_PER_VCPU_HOUR}; price per GB-hour: ${PRICE_PER_GB_HOUR}; {HOURS_PER_MONTH} hours per month.
+- Outbound data: {BASE_OUTBOUND_GB} GB per month at traffic_multiplier 1.0, first {FREE_OUTBOUND_GB} GB free, then ${PRICE_PER_OUTBOUND_GB}/GB.
+- Builds: about {BUILD_MINUTES_PER_MONTH} build minutes per month at ${PRICE_PER_BUILD_MINUTE}/minute.
+- Costs are calculated by the platform from your predictions; never compute prices yourself.
+
+## Framework detection hints
+- Node.js server packages: {node_servers}. These are dynamic services started with "npm start" or "node <main>".
+- Node.js SSR packages: {', '.join(NODE_SSR_PACKAGES)}. These render on the server and are dynamic (port 3000 by default).
+- Next.js is dynamic unless next.config.js sets output: 'export' or the build script runs "next export"; a static export writes to "out".
+- Create React App (react-scripts) builds to "build"; Vite and Vue CLI build to "dist". Without a server framework these are static.
+- Node.js versions: engines.node selects the major version ({', '.join(NODE_RUNTIMES)}); default to 18 when it is missing.
+- Python: fastapi runs with "uvicorn main:app --host 0.0.0.0 --port 80"; flask and django run with gunicorn bound to 0.0.0.0:80.
+- Java: Spring Boot builds a runnable jar, started with "java -jar app.jar", usually on port 8080. Java 11 projects use JAVA_11, otherwise JAVA_17.
+- Go: a go.mod module builds to a single binary started with "./app".
+- A Dockerfile usually signals a containerised dynamic service; prefer its EXPOSE port and CMD.
+- A lone index.html without a manifest is a plain static site with no build commands and output directory ".".
+
+## Sizing guidance
+- Start with the smallest spec ({CPU_OPTIONS[0]}, {CPU_MEMORY_COMBINATIONS[CPU_OPTIONS[0]][0]}) for APIs, bots and small web apps.
+- Use 2 vCPU for JVM services with many dependencies, image or PDF processing, or server-side rendering under steady load.
+- Use 4 vCPU only for CPU-bound workloads such as ML inference or heavy data processing.
+- Memory must always be one of the combinations listed for the chosen CPU.
+
+## Usage patterns
+- uptime_percentage is the share of the month the service is actively serving: 100 means 24/7, 50 about 12 hours a day, 25 about business hours on weekdays.
+- traffic_level / traffic_multiplier: low = 0.5, medium = 1.0, high = 2.0. Values from 0.25 to 10 are accepted for unusual workloads.
+- requests_per_month: personal projects and demos 10,000-100,000; internal tools 100,000-1,000,000; public products 1,000,000 and up.
+
+## Worked examples
+
+Example 1 - Vite + React single page app, package.json scripts {{"build": "vite build"}}, no server packages:
+{{"service_type": "static", "build_commands": ["npm install", "npm run build"], "build_output_dir": "dist", "node_version": "18"}}
+
+Example 2 - Express API, package.json scripts {{"start": "node src/index.js"}}, engines.node ">=20":
+{{"service_type": "dynamic", "runtime": "nodejs20", "start_command": "npm start", "dockerfile": null, "cpu": "1 vCPU", "memory": "2 GB", "port": 80, "environment_variables": {{"NODE_ENV": "production"}}}}
+
+Example 3 - FastAPI service with requirements.txt (fastapi, uvicorn, sqlalchemy) and main.py:
+{{"service_type": "dynamic", "runtime": "python3.11", "start_command": "uvicorn main:app --host 0.0.0.0 --port 80", "dockerfile": null, "cpu": "1 vCPU", "memory": "2 GB", "port": 80, "environment_variables": {{}}}}
+
+Example 4 - Spring Boot application, pom.xml with spring-boot-starter-web and java.version 17:
+{{"service_type": "dynamic", "runtime": "java17", "start_command": "java -jar app.jar", "dockerfile": null, "cpu": "2 vCPU", "memory": "4 GB", "port": 8080, "environment_variables": {{"SPRING_PROFILES_ACTIVE": "prod"}}}}
+
+Example 5 - Next.js app without static export:
+{{"service_type": "dynamic", "runtime": "nodejs20", "start_command": "npm start", "dockerfile": null, "cpu": "1 vCPU", "memory": "2 GB", "port": 3000, "environment_variables": {{"NODE_ENV": "production"}}}}
+
+Example 6 - Usage of an internal admin dashboard (flask, used by a small team during office hours):
+{{"uptime_percentage": 30.0, "traffic_level": "low", "traffic_multiplier": 0.5, "requests_per_month": 200000, "cost_optimization_tips": ["Pause the service outside office hours", "Stay on 1 vCPU / 2 GB"], "reasoning": "Internal tool with a handful of users on weekdays"}}
+
+Example 7 - Usage of a public REST API behind a mobile app (nestjs):
+{{"uptime_percentage": 100.0, "traffic_level": "medium", "traffic_multiplier": 1.0, "requests_per_month": 3000000, "cost_optimization_tips": ["Cache read-heavy endpoints", "Set a maximum instance count"], "reasoning": "Mobile clients call the API around the clock"}}
+
+Example 8 - Usage of a personal portfolio backend (express):
+{{"uptime_percentage": 10.0, "traffic_level": "low", "traffic_multiplier": 0.25, "requests_per_month": 20000, "cost_optimization_tips": ["Consider a static site if no server logic is needed"], "reasoning": "Occasional visits from recruiters and friends"}}
+
+Example 9 - Django project with requirements.txt (django, gunicorn, psycopg2-binary) and config/wsgi.py:
+{{"service_type": "dynamic", "runtime": "python3.11", "start_command": "gunicorn -b 0.0.0.0:80 config.wsgi", "dockerfile": null, "cpu": "1 vCPU", "memory": "2 GB", "port": 80, "environment_variables": {{"DJANGO_SETTINGS_MODULE": "config.settings"}}}}
+
+Example 10 - Go HTTP server, go.mod with github.com/gin-gonic/gin:
+{{"service_type": "dynamic", "runtime": "go1.21", "start_command": "./app", "dockerfile": null, "cpu": "1 vCPU", "memory": "2 GB", "port": 80, "environment_variables": {{"GIN_MODE": "release"}}}}
+
+Example 11 - Plain HTML, CSS and JavaScript with index.html at the root and no package.json:
+{{"service_type": "static", "build_commands": [], "build_output_dir": ".", "node_version": "18"}}
+
+Example 12 - Node.js service with a Dockerfile (EXPOSE 8080, CMD ["node", "server.js"]):
+{{"service_type": "dynamic", "runtime": "nodejs18", "start_command": "node server.js", "dockerfile": "Dockerfile", "cpu": "1 vCPU", "memory": "2 GB", "port": 8080, "environment_variables": {{"NODE_ENV": "production"}}}}
+
+Example 13 - Next.js app whose next.config.js sets output: 'export':
+{{"service_type": "static", "build_commands": ["npm install", "npm run build"], "build_output_dir": "out", "node_version": "20"}}
+
+Example 14 - Nuxt application rendering pages on the server:
+{{"service_type": "dynamic", "runtime": "nodejs18", "start_command": "npm start", "dockerfile": null, "cpu": "1 vCPU", "memory": "2 GB", "port": 3000, "environment_variables": {{"NODE_ENV": "production", "NUXT_HOST": "0.0.0.0"}}}}
+
+Example 15 - Usage of a public e-commerce storefront backend (spring-boot) with seasonal sales:
+{{"uptime_percentage": 100.0, "traffic_level": "high", "traffic_multiplier": 2.0, "requests_per_month": 10000000, "cost_optimization_tips": ["Serve product images from a CDN", "Raise the maximum instance count only for sale periods"], "reasoning": "Customer-facing store with traffic peaks during promotions"}}
+
+Example 16 - Usage of a webhook receiver for a chat bot (fastapi) that only handles incoming events:
+{{"uptime_percentage": 50.0, "traffic_level": "low", "traffic_multiplier": 0.5, "requests_per_month": 150000, "cost_optimization_tips": ["Keep request handlers short so instances can pause", "Stay on 1 vCPU / 2 GB"], "reasoning": "Event-driven traffic that arrives in bursts during the day"}}
+"""
+
+PLATFORM_REFERENCE = _build_platform_reference()
+
+DEPLOYMENT_TYPE_PROMPT = PromptTemplate('deployment_type', f"""You are a DevOps expert. Analyze the project structure to determine the service type and deployment configuration.
+
+**Rules:**
+1. static: Pure HTML/CSS, or SPA (React, Vue) without backend logic (SSR).
+2. dynamic: Python, Java, Go, Node.js (Express, NestJS), or Docker based apps.
+
+**STRICT CONSTRAINTS - YOU MUST FOLLOW:**
+- Runtime: MUST be one of {', '.join(RUNTIME_TO_APPRUNNER.values())}
+- CPU: MUST be one of {', '.join(CPU_OPTIONS)} (for dynamic services)
+- Memory: MUST be one of {', '.join(MEMORY_OPTIONS)} (for dynamic services)
+- CPU-Memory combinations: {json.dumps(CPU_MEMORY_COMBINATIONS, indent=2)}
+
+**Response Format (JSON Only):**
+
+For STATIC:
+{{
+    "service_type": "static",
+    "build_commands": ["npm install", "npm run build"],
+    "build_output_dir": "dist",
+    "node_version": "16" | "18" | "20"
+}}
+
+For DYNAMIC:
+{{
+    "service_type": "dynamic",
+    "runtime": "{' | '.join(RUNTIME_TO_APPRUNNER.values())}",
+    "start_command": "npm start" | "python main.py" | "java -jar app.jar" | "./app",
+    "dockerfile": "optional custom dockerfile path or null",
+    "cpu": "{' | '.join(CPU_OPTIONS)}",
+    "memory": "{' | '.join(MEMORY_OPTIONS)}",
+    "port": 80,
+    "environment_variables": {{
+        "NODE_ENV": "production",
+        "API_BASE_URL": "https://api.example.com"
+    }}
+}}
+
+**Guidelines:**
+- build_commands: Array of commands to build the project
+- build_output_dir: Directory where build output is generated
+- node_version: Node.js version (16, 18, 20)
+- runtime: MUST match one of the allowed runtimes exactly
+- start_command: Command to start the application
+- cpu: MUST be one of {', '.join(CPU_OPTIONS)}
+- memory: MUST be one of {', '.join(MEMORY_OPTIONS)}
+- cpu and memory MUST be a valid combination from the allowed combinations
+- port: Application port (default 80)
+- environment_variables: Optional key-value pairs""", prefix=PLATFORM_REFERENCE)
+
+USAGE_ESTIMATION_PROMPT = PromptTemplate('usage_estimation', """You are an AWS workload analysis expert. Your task is to predict application usage patterns, NOT to calculate costs.
+
+**Your Job:**
+Analyze the application characteristics and predict:
+1. Expected uptime percentage (0-100%)
+2. Traffic level and multiplier
+3. Request volume
+4. Cost optimization recommendations
+
+**Response Format (JSON ONLY):**
+```json
+{
+  "uptime_percentage": 100.0,
+  "traffic_level": "low" | "medium" | "high",
+  "traffic_multiplier": 1.0,
+  "requests_per_month": 1000000,
+  "cost_optimization_tips": [
+    "Specific tip 1",
+    "Specific tip 2"
+  ],
+  "reasoning": "Brief explanation of your predictions"
+}
+```
+
+**Guidelines:**
+- uptime_percentage: 100 = 24/7, 50 = 12 hours/day, etc.
+- traffic_multiplier: 0.5 = low, 1.0 = medium, 2.0 = high
+- Be realistic based on the framework and use case""", prefix=PLATFORM_REFERENCE)
+
+# 액션(BedrockAgent 메서드)별 prompt cache 누적 통계 (converse 응답의 usage 기준)
+prompt_cache_stats: Dict[str, Dict[str, int]] = {}
+_prompt_cache_stats_lock = threading.Lock()
+
+def record_prompt_usage(action: str, template: Optional[PromptTemplate], usage: Dict[str, Any]):
+    """converse usage -> 액션별 캐시 적중 통계 + 템플릿 실측 토큰 수 + EMF 메트릭"""
+    cache_read = usage.get('cacheReadInputTokens', 0)
+    cache_write = usage.get('cacheWriteInputTokens', 0)
+    with _prompt_cache_stats_lock:
+        stats = prompt_cache_stats.setdefault(action, {
+            'requests': 0, 'cache_hits': 0, 'cache_writes': 0,
+            'input_tokens': 0, 'cache_read_tokens': 0, 'cache_write_tokens': 0
+        })
+        stats['requests'] += 1
+        stats['cache_hits'] += int(cache_read > 0)
+        stats['cache_writes'] += int(cache_write > 0)
+        stats['input_tokens'] += usage.get('inputTokens', 0)
+        stats['cache_read_tokens'] += cache_read
+        stats['cache_write_tokens'] += cache_write
+    # cachePoint 앞 prefix 전체가 읽히거나 쓰이므로 그 토큰 수가 곧 캐시되는 prefix 크기
+    # (캐시가 동작하지 않은 호출의 inputTokens는 user 메시지가 섞여 있어 기록하지 않음)
+    if template and (cache_read or cache_write):
+        template.measured_tokens = cache_read or cache_write
+
+    emit_metrics(
+        {
+            'InputTokens': usage.get('inputTokens', 0),
+            'CacheReadInputTokens': cache_read,
+            'CacheWriteInputTokens': cache_write,
+            'PromptCacheHit': int(cache_read > 0)
+        },
+        dimensions={'Action': action},
+        properties={'prompt_template': template.name if template else None},
+        unit='Count'
+    )
+
+def get_prompt_cache_stats(action: str) -> Dict[str, Any]:
+    """응답 메타데이터용 액션별 캐시 통계 (적중률 포함)"""
+    with _prompt_cache_stats_lock:
+        stats = dict(prompt_cache_stats.get(action, {}))
+    stats['hit_rate'] = round(stats.get('cache_hits', 0) / max(stats.get('requests', 0), 1), 3)
+    return stats
+
 # =============================================================================
 # 3. AI Agents (New & Existing)
 # =============================================================================
 
+# Bedrock 모델 라우팅: 액션별 모델 / maxTokens / temperature / stopSequences
+# model_id에는 모델 ID 대신 inference profile ID/ARN (예: apac.anthropic.claude-3-haiku-20240307-v1:0)도 사용 가능
+DEFAULT_MODEL_ID = os.environ.get('BEDROCK_MODEL_ID', 'anthropic.claude-3-5-sonnet-20240620-v1:0')
+# 시스템 프롬프트가 긴 JSON 액션용 - prompt caching을 지원하는 모델 (PROMPT_CACHE_MODELS)
+FAST_MODEL_ID = os.environ.get('BEDROCK_FAST_MODEL_ID', 'anthropic.claude-3-5-haiku-20241022-v1:0')
+
+# fallback_model_id: 주 모델이 실패하거나 validate를 통과하지 못한 응답(품질)일 때 재요청할 모델
+# latency_budget_ms: 주 모델의 최근 p95가 이 값을 넘으면 fallback 모델을 먼저 사용
+MODEL_ROUTES: Dict[str, Dict[str, Any]] = {
+    'default': {'model_id': DEFAULT_MODEL_ID, 'max_tokens': 2000, 'temperature': 0.5},
+    # 기획안 검토는 답변이 길어 토큰 예산을 넉넉하게
+    'main_query': {'model_id': DEFAULT_MODEL_ID, 'max_tokens': 4000, 'temperature': 0.5},
+    'chat': {'model_id': DEFAULT_MODEL_ID, 'max_tokens': 1500, 'temperature': 0.5},
+    # JSON 분류/예측은 소형 모델 + 작은 예산, 결정적인 출력을 위해 낮은 temperature
+    'analyze_deployment_type': {
+        'model_id': FAST_MODEL_ID, 'max_tokens': 800, 'temperature': 0.0,
+        'fallback_model_id': DEFAULT_MODEL_ID, 'latency_budget_ms': 8000
+    },
+    'estimate_cost': {
+        'model_id': FAST_MODEL_ID, 'max_tokens': 600, 'temperature': 0.2,
+        'fallback_model_id': DEFAULT_MODEL_ID, 'latency_budget_ms': 8000
+    }
+}
+# 배포 환경별 재정의: {"analyze_deployment_type": {"model_id": "apac.anthropic..."}} 형태의 JSON
+MODEL_ROUTES_OVERRIDE = os.environ.get('BEDROCK_MODEL_ROUTES')
+if MODEL_ROUTES_OVERRIDE:
+    for _action, _override in json.loads(MODEL_ROUTES_OVERRIDE).items():
+        MODEL_ROUTES[_action] = {**MODEL_ROUTES.get(_action, MODEL_ROUTES['default']), **_override}
+
+# 라우트(액션 + 모델)별 최근 지연시간 (p50/p95 계산용)
+ROUTE_LATENCY_WINDOW = int(os.environ.get('ROUTE_LATENCY_WINDOW', '200'))
+ROUTE_LATENCY_MIN_SAMPLES = 20  # 이보다 적으면 지연 기반 fallback 판단 안 함
+_route_latencies: Dict[Tuple[str, str], deque] = {}
+_route_latencies_lock = threading.Lock()
+
+def record_route_latency(action: str, model_id: str, latency_ms: float):
+    with _route_latencies_lock:
+        samples = _route_latencies.setdefault((action, model_id), deque(maxlen=ROUTE_LATENCY_WINDOW))
+        samples.append(latency_ms)
+    emit_metrics(
+        {'BedrockLatency': round(latency_ms, 1)},
+        dimensions={'Action': action, 'ModelId': model_id},
+        unit='Milliseconds'
+    )
+
+def route_latency_percentiles(action: str, model_id: str) -> Dict[str, Any]:
+    with _route_latencies_lock:
+        samples = sorted(_route_latencies.get((action, model_id), ()))
+    if not samples:
+        return {'count': 0, 'p50_ms': None, 'p95_ms': None}
+    def percentile(q: float) -> float:
+        return round(samples[min(len(samples) - 1, int(round(q * (len(samples) - 1))))], 1)
+    return {'count': len(samples), 'p50_ms': percentile(0.5), 'p95_ms': percentile(0.95)}
+
+def get_route_stats(action: str) -> Dict[str, Any]:
+    """응답 메타데이터용 라우트 정보 + 모델별 p50/p95"""
+    route = MODEL_ROUTES.get(action, MODEL_ROUTES['default'])
+    models = [route['model_id']] + ([route['fallback_model_id']] if route.get('fallback_model_id') else [])
+    return {
+        'model_id': route['model_id'],
+        'fallback_model_id': route.get('fallback_model_id'),
+        'latency': {model_id: route_latency_percentiles(action, model_id) for model_id in models}
+    }
+
+# Bedrock 재시도 정책: 스로틀링/일시 장애만 jitter가 섞인 지수 백오프로 재시도
+BEDROCK_RETRY_MAX_ATTEMPTS = int(os.environ.get('BEDROCK_RETRY_MAX_ATTEMPTS', '4'))
+BEDROCK_RETRY_BASE_DELAY = float(os.environ.get('BEDROCK_RETRY_BASE_DELAY', '0.5'))  # 초
+BEDROCK_RETRY_MAX_DELAY = float(os.environ.get('BEDROCK_RETRY_MAX_DELAY', '8.0'))    # 초
+BEDROCK_RETRYABLE_ERRORS = ('ThrottlingException', 'ServiceUnavailableException', 'ModelNotReadyException')
+
+class BedrockInvocationError(Exception):
+    """Bedrock 호출 실패 (재시도 소진 또는 재시도 불가 오류) - 빈 응답과 구분하기 위해 호출자에게 전파"""
+    def __init__(self, code: str, message: str, attempts: int, retryable: bool):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.attempts = attempts
+        self.retryable = retryable
+
+    @property
+    def status_code(self) -> int:
+        # 스로틀링/일시 장애는 503, 그 외 Bedrock 오류는 502
+        return 503 if self.retryable else 502
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'error': 'Bedrock invocation failed',
+            'code': self.code,
+            'attempts': self.attempts,
+            'retryable': self.retryable,
+            'message': str(self)
+        }
+
+def bedrock_error_code(error: Exception) -> str:
+    """ClientError 코드 (이벤트 스트림 오류는 throttlingException처럼 소문자로 시작하므로 정규화)"""
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code') or type(error).__name__
+    return code[:1].upper() + code[1:]
+
+class StreamInterrupted(BedrockInvocationError):
+    """스트림이 일부 텍스트를 보낸 뒤 끊김 - 이미 전송된 조각이 있어 재시도/fallback 하지 않음"""
+    def __init__(self, code: str, message: str, attempts: int, partial_text: str):
+        super().__init__(code, message, attempts, retryable=True)
+        self.partial_text = partial_text
+
+class SingleFlight:
+    """
+    동일 키의 동시 호출을 하나의 실행으로 합침
+    먼저 들어온 호출(leader)만 fn을 실행하고, 나머지는 같은 결과(또는 예외)를 기다려 받음
+    """
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Returns: (결과, 다른 호출에 합쳐졌는지 여부)"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result(), True
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+        return future.result(), False
+
+# 프로세스 내 진행 중인 Bedrock converse 호출 (모델 + 프롬프트 해시 기준)
+bedrock_flights = SingleFlight()
+
 class BedrockAgent:
-    """통합 Bedrock 클라이언트 (Chat, Analysis, Cost)"""
+    """통합 Bedrock 클라이언트 (Chat, Analysis, Cost) - 액션별 모델은 MODEL_ROUTES로 결정"""
     def __init__(self):
-        self.bedrock_runtime = boto3.client(
-            'bedrock-runtime',
-            region_name=os.environ.get('AWS_DEFAULT_REGION', 'ap-northeast-2')
+        self.bedrock_runtime = get_client('bedrock-runtime')
+        self.model_id = MODEL_ROUTES['default']['model_id']
+
+    @staticmethod
+    def route(action: Optional[str]) -> Dict[str, Any]:
+        return MODEL_ROUTES.get(action or 'default', MODEL_ROUTES['default'])
+
+    @staticmethod
+    def _inference_config(route: Dict[str, Any]) -> Dict[str, Any]:
+        config = {'maxTokens': route['max_tokens'], 'temperature': route['temperature']}
+        if route.get('stop_sequences'):
+            config['stopSequences'] = route['stop_sequences']
+        return config
+
+    def _route_models(self, action: Optional[str]) -> List[str]:
+        """시도할 모델 순서 - 주 모델의 p95가 latency_budget_ms를 넘으면 fallback 모델 우선"""
+        route = self.route(action)
+        fallback = route.get('fallback_model_id')
+        if not fallback or fallback == route['model_id']:
+            return [route['model_id']]
+        budget = route.get('latency_budget_ms')
+        latency = route_latency_percentiles(action or 'default', route['model_id'])
+        if budget and latency['count'] >= ROUTE_LATENCY_MIN_SAMPLES and latency['p95_ms'] > budget:
+            return [fallback, route['model_id']]
+        return [route['model_id'], fallback]
+
+    def _invoke_model(self, system_prompt: Union[str, PromptTemplate], user_prompt: str,
+                      action: Optional[str] = None, validate: Optional[Callable[[str], bool]] = None,
+                      on_text: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Bedrock 호출 공통 메서드
+        - action의 라우트(MODEL_ROUTES)로 모델/추론 설정 결정, 실패하거나 validate를 통과하지 못하면 fallback 모델로 재요청
+        - system_prompt가 PromptTemplate이면 cachePoint를 붙여 전송하고 usage를 action별로 집계
+        - 동일 모델/프롬프트의 동시 호출은 하나의 converse 호출로 합침 (single-flight, 스트리밍 제외)
+        - 스로틀링/일시 장애는 백오프 재시도, 최종 실패는 BedrockInvocationError로 전파
+        - on_text 지정 시 converse_stream 사용 (텍스트 전송 후 끊기면 StreamInterrupted)
+        """
+        models = self._route_models(action)
+        for position, model_id in enumerate(models):
+            last = position == len(models) - 1
+            try:
+                if on_text:
+                    # 호출자마다 콜백이 달라 스트리밍은 합치지 않음
+                    text = self._invoke_with_retry(model_id, system_prompt, user_prompt, action, on_text)
+                else:
+                    text = self._invoke_single_flight(model_id, system_prompt, user_prompt, action)
+            except StreamInterrupted:
+                raise
+            except BedrockInvocationError as e:
+                if last:
+                    raise
+                self._record_fallback(action, model_id, 'error', e.code)
+                continue
+            if validate and not last and not validate(text):
+                self._record_fallback(action, model_id, 'quality')
+                continue
+            return text
+
+    def _record_fallback(self, action: Optional[str], model_id: str, reason: str, error_code: Optional[str] = None):
+        print(f"Bedrock route {action or 'default'}: falling back from {model_id} ({reason})")
+        emit_metrics(
+            {'BedrockRouteFallback': 1},
+            dimensions={'Action': action or 'default'},
+            properties={'model_id': model_id, 'reason': reason, 'error_code': error_code},
+            unit='Count'
+        )
+
+    def _invoke_single_flight(self, model_id: str, system_prompt: Union[str, PromptTemplate], user_prompt: str,
+                              action: Optional[str]) -> str:
+        route = self.route(action)
+        system_text = system_prompt.text if isinstance(system_prompt, PromptTemplate) else system_prompt
+        key = hashlib.sha256('\x00'.join((
+            model_id, json.dumps(self._inference_config(route), sort_keys=True), system_text, user_prompt
+        )).encode('utf-8')).hexdigest()
+        text, coalesced = bedrock_flights.do(
+            key, lambda: self._invoke_with_retry(model_id, system_prompt, user_prompt, action)
+        )
+        if coalesced:
+            emit_metrics({'BedrockCoalesced': 1}, dimensions={'Action': action or 'unknown'}, unit='Count')
+        return text
+
+    def _invoke_with_retry(self, model_id: str, system_prompt: Union[str, PromptTemplate], user_prompt: str,
+                           action: Optional[str], on_text: Optional[Callable[[str], None]] = None) -> str:
+        """
+        converse(_stream) + 재시도 정책 (full jitter 지수 백오프), 시도/스로틀/실패 횟수와 지연시간을 메트릭으로 기록
+        스트리밍은 첫 텍스트 조각을 보내기 전까지만 재시도
+        """
+        template = system_prompt if isinstance(system_prompt, PromptTemplate) else None
+        throttled = 0
+        error: Optional[BedrockInvocationError] = None
+        attempt = 0
+        for attempt in range(1, BEDROCK_RETRY_MAX_ATTEMPTS + 1):
+            try:
+                start = time.perf_counter()
+                if on_text:
+                    text, usage = self._consume_stream(model_id, system_prompt, user_prompt, action, on_text, attempt)
+                else:
+                    response = self._converse(model_id, system_prompt, user_prompt, self.route(action))
+                    text = response['output']['message']['content'][0]['text']
+                    usage = response.get('usage', {})
+                record_route_latency(action or 'default', model_id, (time.perf_counter() - start) * 1000)
+                if action:
+                    record_prompt_usage(action, template, usage)
+                error = None
+                break
+            except StreamInterrupted as e:
+                error = e
+                break
+            except Exception as e:
+                code = bedrock_error_code(e)
+                retryable = code in BEDROCK_RETRYABLE_ERRORS
+                error = BedrockInvocationError(code, str(e), attempt, retryable)
+                throttled += int(retryable)
+                if not retryable or attempt == BEDROCK_RETRY_MAX_ATTEMPTS:
+                    break
+                delay = random.uniform(0, min(BEDROCK_RETRY_MAX_DELAY, BEDROCK_RETRY_BASE_DELAY * (2 ** (attempt - 1))))
+                print(f"Bedrock {code} (attempt {attempt}/{BEDROCK_RETRY_MAX_ATTEMPTS}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+        emit_metrics(
+            {'BedrockAttempts': attempt, 'BedrockRetryableErrors': throttled, 'BedrockFailed': int(error is not None)},
+            dimensions={'Action': action or 'unknown'},
+            properties={'error_code': error.code if error else None, 'model_id': model_id},
+            unit='Count'
         )
-        self.model_id = 'anthropic.claude-3-5-sonnet-20240620-v1:0'
+        if error:
+            print(f"Bedrock Error: {error}")
+            raise error
+        return text
+
+    def _converse(self, model_id: str, system_prompt: Union[str, PromptTemplate], user_prompt: str,
+                  route: Dict[str, Any], stream: bool = False) -> Dict[str, Any]:
+        """converse(_stream) 호출 - prompt caching을 지원하지 않는 모델이면 캐시 마커 없이 재시도"""
+        call = self.bedrock_runtime.converse_stream if stream else self.bedrock_runtime.converse
+        request = {
+            'modelId': model_id,
+            'messages': [{"role": "user", "content": [{"text": user_prompt}]}],
+            'inferenceConfig': self._inference_config(route)
+        }
+        if not isinstance(system_prompt, PromptTemplate):
+            return call(system=[{"text": system_prompt}], **request)
 
-    def _invoke_model(self, system_prompt: str, user_prompt: str) -> str:
-        """Bedrock 호출 공통 메서드"""
+        cache = supports_prompt_cache(model_id, system_prompt)
         try:
-            response = self.bedrock_runtime.converse(
-                modelId=self.model_id,
-                messages=[{"role": "user", "content": [{"text": user_prompt}]}],
-                system=[{"text": system_prompt}],
-                inferenceConfig={"maxTokens": 2000, "temperature": 0.5}
-            )
-            return response['output']['message']['content'][0]['text']
+            return call(system=system_prompt.system_blocks(cache), **request)
+        except self.bedrock_runtime.exceptions.ValidationException as e:
+            if not cache or not is_prompt_cache_rejection(e):
+                raise
+            print(f"Prompt caching rejected for {model_id}, retrying without cachePoint: {e}")
+            _prompt_cache_unsupported_models.add(model_id)
+            return call(system=system_prompt.system_blocks(cache=False), **request)
+
+    def _consume_stream(self, model_id: str, system_prompt: Union[str, PromptTemplate], user_prompt: str,
+                        action: Optional[str], on_text: Callable[[str], None], attempt: int) -> Tuple[str, Dict[str, Any]]:
+        """
+        converse_stream 응답을 읽으며 조각마다 on_text 호출 -> (전체 텍스트, usage)
+        조각을 보내기 전의 오류는 그대로 올려 재시도하고, 보낸 뒤 끊기면 StreamInterrupted
+        """
+        response = self._converse(model_id, system_prompt, user_prompt, self.route(action), stream=True)
+        chunks: List[str] = []
+        usage: Dict[str, Any] = {}
+        try:
+            for stream_event in response['stream']:
+                text = stream_event.get('contentBlockDelta', {}).get('delta', {}).get('text')
+                if text:
+                    chunks.append(text)
+                    on_text(text)
+                if 'metadata' in stream_event:
+                    usage = stream_event['metadata'].get('usage', {})
         except Exception as e:
-            print(f"Bedrock Error: {e}")
-            return "{}"
+            if not chunks:
+                raise
+            print(f"Bedrock Stream interrupted after {len(chunks)} chunks: {e}")
+            raise StreamInterrupted(bedrock_error_code(e), str(e), attempt, ''.join(chunks))
+        return ''.join(chunks), usage
+
+    def _invoke_model_stream(self, system_prompt: str, user_prompt: str, on_text: Callable[[str], None],
+                             action: Optional[str] = None) -> str:
+        """
+        Bedrock 스트리밍 호출 (converse_stream) - 라우팅/재시도/지연 기록은 _invoke_model과 동일
+        텍스트 조각이 도착할 때마다 on_text를 호출하고, 완료 후 전체 텍스트 반환
+        """
+        return self._invoke_model(system_prompt, user_prompt, action, on_text=on_text)
 
     # --- 기능 0: Main LLM (기획안 검토 및 일반 질의) ---
-    def main_query(self, message: str, context: Optional[Dict] = None) -> str:
+    def main_query(self, message: str, context: Optional[Dict] = None,
+                   on_text: Optional[Callable[[str], None]] = None) -> str:
         """
         일반적인 LLM 기능 - 기획안 검토, 사용자 질의 등
         
         Args:
             message: 사용자 질문
             context: 추가 컨텍스트 (선택)
+            on_text: 스트리밍 콜백 (지정 시 converse_stream 사용)
         
         Returns:
             LLM 응답
@@ -263,78 +1566,20 @@ Provide detailed, professional, and actionable advice. When reviewing proposals:
         else:
             full_message = message
         
-        return self._invoke_model(system, full_message)
+        if on_text:
+            return self._invoke_model_stream(system, full_message, on_text, action='main_query')
+        return self._invoke_model(system, full_message, action='main_query')
 
     # --- 기능 1: 일반 대화 ---
-    def chat(self, message: str) -> str:
+    def chat(self, message: str, on_text: Optional[Callable[[str], None]] = None) -> str:
         system = "You are a helpful and technical AI assistant for developers."
-        return self._invoke_model(system, message)
+        if on_text:
+            return self._invoke_model_stream(system, message, on_text, action='chat')
+        return self._invoke_model(system, message, action='chat')
 
     # --- 기능 2: 배포 유형 판단 (Static vs Dynamic) ---
     def analyze_deployment_type(self, repo_analysis: Dict, file_list: Dict) -> Dict:
-        # Runtime 매핑 (App Runner 형식)
-        runtime_map_to_apprunner = {
-            'PYTHON_3': 'python3.11',
-            'NODEJS_16': 'nodejs16',
-            'NODEJS_18': 'nodejs18',
-            'NODEJS_20': 'nodejs20',
-            'JAVA_11': 'java11',
-            'JAVA_17': 'java17',
-            'GO_1': 'go1.21',
-            'DOTNET_6': 'dotnet6',
-            'PHP_81': 'php81',
-            'RUBY_31': 'ruby31'
-        }
-        
-        system = f"""You are a DevOps expert. Analyze the project structure to determine the service type and deployment configuration.
-        
-        **Rules:**
-        1. static: Pure HTML/CSS, or SPA (React, Vue) without backend logic (SSR).
-        2. dynamic: Python, Java, Go, Node.js (Express, NestJS), or Docker based apps.
-        
-        **STRICT CONSTRAINTS - YOU MUST FOLLOW:**
-        - Runtime: MUST be one of {', '.join(runtime_map_to_apprunner.values())}
-        - CPU: MUST be one of {', '.join(CPU_OPTIONS)} (for dynamic services)
-        - Memory: MUST be one of {', '.join(MEMORY_OPTIONS)} (for dynamic services)
-        - CPU-Memory combinations: {json.dumps(CPU_MEMORY_COMBINATIONS, indent=2)}
-        
-        **Response Format (JSON Only):**
-        
-        For STATIC:
-        {{
-            "service_type": "static",
-            "build_commands": ["npm install", "npm run build"],
-            "build_output_dir": "dist",
-            "node_version": "16" | "18" | "20"
-        }}
-        
-        For DYNAMIC:
-        {{
-            "service_type": "dynamic",
-            "runtime": "{' | '.join(runtime_map_to_apprunner.values())}",
-            "start_command": "npm start" | "python main.py" | "java -jar app.jar" | "./app",
-            "dockerfile": "optional custom dockerfile path or null",
-            "cpu": "{' | '.join(CPU_OPTIONS)}",
-            "memory": "{' | '.join(MEMORY_OPTIONS)}",
-            "port": 80,
-            "environment_variables": {{
-                "NODE_ENV": "production",
-                "API_BASE_URL": "https://api.example.com"
-            }}
-        }}
-        
-        **Guidelines:**
-        - build_commands: Array of commands to build the project
-        - build_output_dir: Directory where build output is generated
-        - node_version: Node.js version (16, 18, 20)
-        - runtime: MUST match one of the allowed runtimes exactly
-        - start_command: Command to start the application
-        - cpu: MUST be one of {', '.join(CPU_OPTIONS)}
-        - memory: MUST be one of {', '.join(MEMORY_OPTIONS)}
-        - cpu and memory MUST be a valid combination from the allowed combinations
-        - port: Application port (default 80)
-        - environment_variables: Optional key-value pairs
-        """
+        # 시스템 프롬프트는 import 시 컴파일된 DEPLOYMENT_TYPE_PROMPT 사용 (cachePoint 포함)
         user = f"""Project Info:
         - Framework: {repo_analysis.get('framework')}
         - Language: {repo_analysis.get('language')}
@@ -344,7 +1589,10 @@ Provide detailed, professional, and actionable advice. When reviewing proposals:
         
         Analyze and provide complete deployment configuration following the STRICT CONSTRAINTS."""
         
-        response_text = self._invoke_model(system, user)
+        response_text = self._invoke_model(
+            DEPLOYMENT_TYPE_PROMPT, user, action='analyze_deployment_type',
+            validate=lambda text: str(self._parse_json(text).get('service_type', '')).lower() in ('static', 'dynamic')
+        )
         return self._parse_json(response_text)
 
     # --- 기능 3: 비용 추정 (LLM은 사용 패턴 예측, 실제 계산은 가격 테이블 사용) ---
@@ -360,12 +1608,14 @@ Provide detailed, professional, and actionable advice. When reviewing proposals:
         Returns:
             비용 추정 결과
         """
-        system_prompt = self._build_usage_estimation_prompt()
         user_prompt = self._build_usage_user_prompt(repo_analysis, cpu, memory)
         
         try:
             # 1. LLM에게 사용 패턴만 예측 요청
-            response_text = self._invoke_model(system_prompt, user_prompt)
+            response_text = self._invoke_model(
+                USAGE_ESTIMATION_PROMPT, user_prompt, action='estimate_cost',
+                validate=lambda text: 'error' not in self._parse_cost_json_response(text)
+            )
             usage_prediction = self._parse_cost_json_response(response_text)
             
             # 2. 예측된 사용 패턴 추출 (기본값 설정)
@@ -396,40 +1646,11 @@ Provide detailed, professional, and actionable advice. When reviewing proposals:
             # Fallback: 기본값으로 계산
             fallback_cost = calculate_app_runner_cost(cpu, memory, 100.0, 1.0)
             fallback_cost['error'] = str(e)
+            if isinstance(e, BedrockInvocationError):
+                fallback_cost['error_code'] = e.code
             fallback_cost['fallback'] = True
             return fallback_cost
     
-    def _build_usage_estimation_prompt(self) -> str:
-        """사용 패턴 예측용 시스템 프롬프트"""
-        return """You are an AWS workload analysis expert. Your task is to predict application usage patterns, NOT to calculate costs.
-
-**Your Job:**
-Analyze the application characteristics and predict:
-1. Expected uptime percentage (0-100%)
-2. Traffic level and multiplier
-3. Request volume
-4. Cost optimization recommendations
-
-**Response Format (JSON ONLY):**
-```json
-{
-  "uptime_percentage": 100.0,
-  "traffic_level": "low" | "medium" | "high",
-  "traffic_multiplier": 1.0,
-  "requests_per_month": 1000000,
-  "cost_optimization_tips": [
-    "Specific tip 1",
-    "Specific tip 2"
-  ],
-  "reasoning": "Brief explanation of your predictions"
-}
-```
-
-**Guidelines:**
-- uptime_percentage: 100 = 24/7, 50 = 12 hours/day, etc.
-- traffic_multiplier: 0.5 = low, 1.0 = medium, 2.0 = high
-- Be realistic based on the framework and use case"""
-    
     def _build_usage_user_prompt(self, repo_analysis: Dict[str, Any], cpu: str, memory: str) -> str:
         """사용 패턴 예측용 사용자 프롬프트"""
         return f"""## Application Info:
@@ -498,6 +1719,131 @@ Consider the framework type and typical deployment scenarios."""
         except:
             return {"error": "JSON parsing failed", "raw": text}
 
+# =============================================================================
+# 3-1. Streaming Publisher (WebSocket으로 부분 응답 전달)
+# =============================================================================
+# 관리 API endpoint는 설정에서만 결정 (요청으로 받은 host에 SigV4 서명 호출을 보내지 않도록)
+WEBSOCKET_API_ENDPOINT = os.environ.get('WEBSOCKET_API_ENDPOINT')
+WEBSOCKET_ENDPOINT_PARAMETER = os.environ.get('WEBSOCKET_ENDPOINT_PARAMETER', '/haifu/websocket/endpoint')
+_websocket_endpoint_cache: Dict[str, Optional[str]] = {}
+
+def get_websocket_endpoint() -> Optional[str]:
+    """WEBSOCKET_API_ENDPOINT 환경변수, 없으면 SSM 파라미터 (컨테이너당 1회 조회)"""
+    if WEBSOCKET_API_ENDPOINT:
+        return WEBSOCKET_API_ENDPOINT
+    if 'endpoint' not in _websocket_endpoint_cache:
+        try:
+            response = get_client('ssm').get_parameter(Name=WEBSOCKET_ENDPOINT_PARAMETER)
+            _websocket_endpoint_cache['endpoint'] = response['Parameter']['Value']
+        except Exception as e:
+            print(f"Could not read {WEBSOCKET_ENDPOINT_PARAMETER}: {e}")
+            _websocket_endpoint_cache['endpoint'] = None
+    return _websocket_endpoint_cache['endpoint']
+STREAM_FLUSH_CHARS = int(os.environ.get('STREAM_FLUSH_CHARS', '200'))
+STREAM_FLUSH_INTERVAL_SECONDS = float(os.environ.get('STREAM_FLUSH_INTERVAL_SECONDS', '0.25'))
+
+class WebSocketStreamPublisher:
+    """
+    Bedrock 스트리밍 토큰을 WebSocket 클라이언트로 전송
+    토큰 단위 전송은 호출 수가 너무 많으므로 글자 수/시간 기준으로 묶어서 전송
+    
+    메시지 형식 (websocket_lambda의 type 기반 메시지와 동일한 규칙):
+        {"type": "llm_delta", "stream_id": "...", "seq": 0, "text": "..."}
+        {"type": "llm_done", "stream_id": "...", "seq": 5, "status": "complete" | "partial" | "error", "error": "..."}
+    """
+    def __init__(self, endpoint_url: str, connection_id: str, stream_id: str):
+        self.client = get_client('apigatewaymanagementapi', endpoint_url=endpoint_url)
+        self.connection_id = connection_id
+        self.stream_id = stream_id
+        self.seq = 0
+        self.active = True
+        self._buffer: List[str] = []
+        self._buffered_chars = 0
+        self._last_flush = time.monotonic()
+
+    def _post(self, message: Dict[str, Any]):
+        if not self.active:
+            return
+        try:
+            self.client.post_to_connection(
+                ConnectionId=self.connection_id,
+                Data=json.dumps(message)
+            )
+            self.seq += 1
+        except Exception as e:
+            # 연결이 끊겨도 생성은 계속하여 버퍼링된 HTTP 응답으로 반환
+            print(f"Stream push failed, disabling stream {self.stream_id}: {e}")
+            self.active = False
+
+    def on_text(self, text: str):
+        self._buffer.append(text)
+        self._buffered_chars += len(text)
+        if (self._buffered_chars >= STREAM_FLUSH_CHARS or
+                time.monotonic() - self._last_flush >= STREAM_FLUSH_INTERVAL_SECONDS):
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._post({
+                'type': 'llm_delta',
+                'stream_id': self.stream_id,
+                'seq': self.seq,
+                'text': ''.join(self._buffer)
+            })
+        self._buffer = []
+        self._buffered_chars = 0
+        self._last_flush = time.monotonic()
+
+    def close(self, status: str = 'complete', error: Optional[str] = None):
+        self.flush()
+        message = {
+            'type': 'llm_done',
+            'stream_id': self.stream_id,
+            'seq': self.seq,
+            'status': status
+        }
+        if error:
+            message['error'] = error
+        self._post(message)
+
+def build_stream_publisher(event: Dict) -> Optional[WebSocketStreamPublisher]:
+    """
+    요청에 stream 설정이 있으면 Publisher 생성
+    {"stream": {"connection_id": "...", "stream_id": "..."}}
+    endpoint는 설정(get_websocket_endpoint)에서만 가져오며 요청의 endpoint 값은 무시
+    """
+    stream = event.get('stream')
+    if not isinstance(stream, dict) or not stream.get('connection_id'):
+        return None
+    if stream.get('endpoint'):
+        print("Ignoring client-supplied stream endpoint; using configured WebSocket endpoint")
+    endpoint = get_websocket_endpoint()
+    if not endpoint:
+        print("Streaming requested but no WebSocket endpoint configured, using buffered reply")
+        return None
+    return WebSocketStreamPublisher(
+        endpoint_url=endpoint,
+        connection_id=stream['connection_id'],
+        stream_id=stream.get('stream_id') or str(uuid.uuid4())
+    )
+
+def stream_reply(publisher: WebSocketStreamPublisher, generate: Callable[[Callable[[str], None]], str]) -> Dict[str, Any]:
+    """
+    스트리밍 응답 생성 + 종료 프레임 전송
+    중간에 끊기면 partial 상태로 닫고 받은 부분까지 반환, 시작도 못 하면 error로 닫고 예외 전파
+    """
+    try:
+        reply = generate(publisher.on_text)
+    except StreamInterrupted as e:
+        publisher.close(status='partial', error=e.code)
+        return {'reply': e.partial_text, 'stream_id': publisher.stream_id, 'streamed': publisher.active,
+                'partial': True, 'error': e.to_dict()}
+    except BedrockInvocationError as e:
+        publisher.close(status='error', error=e.code)
+        raise
+    publisher.close()
+    return {'reply': reply, 'stream_id': publisher.stream_id, 'streamed': publisher.active}
+
 # =============================================================================
 # 4. Action Handlers (기능별 처리 함수)
 # =============================================================================
@@ -512,11 +1858,15 @@ def handle_main(event: Dict) -> Dict:
     context = event.get('context')
     
     agent = BedrockAgent()
-    reply = agent.main_query(message, context)
+    publisher = build_stream_publisher(event)
+    if publisher:
+        body = stream_reply(publisher, lambda on_text: agent.main_query(message, context, on_text=on_text))
+    else:
+        body = {'reply': agent.main_query(message, context)}
     
     return {
         'statusCode': 200,
-        'body': json.dumps({'reply': reply})
+        'body': json.dumps(body)
     }
 
 def handle_chat(event: Dict) -> Dict:
@@ -526,62 +1876,35 @@ def handle_chat(event: Dict) -> Dict:
         return {'statusCode': 400, 'body': json.dumps({'error': 'message is required'})}
     
     agent = BedrockAgent()
-    reply = agent.chat(message)
+    publisher = build_stream_publisher(event)
+    if publisher:
+        body = stream_reply(publisher, lambda on_text: agent.chat(message, on_text=on_text))
+    else:
+        body = {'reply': agent.chat(message)}
     
     return {
         'statusCode': 200,
-        'body': json.dumps({'reply': reply})
+        'body': json.dumps(body)
     }
 
-def handle_deployment_check(event: Dict) -> Dict:
-    """기능 2: 정적/동적 배포 판단 핸들러 - Static/Dynamic 각각의 형식에 맞게 반환"""
-    s3_snapshot = event.get('s3_snapshot')
-    if not s3_snapshot:
-        return {'statusCode': 400, 'body': json.dumps({'error': 's3_snapshot required'})}
-
-    # 요청에서 사용자 정보 추출
-    user_id = event.get('user_id')
-    project_id = event.get('project_id')
-    service_id = event.get('service_id')
-
-    # 1. 파일 로드
-    loader = S3SnapshotLoader()
-    files = loader.load_snapshot(s3_snapshot['bucket'], s3_snapshot['s3_prefix'])
-    
-    if not files:
-        return {'statusCode': 404, 'body': json.dumps({'error': 'No files found'})}
-
-    # 2. 기본 분석
-    analyzer = RepositoryAnalyzer()
-    analysis_result = analyzer.analyze(files)
-
-    # 3. AI 심층 분석 (Static vs Dynamic + 상세 설정)
-    agent = BedrockAgent()
-    deployment_info = agent.analyze_deployment_type(analysis_result, files)
-    
-    print(f"LLM Analysis Result: {json.dumps(deployment_info, indent=2)}")
-    
-    # 4. service_type 추출 및 검증
+def build_deployment_config(deployment_info: Dict, analysis_result: Dict) -> Dict:
+    """
+    LLM 분석 결과를 검증/정규화하여 Static/Dynamic 배포 설정 생성
+    (요청자 정보와 무관하므로 분석 캐시에 그대로 저장 가능)
+    """
+    # service_type 추출 및 검증
     service_type = deployment_info.get('service_type', 'dynamic').lower()
     
     if service_type not in ['static', 'dynamic']:
         print(f"Warning: Invalid service_type '{service_type}', defaulting to 'dynamic'")
         service_type = 'dynamic'
     
-    # 5. 응답 구성 - Static과 Dynamic 각각 다른 형식
+    # 응답 구성 - Static과 Dynamic 각각 다른 형식
     response_data = {
         'service_type': service_type
     }
     
     if service_type == 'static':
-        # Static 서비스 응답 형식
-        if user_id:
-            response_data['user_id'] = user_id
-        if project_id:
-            response_data['project_id'] = project_id
-        if service_id:
-            response_data['service_id'] = service_id
-        
         # node_version 검증 (16, 18, 20만 허용)
         node_version = deployment_info.get('node_version')
         allowed_node_versions = ['16', '18', '20']
@@ -609,18 +1932,7 @@ def handle_deployment_check(event: Dict) -> Dict:
     else:
         # Dynamic 서비스 응답 형식
         # Runtime 변환 (PYTHON_3 -> python3.11)
-        runtime_map = {
-            'PYTHON_3': 'python3.11',
-            'NODEJS_16': 'nodejs16',
-            'NODEJS_18': 'nodejs18',
-            'NODEJS_20': 'nodejs20',
-            'JAVA_11': 'java11',
-            'JAVA_17': 'java17',
-            'GO_1': 'go1.21',
-            'DOTNET_6': 'dotnet6',
-            'PHP_81': 'php81',
-            'RUBY_31': 'ruby31'
-        }
+        runtime_map = RUNTIME_TO_APPRUNNER
         
         # 허용된 App Runner runtime 형식
         allowed_runtimes = list(runtime_map.values())
@@ -682,6 +1994,115 @@ def handle_deployment_check(event: Dict) -> Dict:
         if env_vars and isinstance(env_vars, dict) and len(env_vars) > 0:
             response_data['environment_variables'] = env_vars
 
+    return response_data
+
+def analyze_snapshot_files(files: Dict[str, str], agent: "BedrockAgent",
+                           cache_key: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    캐시 -> 규칙 엔진 -> LLM 순으로 배포 설정 결정
+    Returns: (deployment_config, 분석 메타데이터)
+    """
+    cache_key = cache_key or AnalysisCache.make_key(files, agent.route('analyze_deployment_type')['model_id'])
+    cached, cache_status = analysis_cache.get(cache_key)
+
+    if cached is None:
+        # 기본 분석 + 규칙 엔진
+        analyzer = RepositoryAnalyzer()
+        analysis_result = analyzer.analyze(files)
+        confidence = analysis_result['confidence']
+
+        if analysis_result['rule_config'] and confidence >= RULE_ENGINE_MIN_CONFIDENCE:
+            # 확실한 저장소는 규칙 기반 설정 사용 (LLM 생략)
+            deployment_info = analysis_result['rule_config']
+            analysis_source = 'rules'
+            print(f"Rule engine result (confidence={confidence}, {analysis_result['rule_reasons']}): {json.dumps(deployment_info)}")
+        else:
+            # AI 심층 분석 (Static vs Dynamic + 상세 설정)
+            deployment_info = agent.analyze_deployment_type(analysis_result, files)
+            analysis_source = 'llm'
+            print(f"LLM Analysis Result: {json.dumps(deployment_info, indent=2)}")
+
+        deployment_config = build_deployment_config(deployment_info, analysis_result)
+
+        # LLM 응답 파싱 실패로 기본값이 채워진 결과는 캐시하지 않음
+        if 'error' not in deployment_info:
+            analysis_cache.put(cache_key, {
+                'config': deployment_config,
+                'source': analysis_source,
+                'confidence': confidence
+            })
+    else:
+        print(f"Analysis cache hit ({cache_status}): {cache_key}")
+        deployment_config = cached['config']
+        analysis_source = cached['source']
+        confidence = cached['confidence']
+
+    llm_skipped = cache_status != 'miss' or analysis_source == 'rules'
+    with _analysis_stats_lock:
+        analysis_stats['requests'] += 1
+        analysis_stats['llm_skipped'] += int(llm_skipped)
+    emit_metrics(
+        {'LLMSkipped': int(llm_skipped), 'RuleEngineConfidence': confidence},
+        dimensions={'Action': 'deployment_check'},
+        properties={'analysis_source': analysis_source, 'cache_status': cache_status}
+    )
+
+    return deployment_config, {
+        'analysis_source': analysis_source,
+        'confidence': confidence,
+        'cache_status': cache_status,
+        'cache_key': cache_key
+    }
+
+def build_deployment_check_body(deployment_config: Dict[str, Any], request: Dict,
+                                analysis_meta: Dict[str, Any], snapshot_timings: Dict[str, Any]) -> Dict[str, Any]:
+    """deployment_check 응답 본문 구성 - Static 응답에는 요청자 정보 포함"""
+    response_data = {'service_type': deployment_config['service_type']}
+    if deployment_config['service_type'] == 'static':
+        for field in ('user_id', 'project_id', 'service_id'):
+            if request.get(field):
+                response_data[field] = request[field]
+    response_data.update(deployment_config)
+
+    response_data['metadata'] = {
+        'analysis_source': analysis_meta['analysis_source'],
+        'confidence': analysis_meta['confidence'],
+        'llm_skip_rate': round(analysis_stats['llm_skipped'] / max(analysis_stats['requests'], 1), 3),
+        'prompt_cache': {
+            'template': DEPLOYMENT_TYPE_PROMPT.describe(),
+            **get_prompt_cache_stats('analyze_deployment_type')
+        },
+        'model_route': get_route_stats('analyze_deployment_type'),
+        'snapshot_load': snapshot_timings,
+        'analysis_cache': {
+            'status': analysis_meta['cache_status'],
+            'key': analysis_meta['cache_key'],
+            'version': ANALYSIS_CACHE_VERSION,
+            **analysis_cache.stats
+        }
+    }
+    return response_data
+
+def handle_deployment_check(event: Dict) -> Dict:
+    """기능 2: 정적/동적 배포 판단 핸들러 - Static/Dynamic 각각의 형식에 맞게 반환"""
+    s3_snapshot = event.get('s3_snapshot')
+    if not s3_snapshot:
+        return {'statusCode': 400, 'body': json.dumps({'error': 's3_snapshot required'})}
+
+    # 1. 파일 로드
+    loader = S3SnapshotLoader()
+    files = loader.load_snapshot(s3_snapshot['bucket'], s3_snapshot['s3_prefix'])
+    
+    if not files:
+        return {'statusCode': 404, 'body': json.dumps({'error': 'No files found'})}
+
+    # 2. 분석 (캐시 -> 규칙 엔진 -> LLM)
+    agent = BedrockAgent()
+    deployment_config, analysis_meta = analyze_snapshot_files(files, agent)
+
+    # 3. 응답 구성
+    response_data = build_deployment_check_body(deployment_config, event, analysis_meta, loader.last_timings)
+
     print(f"Final Response: {json.dumps(response_data, indent=2)}")
     
     return {
@@ -689,6 +2110,126 @@ def handle_deployment_check(event: Dict) -> Dict:
         'body': json.dumps(response_data)
     }
 
+def batch_list_prefixes(prefixes: List[str]) -> List[str]:
+    """
+    목록 조회할 prefix (모두 '/'로 끝나는 값)
+    모든 서비스가 같은 부모 디렉터리 바로 아래에 있으면 부모 1회, 아니면 (공통 prefix가 '' 또는
+    'repo/'처럼 상위로 무너져 버킷/레포 전체를 훑게 되므로) 서비스별로 조회
+    """
+    unique = sorted(set(prefixes))
+    common_prefix = os.path.commonprefix(unique)
+    common_prefix = common_prefix[:common_prefix.rfind('/') + 1]
+    if len(unique) > 1 and common_prefix and all(p[len(common_prefix):].count('/') == 1 for p in unique):
+        return [common_prefix]
+    # 중첩된 prefix는 바깥쪽 목록에 포함되므로 제외
+    return [p for p in unique if not any(p != other and p.startswith(other) for other in unique)]
+
+def handle_deployment_check_batch(event: Dict) -> Dict:
+    """
+    기능 2-1: 모노레포 다중 서비스 배포 판단
+    - 서비스들이 같은 디렉터리 바로 아래면 공통 prefix로 한 번만 목록 조회 후 서비스별로 분할 (아니면 서비스별 조회)
+    - 매니페스트 내용이 동일한 서비스는 한 번만 분석
+    - 나머지 분석은 BATCH_ANALYSIS_CONCURRENCY 한도 내에서 병렬 실행
+    
+    요청: {"snapshots": [{"s3_snapshot": {"bucket": "...", "s3_prefix": "..."}, "service_id": "..."}, ...]}
+    응답: results[i]는 snapshots[i]에 대한 deployment_check와 같은 형식 (statusCode + body)
+    """
+    snapshots = event.get('snapshots')
+    if not isinstance(snapshots, list) or not snapshots:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'snapshots (list) is required'})}
+    if len(snapshots) > BATCH_MAX_SNAPSHOTS:
+        return {'statusCode': 400, 'body': json.dumps({
+            'error': f'Too many snapshots: {len(snapshots)} (max {BATCH_MAX_SNAPSHOTS})'
+        })}
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(snapshots)
+    by_bucket: Dict[str, List[int]] = {}
+    for index, request in enumerate(snapshots):
+        s3_snapshot = request.get('s3_snapshot') if isinstance(request, dict) else None
+        if (not isinstance(s3_snapshot, dict) or not isinstance(s3_snapshot.get('bucket'), str)
+                or not isinstance(s3_snapshot.get('s3_prefix'), str)
+                or not s3_snapshot['bucket'] or not s3_snapshot['s3_prefix'].strip('/')):
+            results[index] = {'statusCode': 400, 'body': {'error': 's3_snapshot with bucket and s3_prefix required'}}
+            continue
+        by_bucket.setdefault(s3_snapshot['bucket'], []).append(index)
+
+    # 1. 버킷별 1회 목록 조회 -> 서비스별 매니페스트 선택 -> 일괄 병렬 fetch
+    loader = S3SnapshotLoader()
+    files_by_index: Dict[int, Dict[str, str]] = {}
+    list_ms = 0.0
+    for bucket, indexes in by_bucket.items():
+        # 디렉터리 경계로 정규화 ('repo/app'이 'repo/app2/...'와 매칭되지 않도록)
+        prefixes = [snapshots[i]['s3_snapshot']['s3_prefix'].rstrip('/') + '/' for i in indexes]
+        list_start = time.perf_counter()
+        objects = []
+        for list_prefix in batch_list_prefixes(prefixes):
+            try:
+                objects += loader.list_objects(bucket, list_prefix)
+            except Exception as e:
+                print(f"Error listing S3 files ({list_prefix}): {e}")
+        list_ms += (time.perf_counter() - list_start) * 1000
+
+        manifests_by_index = {
+            i: loader.select_manifests([o for o in objects if o['Key'].startswith(prefix)])
+            for i, prefix in zip(indexes, prefixes)
+        }
+        unique_objects = {obj['Key']: obj for manifests in manifests_by_index.values() for obj in manifests.values()}
+        contents = loader.fetch_objects(bucket, list(unique_objects.values()))
+        for i, manifests in manifests_by_index.items():
+            files_by_index[i] = {name: contents[obj['Key']] for name, obj in manifests.items() if obj['Key'] in contents}
+    loader.last_timings['list_ms'] = round(list_ms, 1)
+
+    # 2. 동일 매니페스트 중복 제거
+    agent = BedrockAgent()
+    groups: Dict[str, List[int]] = {}
+    for index, files in files_by_index.items():
+        if not files:
+            results[index] = {'statusCode': 404, 'body': {'error': 'No files found'}}
+            continue
+        groups.setdefault(AnalysisCache.make_key(files, agent.route('analyze_deployment_type')['model_id']), []).append(index)
+
+    # 3. 고유 매니페스트만 병렬 분석
+    analyses: Dict[str, Any] = {}
+    if groups:
+        with ThreadPoolExecutor(max_workers=min(BATCH_ANALYSIS_CONCURRENCY, len(groups))) as executor:
+            futures = {
+                key: executor.submit(analyze_snapshot_files, files_by_index[indexes[0]], agent, key)
+                for key, indexes in groups.items()
+            }
+            for key, future in futures.items():
+                try:
+                    analyses[key] = future.result()
+                except Exception as e:
+                    print(f"Batch analysis error ({key}): {e}")
+                    analyses[key] = e
+
+    for key, indexes in groups.items():
+        for position, index in enumerate(indexes):
+            outcome = analyses[key]
+            if isinstance(outcome, BedrockInvocationError):
+                results[index] = {'statusCode': outcome.status_code, 'body': outcome.to_dict()}
+                continue
+            if isinstance(outcome, Exception):
+                results[index] = {'statusCode': 500, 'body': {'error': str(outcome)}}
+                continue
+            deployment_config, analysis_meta = outcome
+            body = build_deployment_check_body(deployment_config, snapshots[index], analysis_meta, {})
+            body['metadata']['deduplicated'] = position > 0
+            results[index] = {'statusCode': 200, 'body': body}
+
+    response_data = {
+        'count': len(snapshots),
+        'unique_analyses': len(groups),
+        'results': results,
+        'metadata': {'snapshot_load': loader.last_timings}
+    }
+    print(f"Batch deployment check: {len(snapshots)} snapshots, {len(groups)} unique manifests")
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps(response_data)
+    }
+
 def handle_cost_estimation(event: Dict) -> Dict:
     """기능 3: 비용 견적 핸들러 (기존 로직)"""
     s3_snapshot = event.get('s3_snapshot')
@@ -714,7 +2255,43 @@ def handle_cost_estimation(event: Dict) -> Dict:
         'statusCode': 200,
         'body': json.dumps({
             'repository_analysis': analysis_result,
-            'cost_estimation': cost_info
+            'cost_estimation': cost_info,
+            'prompt_cache': {
+                'template': USAGE_ESTIMATION_PROMPT.describe(),
+                **get_prompt_cache_stats('estimate_cost')
+            },
+            'model_route': get_route_stats('estimate_cost')
+        })
+    }
+
+def handle_cost_batch(event: Dict) -> Dict:
+    """기능 4: 다중 시나리오 비용 견적 (가격 매트릭스 기반, LLM 미사용)"""
+    scenarios = event.get('scenarios')
+    if scenarios is None and isinstance(event.get('grid'), dict):
+        scenarios = expand_cost_grid(event['grid'])
+
+    if not isinstance(scenarios, list) or not scenarios:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'scenarios (list) or grid is required'})}
+    if len(scenarios) > COST_BATCH_MAX_SCENARIOS:
+        return {'statusCode': 400, 'body': json.dumps({
+            'error': f'Too many scenarios: {len(scenarios)} (max {COST_BATCH_MAX_SCENARIOS})'
+        })}
+    if not all(isinstance(scenario, dict) for scenario in scenarios):
+        return {'statusCode': 400, 'body': json.dumps({'error': 'each scenario must be an object'})}
+
+    quotes = quote_cost_batch(scenarios)
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'count': len(quotes),
+            'error_count': sum(1 for quote in quotes if 'error' in quote),
+            'quotes': quotes,
+            'pricing_details': {
+                'vcpu_price_per_hour': PRICE_PER_VCPU_HOUR,
+                'memory_price_per_gb_hour': PRICE_PER_GB_HOUR,
+                'hours_per_month': HOURS_PER_MONTH
+            }
         })
     }
 
@@ -779,7 +2356,9 @@ def handler(event, _context):
                 # deployment_check는 /deployment로 매핑
                 if path_action == 'deployment':
                     action = 'deployment_check'
-                elif path_action in ['main', 'chat', 'cost']:
+                elif path_action == 'deployment_batch':
+                    action = 'deployment_check_batch'
+                elif path_action in ['main', 'chat', 'cost', 'cost_batch']:
                     action = path_action
                 else:
                     # 유효하지 않은 경로면 body에서 action 가져오기
@@ -806,13 +2385,19 @@ def handler(event, _context):
         elif action == 'deployment_check': # 정적/동적 배포 판단 핸들러
             result = handle_deployment_check(body)
         
+        elif action == 'deployment_check_batch': # 다중 서비스 배포 판단 핸들러
+            result = handle_deployment_check_batch(body)
+        
         elif action == 'cost': # 비용 견적 핸들러
             result = handle_cost_estimation(body)
+        
+        elif action == 'cost_batch': # 다중 시나리오 비용 견적 핸들러
+            result = handle_cost_batch(body)
             
         else:
             result = {
                 'statusCode': 400,
-                'body': json.dumps({'error': f"Unknown action: {action}. Use 'main', 'chat', 'deployment_check', or 'cost'"})
+                'body': json.dumps({'error': f"Unknown action: {action}. Use 'main', 'chat', 'deployment_check', 'deployment_check_batch', 'cost', or 'cost_batch'"})
             }
         
         # API Gateway 형식으로 응답 변환
@@ -831,6 +2416,19 @@ def handler(event, _context):
             # 직접 invoke는 원래 형식 그대로
             return result
             
+    except BedrockInvocationError as e:
+        # 재시도 후에도 실패한 Bedrock 호출은 기본값으로 채우지 않고 오류로 응답
+        error_response = {
+            'statusCode': e.status_code,
+            'body': json.dumps(e.to_dict())
+        }
+        if 'body' in event and 'requestContext' in event:
+            error_response['headers'] = {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            }
+        return error_response
+            
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -0,0 +1,69 @@
+"""
+Agent Lambda 클라이언트 생성 오버헤드 벤치마크
+- before: 호출마다 boto3.client()를 새로 생성하던 기존 방식
+- after : agent_lambda의 클라이언트 레지스트리 (첫 호출만 생성, 이후 재사용)
+- cold  : agent_lambda 모듈 import 시간 (boto3 지연 import 효과)
+
+실행:
+    python bench_agent_clients.py [반복 횟수]
+AWS 자격 증명은 필요 없습니다 (클라이언트 생성만 측정, 네트워크 호출 없음).
+"""
+import os
+import subprocess
+import sys
+import time
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+REGION = os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-2')
+
+def measure_import(statement):
+    """새 인터프리터에서 import 시간 측정 (ms)"""
+    code = (
+        "import time; t = time.perf_counter(); "
+        f"{statement}; "
+        "print((time.perf_counter() - t) * 1000)"
+    )
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)))
+    return float(output.decode().strip())
+
+def bench_before():
+    """핸들러마다 BedrockAgent() + S3SnapshotLoader()가 새 클라이언트를 만들던 방식"""
+    import boto3
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        boto3.client('bedrock-runtime', region_name=REGION)
+        boto3.client('s3', region_name=REGION)
+    return (time.perf_counter() - start) * 1000 / ITERATIONS
+
+def bench_after():
+    """레지스트리 사용: 첫 invocation 비용과 warm invocation 평균 비용 분리"""
+    import agent_lambda
+
+    start = time.perf_counter()
+    agent_lambda.BedrockAgent()
+    agent_lambda.S3SnapshotLoader()
+    first_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        agent_lambda.BedrockAgent()
+        agent_lambda.S3SnapshotLoader()
+    warm_ms = (time.perf_counter() - start) * 1000 / ITERATIONS
+    return first_ms, warm_ms
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print(f"Agent Lambda client overhead benchmark ({ITERATIONS} iterations)")
+    print("=" * 60)
+
+    print(f"cold import boto3        : {measure_import('import boto3'):8.2f} ms")
+    print(f"cold import agent_lambda : {measure_import('import agent_lambda'):8.2f} ms")
+
+    before_ms = bench_before()
+    first_ms, warm_ms = bench_after()
+
+    print(f"before (per invocation)  : {before_ms:8.3f} ms")
+    print(f"after  (first invocation): {first_ms:8.3f} ms")
+    print(f"after  (warm invocation) : {warm_ms:8.3f} ms")
+    if warm_ms > 0:
+        print(f"speedup (warm)           : {before_ms / warm_ms:8.1f}x")
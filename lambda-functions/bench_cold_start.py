@@ -0,0 +1,99 @@
+"""
+Cold-start benchmark for deployment_lambda_complete
+- eager : what the old module did at import (seven clients/resources up front)
+- lazy  : import time plus first invocation of each request path, with clients created on first use
+
+Every measurement runs in a fresh interpreter. AWS API calls are stubbed with a botocore
+before-send hook that returns an empty 200, so only client construction and handler code are timed.
+
+Run:
+    python bench_cold_start.py [runs per path]
+No AWS credentials or network access are needed.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Installed in every child interpreter before the module is imported
+STUB_SETUP = """
+import boto3
+from botocore.awsrequest import AWSResponse
+
+class _EmptyBody:
+    def stream(self, **kwargs):
+        yield b'{}'
+
+def _stub_send(request, **kwargs):
+    return AWSResponse(request.url, 200, {}, _EmptyBody())
+
+boto3.setup_default_session()
+boto3.DEFAULT_SESSION.events.register('before-send', _stub_send)
+"""
+
+EAGER = """
+import time
+t = time.perf_counter()
+boto3.resource('dynamodb')
+for service in ('ecs', 's3', 'cloudformation', 'codebuild', 'ecr', 'logs'):
+    boto3.client(service)
+print(json.dumps({'init_ms': (time.perf_counter() - t) * 1000, 'clients': 7}))
+"""
+
+LAZY = """
+import time
+t = time.perf_counter()
+import deployment_lambda_complete as module
+import_ms = (time.perf_counter() - t) * 1000
+t = time.perf_counter()
+module.handler(EVENT, None)
+print(json.dumps({'import_ms': import_ms, 'first_call_ms': (time.perf_counter() - t) * 1000, 'clients': len(module._clients)}))
+"""
+
+PATHS = {
+    'status': {
+        'requestContext': {'http': {'method': 'GET', 'path': '/status'}},
+        'rawPath': '/status',
+        'queryStringParameters': {'user_id': 'u', 'project_id': 'p', 'service_id': 's', 'deployment_id': 'bench'}
+    },
+    'deploy (queued)': {
+        'requestContext': {'http': {'method': 'POST', 'path': '/deploy'}},
+        'rawPath': '/deploy',
+        'body': json.dumps({'user_id': 'u', 'project_id': 'p', 'service_id': 's', 'service_type': 'static'})
+    },
+    'cloudfront tracker': {'source': 'aws.events', 'detail-type': 'Scheduled Event'}
+}
+
+def run_child(code, event=None):
+    """Run one measurement in a new interpreter and return its JSON result"""
+    env = dict(os.environ)
+    env.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-2')
+    env.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+    env.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+    env.setdefault('DEPLOYMENT_QUEUE_URL', 'https://sqs.ap-northeast-2.amazonaws.com/000000000000/bench')
+    script = "import json, logging\nlogging.disable(logging.CRITICAL)\n" + STUB_SETUP
+    script += f"EVENT = json.loads({json.dumps(json.dumps(event))})\n" + code
+    output = subprocess.check_output([sys.executable, '-c', script], cwd=HERE, env=env)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+def median(results, key):
+    return statistics.median(result[key] for result in results)
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print(f"deployment_lambda_complete cold-start benchmark ({RUNS} runs, median)")
+    print("=" * 60)
+
+    eager = [run_child(EAGER) for _ in range(RUNS)]
+    print(f"eager client init (old import)   : {median(eager, 'init_ms'):8.1f} ms  (7 clients)")
+
+    for name, event in PATHS.items():
+        lazy = [run_child(LAZY, event) for _ in range(RUNS)]
+        print(
+            f"lazy {name:<28}: import {median(lazy, 'import_ms'):7.1f} ms, "
+            f"first call {median(lazy, 'first_call_ms'):7.1f} ms  ({lazy[0]['clients']} clients)"
+        )
@@ -1,22 +1,184 @@
 import json
+import base64
+import hashlib
 import boto3
 import logging
 import uuid
 import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from boto3.dynamodb.conditions import Key
 from datetime import datetime
+from pagination import InvalidCursor, decode_cursor, encode_cursor, page_limit
 import os
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
-ecs_client = boto3.client('ecs')
-s3_client = boto3.client('s3')
-cloudformation_client = boto3.client('cloudformation')
-codebuild_client = boto3.client('codebuild')
-ecr_client = boto3.client('ecr')
-logs_client = boto3.client('logs')
+# AWS clients are created on first use, so a cold start only pays for the services its path touches
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(service):
+    """Shared boto3 client for a service, created on first use"""
+    return _get_or_create(('client', service), lambda: count_aws_calls(boto3.client(service)))
+
+def get_resource(service):
+    """Shared boto3 resource for a service, created on first use"""
+    return _get_or_create(('resource', service), lambda: count_aws_calls(boto3.resource(service)))
+
+def _get_or_create(key, factory):
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
+
+# Step metrics: one EMF log line per step (dimensions service_type + step)
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'Haifu/Deployment')
+STEP_METRIC_UNITS = {'Duration': 'Milliseconds', 'AwsCalls': 'Count', 'Retries': 'Count', 'Failed': 'Count'}
+_current_step = contextvars.ContextVar('current_step', default=None)
+
+def count_aws_calls(client):
+    """Attribute every API call made by this client (or resource) to the step running it"""
+    meta_client = client.meta.client if hasattr(client.meta, 'client') else client
+    meta_client.meta.events.register('after-call', record_aws_call)
+    return client
+
+def record_aws_call(parsed=None, **kwargs):
+    step = _current_step.get()
+    if step is not None:
+        step.record_call((parsed or {}).get('ResponseMetadata', {}).get('RetryAttempts', 0))
+
+def emit_metrics(metrics, dimensions, properties=None):
+    """Print one CloudWatch Embedded Metric Format record (print keeps the Lambda log prefix off)"""
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [list(dimensions.keys())],
+                'Metrics': [{'Name': name, 'Unit': STEP_METRIC_UNITS.get(name, 'None')} for name in metrics]
+            }]
+        },
+        **dimensions,
+        **(properties or {}),
+        **metrics
+    }
+    print(json.dumps(record, default=str))
+
+class StepMetrics:
+    """
+    Context manager that times a deployment step, counts the AWS calls and retries made
+    inside it and emits them as EMF metrics. Nested steps count toward their parents too,
+    and every nested duration lands in the outermost step's timings.
+    Worker threads only see the current step if submitted through contextvars.copy_context().run.
+    """
+    def __init__(self, step, service_type=None):
+        self.step = step
+        self.parent = _current_step.get()
+        self.service_type = service_type or (self.parent.service_type if self.parent else 'unknown')
+        self.timings = self.parent.timings if self.parent else {}
+        self.aws_calls = 0
+        self.retries = 0
+        self.duration_ms = None
+        self._lock = threading.Lock()
+    
+    def __enter__(self):
+        self._token = _current_step.set(self)
+        self._start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ms = elapsed_ms(self._start)
+        _current_step.reset(self._token)
+        if self.parent:
+            self.timings[self.step] = self.duration_ms
+        try:
+            emit_metrics(
+                {'Duration': self.duration_ms, 'AwsCalls': self.aws_calls, 'Retries': self.retries, 'Failed': int(exc_type is not None)},
+                {'service_type': self.service_type, 'step': self.step},
+                {'outcome': 'error' if exc_type else 'success'}
+            )
+        except Exception as e:
+            logger.warning(f"Failed to emit metrics for step {self.step}: {str(e)}")
+        return False
+    
+    def record_call(self, retries=0):
+        with self._lock:
+            self.aws_calls += 1
+            self.retries += retries
+        if self.parent:
+            self.parent.record_call(retries)
+
+# Job mode: /deploy enqueues onto this queue and an SQS-triggered invocation runs the steps
+DEPLOYMENT_QUEUE_URL = os.environ.get('DEPLOYMENT_QUEUE_URL')
+DEPLOYMENT_MAX_ATTEMPTS = int(os.environ.get('DEPLOYMENT_MAX_ATTEMPTS', '3'))
+# A failed job is redelivered after this backoff instead of the queue's (long) visibility timeout
+DEPLOYMENT_RETRY_BASE_DELAY_SECONDS = int(os.environ.get('DEPLOYMENT_RETRY_BASE_DELAY_SECONDS', '30'))
+DEPLOYMENT_RETRY_MAX_DELAY_SECONDS = int(os.environ.get('DEPLOYMENT_RETRY_MAX_DELAY_SECONDS', '300'))
+TERMINAL_STATUSES = ('SUCCESS', 'FAILED')
+
+# Upper bound on provisioning steps running at the same time
+STEP_GRAPH_MAX_WORKERS = int(os.environ.get('STEP_GRAPH_MAX_WORKERS', '4'))
+
+# Account/network/role settings are loaded once per container and refreshed after this TTL
+CONFIG_CACHE_TTL_SECONDS = int(os.environ.get('CONFIG_CACHE_TTL_SECONDS', '900'))
+SSM_CONFIG_PARAMETERS = {
+    'private_subnets': '/haifu/vpc/private-subnets',
+    'ecs_security_group': '/haifu/vpc/ecs-security-group'
+}
+_config_cache = {'values': None, 'loaded_at': 0.0}
+_config_cache_lock = threading.Lock()
+
+# Status listing: service_id+timestamp GSI on the deployment status table
+DEPLOYMENT_SERVICE_INDEX = os.environ.get('DEPLOYMENT_SERVICE_INDEX', 'service-index')
+STATUS_PAGE_DEFAULT_LIMIT = 20
+STATUS_PAGE_MAX_LIMIT = 100
+
+# /status reads only the current-state fields; step progress comes from the event log
+DEPLOYMENT_STATUS_FIELDS = (
+    'deployment_id', 'status', 'message', 'timestamp', 'version', 'current_step', 'step_timings',
+    'user_id', 'project_id', 'service_id', 'service_type'
+)
+
+# Append-only event log: deployment_id + event_key (timestamp-prefixed) sort-key range per deployment
+DEPLOYMENT_EVENTS_TABLE = 'deployment-events'
+DEPLOYMENT_EVENT_TTL_DAYS = int(os.environ.get('DEPLOYMENT_EVENT_TTL_DAYS', '30'))
+EVENT_FLUSH_BATCH_SIZE = 25  # BatchWriteItem limit
+
+# Static asset copy: default boto3 connection pool is 10, so keep workers within it
+COPY_MAX_WORKERS = int(os.environ.get('COPY_MAX_WORKERS', '10'))
+MULTIPART_COPY_THRESHOLD = 5 * 1024 ** 3  # copy_object limit
+MULTIPART_COPY_PART_SIZE = 512 * 1024 ** 2
+# Copy manifest: dest_bucket + dest_key -> source ETag, kept in DynamoDB because destination buckets are public
+COPY_MANIFEST_TABLE = 'copy-manifests'
+
+# Bucket-wide access modes are stable, so remember them per container
+BUCKET_ACCESS_CACHE_TTL_SECONDS = int(os.environ.get('BUCKET_ACCESS_CACHE_TTL_SECONDS', '3600'))
+BUCKET_ACCESS_CACHEABLE_MODES = ('oai_required', 'policy_applied')
+ACCESS_READY_MAX_ATTEMPTS = 6
+ACCESS_READY_BASE_DELAY_SECONDS = 0.25
+_bucket_access_cache = {}
+
+# One CloudFront distribution per bucket+source path, reused across redeploys
+CLOUDFRONT_REGISTRY_TABLE = 'cloudfront-distributions'
+
+# Scheduled readiness tracker: sparse GSI holds only distributions still propagating
+CLOUDFRONT_PENDING_INDEX = 'pending-index'
+CLOUDFRONT_PRICE_CLASS = 'PriceClass_All'  # CloudFront's default, stated so refresh can compare it
+CLOUDFRONT_TRACKING_BASE_DELAY_SECONDS = 60
+CLOUDFRONT_TRACKING_MAX_DELAY_SECONDS = 600
+CLOUDFRONT_TRACKING_TIMEOUT_SECONDS = int(os.environ.get('CLOUDFRONT_TRACKING_TIMEOUT_SECONDS', '3600'))
+
+class InvalidRequest(ValueError):
+    """Client error detected after routing (bad status parameters); returned as 400"""
+
+class DeploymentRetry(Exception):
+    """Raised by the job worker so SQS redelivers the message"""
 
 def handler(event, context):
     """
@@ -25,6 +187,15 @@ def handler(event, context):
     try:
         logger.info(f"Received event: {json.dumps(event, default=str)}")
         
+        # SQS-triggered deployment worker
+        records = event.get('Records') or []
+        if records and records[0].get('eventSource') == 'aws:sqs':
+            return handle_sqs_event(event)
+        
+        # EventBridge schedule: CloudFront readiness tracker
+        if event.get('source') == 'aws.events' and event.get('detail-type') == 'Scheduled Event':
+            return track_pending_distributions()
+        
         # Parse request method and path
         if 'requestContext' in event and 'http' in event['requestContext']:
             http_method = event['requestContext']['http']['method']
@@ -53,7 +224,9 @@ def handler(event, context):
             return create_error_response(400, validation_result['error'])
         
         # Route to appropriate handler
-        if action == 'deploy':
+        if action == 'deploy' and should_enqueue(params):
+            return create_success_response(enqueue_deployment(params), status_code=202)
+        elif action == 'deploy':
             result = handle_deployment(params)
         elif action == 'status':
             result = handle_status(params)
@@ -64,6 +237,8 @@ def handler(event, context):
         
         return create_success_response(result)
         
+    except (InvalidRequest, InvalidCursor) as e:
+        return create_error_response(400, str(e))
     except Exception as e:
         logger.error(f"Error: {str(e)}", exc_info=True)
         return create_error_response(500, str(e))
@@ -77,7 +252,10 @@ def extract_parameters(event, http_method):
             'project_id': query_params.get('project_id'),
             'service_id': query_params.get('service_id'),
             'service_type': query_params.get('service_type'),
-            'deployment_id': query_params.get('deployment_id')
+            'deployment_id': query_params.get('deployment_id'),
+            'limit': query_params.get('limit'),
+            'cursor': query_params.get('cursor'),
+            'events': query_params.get('events') in ('true', '1')
         }
     else:
         # Handle both API Gateway and Lambda Function URL formats
@@ -86,7 +264,6 @@ def extract_parameters(event, http_method):
         
         if raw_body and raw_body != '{}':
             if event.get('isBase64Encoded', False):
-                import base64
                 raw_body = base64.b64decode(raw_body).decode('utf-8')
             
             try:
@@ -115,7 +292,11 @@ def extract_parameters(event, http_method):
             'memory': body.get('memory', 512),
             'port': body.get('port', 80),
             'min_capacity': body.get('min_capacity', 1),
-            'max_capacity': body.get('max_capacity', 10)
+            'max_capacity': body.get('max_capacity', 10),
+            'limit': body.get('limit'),
+            'cursor': body.get('cursor'),
+            'events': bool(body.get('events')),
+            'async': body.get('async')
         }
 
 def validate_parameters(params, action):
@@ -145,35 +326,270 @@ def validate_parameters(params, action):
     
     return {'valid': True}
 
-def handle_deployment(params):
+def should_enqueue(params):
+    """Use job mode when a queue is configured, unless the caller asks for a synchronous deploy"""
+    if params.get('async') is None:
+        return bool(DEPLOYMENT_QUEUE_URL)
+    if params['async'] and not DEPLOYMENT_QUEUE_URL:
+        logger.warning("Async deployment requested but DEPLOYMENT_QUEUE_URL is not set; running synchronously")
+    return bool(params['async']) and bool(DEPLOYMENT_QUEUE_URL)
+
+def enqueue_deployment(params):
+    """Record a PENDING deployment and hand it to the SQS worker"""
+    deployment_id = params['deployment_id']
+    
+    table = get_resource('dynamodb').Table('deployment-status')
+    item = {
+        'deployment_id': deployment_id,
+        'status': 'PENDING',
+        'message': f"Queued {params['service_type']} deployment",
+        'timestamp': datetime.utcnow().isoformat(),
+        'version': 1,
+        'user_id': params['user_id'],
+        'project_id': params['project_id'],
+        'service_id': params['service_id'],
+        'service_type': params['service_type'],
+        'step_results': {}
+    }
+    table.put_item(Item=item)
+    write_deployment_events([build_deployment_event(deployment_id, 'status', status='PENDING', message=item['message'], version=1)])
+    
+    try:
+        get_client('sqs').send_message(
+            QueueUrl=DEPLOYMENT_QUEUE_URL,
+            MessageBody=json.dumps({'deployment_id': deployment_id, 'params': params}, default=str)
+        )
+    except Exception as e:
+        update_deployment_status(deployment_id, 'FAILED', f'Failed to enqueue deployment: {str(e)}')
+        raise
+    
+    logger.info(f"Enqueued deployment {deployment_id}")
+    return {
+        'deployment_id': deployment_id,
+        'status': 'PENDING',
+        'service_type': params['service_type'],
+        'message': 'Deployment queued. Poll /status with deployment_id for progress.',
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
+def handle_sqs_event(event):
+    """SQS worker entry point; failed messages are reported back for redelivery"""
+    failures = []
+    for record in event.get('Records', []):
+        try:
+            job = json.loads(record['body'])
+            attempt = int(record.get('attributes', {}).get('ApproximateReceiveCount', '1'))
+            process_deployment_job(job, final_attempt=attempt >= DEPLOYMENT_MAX_ATTEMPTS)
+        except Exception as e:
+            logger.error(f"Deployment job failed (message {record.get('messageId')}): {str(e)}")
+            schedule_job_retry(record)
+            failures.append({'itemIdentifier': record['messageId']})
+    return {'batchItemFailures': failures}
+
+def schedule_job_retry(record):
+    """Shorten the failed message's visibility so SQS redelivers it after an exponential backoff"""
+    attempt = int(record.get('attributes', {}).get('ApproximateReceiveCount', '1'))
+    delay = min(DEPLOYMENT_RETRY_MAX_DELAY_SECONDS, DEPLOYMENT_RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+    queue_url = DEPLOYMENT_QUEUE_URL
+    if not queue_url and record.get('eventSourceARN'):
+        # arn:aws:sqs:<region>:<account>:<queue>
+        _, _, _, region, account, queue_name = record['eventSourceARN'].split(':', 5)
+        queue_url = f"https://sqs.{region}.amazonaws.com/{account}/{queue_name}"
+    try:
+        get_client('sqs').change_message_visibility(
+            QueueUrl=queue_url,
+            ReceiptHandle=record['receiptHandle'],
+            VisibilityTimeout=delay
+        )
+        logger.info(f"Retrying message {record.get('messageId')} in {delay}s (attempt {attempt})")
+    except Exception as e:
+        # Falls back to the queue's visibility timeout
+        logger.warning(f"Could not shorten visibility for {record.get('messageId')}: {str(e)}")
+
+def process_deployment_job(job, final_attempt=True):
+    """Run a queued deployment, resuming from the steps already checkpointed on its status item"""
+    deployment_id = job['deployment_id']
+    params = job['params']
+    
+    table = get_resource('dynamodb').Table('deployment-status')
+    item = table.get_item(Key={'deployment_id': deployment_id}).get('Item') or {}
+    if item.get('status') in TERMINAL_STATUSES:
+        logger.info(f"Deployment {deployment_id} already {item['status']}, skipping duplicate message")
+        return
+    
+    checkpoint = DeploymentCheckpoint(deployment_id, item.get('step_results') or {}, persist=True)
+    result = handle_deployment(params, checkpoint=checkpoint, final_attempt=final_attempt)
+    if result.get('status') == 'RETRYING':
+        raise DeploymentRetry(result.get('error') or result.get('message', 'Deployment step failed'))
+
+class DeploymentCheckpoint:
+    """
+    Records completed step results so a redelivered job skips work already done.
+    With persist=True each result is written to step_results on the deployment-status item.
+    Step events are buffered and appended to the event log in batches (see flush_events).
+    """
+    def __init__(self, deployment_id, completed=None, persist=False):
+        self.deployment_id = deployment_id
+        self.completed = dict(completed or {})
+        self.persist = persist
+        self.events = []
+        self._events_lock = threading.Lock()
+    
+    def run(self, step, fn, *args, **kwargs):
+        if step in self.completed:
+            logger.info(f"Skipping completed step {step} for {self.deployment_id}")
+            self.record_event('step_skipped', step=step)
+            return self.completed[step]
+        
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.record_event('step_failed', step=step, error=str(e), duration_ms=elapsed_ms(start))
+            raise
+        # DynamoDB cannot store a bare None step marker meaningfully
+        self.completed[step] = result if result is not None else True
+        self.record_event('step_completed', step=step, duration_ms=elapsed_ms(start))
+        
+        if self.persist:
+            try:
+                get_resource('dynamodb').Table('deployment-status').update_item(
+                    Key={'deployment_id': self.deployment_id},
+                    UpdateExpression='SET step_results.#step = :result, current_step = :step, #ts = :ts, '
+                                     '#version = if_not_exists(#version, :zero) + :one',
+                    ExpressionAttributeNames={'#step': step, '#ts': 'timestamp', '#version': 'version'},
+                    ExpressionAttributeValues={
+                        ':result': self.completed[step],
+                        ':step': step,
+                        ':ts': datetime.utcnow().isoformat(),
+                        ':zero': 0,
+                        ':one': 1
+                    }
+                )
+            except Exception as e:
+                logger.warning(f"Failed to checkpoint step {step}: {str(e)}")
+        return result
+    
+    def record_event(self, event_type, **fields):
+        """Buffer a step event; a full batch is flushed right away"""
+        with self._events_lock:
+            self.events.append(build_deployment_event(self.deployment_id, event_type, **fields))
+            full = len(self.events) >= EVENT_FLUSH_BATCH_SIZE
+        if full:
+            self.flush_events()
+    
+    def flush_events(self):
+        """Append buffered events to the event log (best effort; a failed batch is dropped)"""
+        with self._events_lock:
+            events, self.events = self.events, []
+        write_deployment_events(events)
+
+def elapsed_ms(start):
+    """Whole milliseconds since start (DynamoDB items cannot hold floats)"""
+    return int((time.perf_counter() - start) * 1000)
+
+def build_deployment_event(deployment_id, event_type, **fields):
+    """One event-log item; event_key sorts by time within the deployment's range"""
+    now = datetime.utcnow()
+    item = {
+        'deployment_id': deployment_id,
+        'event_key': f"{now.isoformat()}#{event_type}#{uuid.uuid4().hex[:8]}",
+        'event_type': event_type,
+        'timestamp': now.isoformat(),
+        'expires_at': int(time.time()) + DEPLOYMENT_EVENT_TTL_DAYS * 86400
+    }
+    item.update({name: value for name, value in fields.items() if value is not None})
+    return item
+
+def write_deployment_events(events):
+    """Append events with BatchWriteItem (the batch writer resends unprocessed items)"""
+    if not events:
+        return
+    try:
+        with get_resource('dynamodb').Table(DEPLOYMENT_EVENTS_TABLE).batch_writer() as batch:
+            for event in events:
+                batch.put_item(Item=event)
+    except Exception as e:
+        logger.warning(f"Failed to write {len(events)} deployment events: {str(e)}")
+
+def run_step_graph(steps, checkpoint, max_workers=STEP_GRAPH_MAX_WORKERS):
+    """
+    Run provisioning steps concurrently while respecting their dependencies.
+    steps maps name -> (dependency names, fn(results)); a step starts as soon as all of
+    its dependencies have finished. Returns (results, step_timings_ms). The first
+    failing step is re-raised after in-flight steps finish; nothing new is started.
+    """
+    results = {}
+    step_timings = {}
+    pending = dict(steps)
+    running = {}
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            ready = [name for name, (deps, _) in pending.items() if all(dep in results for dep in deps)]
+            for name in ready:
+                _, fn = pending.pop(name)
+                running[executor.submit(contextvars.copy_context().run, run_timed_step, name, fn, results, checkpoint)] = name
+            
+            if not running:
+                raise ValueError(f"Unresolvable step dependencies: {sorted(pending)}")
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name], step_timings[name] = future.result()
+                logger.info(f"Step {name} finished in {step_timings[name]} ms")
+    
+    return results, step_timings
+
+def run_timed_step(name, fn, results, checkpoint):
+    """Run one graph step through the checkpoint and measure its duration in ms"""
+    with StepMetrics(name) as step:
+        result = checkpoint.run(name, fn, results)
+    return result, step.duration_ms
+
+def handle_deployment(params, checkpoint=None, final_attempt=True):
     """Handle deployment request with real deployment logic"""
     try:
         deployment_id = params['deployment_id']
         service_type = params['service_type']
-        
-        # Update deployment status to DEPLOYING
-        update_deployment_status(
-            deployment_id=deployment_id,
-            status='DEPLOYING',
-            message=f'Starting {service_type} deployment',
-            user_id=params['user_id'],
-            project_id=params['project_id'],
-            service_id=params['service_id'],
-            service_type=service_type
-        )
-        
-        # Execute deployment based on service type
-        if service_type == 'static':
-            result = deploy_static_service(params)
+        checkpoint = checkpoint or DeploymentCheckpoint(deployment_id)
+        
+        with StepMetrics('deployment', service_type) as deployment_step:
+            # Update deployment status to DEPLOYING
+            with StepMetrics('status_update'):
+                update_deployment_status(
+                    deployment_id=deployment_id,
+                    status='DEPLOYING',
+                    message=f'Starting {service_type} deployment',
+                    user_id=params['user_id'],
+                    project_id=params['project_id'],
+                    service_id=params['service_id'],
+                    service_type=service_type,
+                    restart=not checkpoint.persist
+                )
+            
+            # Execute deployment based on service type
+            if service_type == 'static':
+                result = deploy_static_service(params, checkpoint)
+            else:
+                result = deploy_dynamic_service(params, checkpoint)
+        step_timings = {**deployment_step.timings, 'total': deployment_step.duration_ms}
+        
+        # Update final status (a queued job that can still be retried is not final)
+        if result['success'] and result.get('distribution_pending'):
+            # The CloudFront tracker writes SUCCESS once the distribution is Deployed
+            final_status = 'DISTRIBUTING'
+        elif result['success']:
+            final_status = 'SUCCESS'
         else:
-            result = deploy_dynamic_service(params)
-        
-        # Update final status
-        final_status = 'SUCCESS' if result['success'] else 'FAILED'
+            final_status = 'FAILED' if final_attempt else 'RETRYING'
+        checkpoint.flush_events()
         update_deployment_status(
             deployment_id=deployment_id,
             status=final_status,
-            message=result.get('message', 'Deployment completed')
+            message=result.get('message') or result.get('error') or 'Deployment completed',
+            step_timings=step_timings
         )
         
         return {
@@ -181,24 +597,30 @@ def handle_deployment(params):
             'status': final_status,
             'service_type': service_type,
             'timestamp': datetime.utcnow().isoformat(),
-            **result
+            **result,
+            'step_timings': step_timings
         }
         
     except Exception as e:
         logger.error(f"Deployment error: {str(e)}")
+        status = 'FAILED' if final_attempt else 'RETRYING'
+        if checkpoint:
+            checkpoint.flush_events()
         update_deployment_status(
             deployment_id=params.get('deployment_id'),
-            status='FAILED',
+            status=status,
             message=str(e)
         )
         return {
             'success': False,
+            'status': status,
             'error': str(e),
             'deployment_id': params.get('deployment_id')
         }
 
-def deploy_static_service(params):
+def deploy_static_service(params, checkpoint=None):
     """Deploy static service using existing S3 bucket"""
+    checkpoint = checkpoint or DeploymentCheckpoint(params['deployment_id'])
     try:
         # Use existing bucket and configure the specific path for static hosting
         bucket_name = 'haifu-github-snapshot'
@@ -207,24 +629,25 @@ def deploy_static_service(params):
         logger.info(f"Deploying static site from {bucket_name}/{source_key}")
         
         # 1. Check if source files exist
-        try:
-            response = s3_client.list_objects_v2(
-                Bucket=bucket_name,
-                Prefix=source_key,
-                MaxKeys=5
-            )
-            
-            if 'Contents' in response and len(response['Contents']) > 0:
-                logger.info(f"Found {len(response['Contents'])} files:")
-                for obj in response['Contents']:
-                    logger.info(f"  - {obj['Key']}")
-                source_exists = True
-            else:
-                logger.info(f"No files found with prefix: {source_key}")
+        with StepMetrics('check_source'):
+            try:
+                response = get_client('s3').list_objects_v2(
+                    Bucket=bucket_name,
+                    Prefix=source_key,
+                    MaxKeys=5
+                )
+                
+                if 'Contents' in response and len(response['Contents']) > 0:
+                    logger.info(f"Found {len(response['Contents'])} files:")
+                    for obj in response['Contents']:
+                        logger.info(f"  - {obj['Key']}")
+                    source_exists = True
+                else:
+                    logger.info(f"No files found with prefix: {source_key}")
+                    source_exists = False
+            except Exception as e:
+                logger.error(f"Error checking source files: {str(e)}")
                 source_exists = False
-        except Exception as e:
-            logger.error(f"Error checking source files: {str(e)}")
-            source_exists = False
         
         if not source_exists:
             return {
@@ -233,40 +656,44 @@ def deploy_static_service(params):
             }
         
         # 2. Configure S3 website hosting
-        try:
-            s3_client.put_bucket_website(
-                Bucket=bucket_name,
-                WebsiteConfiguration={
-                    'IndexDocument': {'Suffix': 'index.html'},
-                    'ErrorDocument': {'Key': 'index.html'}
-                }
-            )
-            logger.info(f"Configured S3 website hosting for {bucket_name}")
-        except Exception as e:
-            logger.warning(f"Failed to configure website hosting: {str(e)}")
+        with StepMetrics('website_hosting'):
+            try:
+                get_client('s3').put_bucket_website(
+                    Bucket=bucket_name,
+                    WebsiteConfiguration={
+                        'IndexDocument': {'Suffix': 'index.html'},
+                        'ErrorDocument': {'Key': 'index.html'}
+                    }
+                )
+                logger.info(f"Configured S3 website hosting for {bucket_name}")
+            except Exception as e:
+                logger.warning(f"Failed to configure website hosting: {str(e)}")
         
         # 3. Check and configure S3 bucket for CloudFront access
-        check_and_configure_bucket_access(bucket_name, source_key)
+        with StepMetrics('bucket_access'):
+            check_and_configure_bucket_access(bucket_name, source_key)
         
         # 4. List available files for deployment
-        try:
-            response = s3_client.list_objects_v2(
-                Bucket=bucket_name,
-                Prefix=source_key,
-                MaxKeys=10
-            )
-            
-            if 'Contents' in response:
-                logger.info(f"Found {len(response['Contents'])} files to deploy:")
-                for obj in response['Contents']:
-                    logger.info(f"  - {obj['Key']}")
-            else:
-                logger.info(f"No files found under {source_key}")
-        except Exception as e:
-            logger.error(f"Error listing S3 files: {str(e)}")
+        with StepMetrics('list_files'):
+            try:
+                response = get_client('s3').list_objects_v2(
+                    Bucket=bucket_name,
+                    Prefix=source_key,
+                    MaxKeys=10
+                )
+                
+                if 'Contents' in response:
+                    logger.info(f"Found {len(response['Contents'])} files to deploy:")
+                    for obj in response['Contents']:
+                        logger.info(f"  - {obj['Key']}")
+                else:
+                    logger.info(f"No files found under {source_key}")
+            except Exception as e:
+                logger.error(f"Error listing S3 files: {str(e)}")
         
-        # 3. Create CloudFront distribution
-        cloudfront_result = create_cloudfront_distribution(bucket_name, source_key)
+        # 3. Create CloudFront distribution (checkpointed so a retry never creates a second one)
+        with StepMetrics('cloudfront_distribution'):
+            cloudfront_result = checkpoint.run('cloudfront_distribution', create_cloudfront_distribution, bucket_name, source_key)
         
         if not cloudfront_result:
             return {
@@ -275,19 +702,30 @@ def deploy_static_service(params):
             }
         
         # 4. Check CloudFront deployment status
-        distribution_status = check_cloudfront_status(cloudfront_result.get('distribution_id'))
+        with StepMetrics('cloudfront_status'):
+            distribution_status = check_cloudfront_status(cloudfront_result.get('distribution_id'))
+            distribution_pending = distribution_status.get('status') == 'InProgress'
+            if distribution_pending:
+                start_distribution_tracking(bucket_name, source_key, params, cloudfront_result)
+        
+        if cloudfront_result.get('action') == 'invalidated':
+            wait_hint = 'Cache invalidation usually completes within a few minutes.'
+        else:
+            wait_hint = 'Wait 5-15 minutes for deployment.'
         
         return {
             'success': True,
-            'message': f'Static service deployed via CloudFront. Status: {distribution_status.get("status", "Unknown")}. Wait 5-15 minutes for deployment.',
+            'message': f'Static service deployed via CloudFront. Status: {distribution_status.get("status", "Unknown")}. {wait_hint}',
             'bucket_name': bucket_name,
             'source_path': source_key,
             'website_url': cloudfront_result.get('url'),
             'cloudfront_url': cloudfront_result.get('url'),
             'cloudfront_status': distribution_status.get('status'),
             'distribution_id': cloudfront_result.get('distribution_id'),
+            'cloudfront_action': cloudfront_result.get('action'),
+            'distribution_pending': distribution_pending,
             'deployment_time': distribution_status.get('last_modified'),
-            'note': 'CloudFront deployment takes 5-15 minutes. Check status with /status endpoint.',
+            'note': 'CloudFront deployment takes 5-15 minutes. Status moves to SUCCESS (pushed to WebSocket subscribers) once it is Deployed.',
             'build_commands': params.get('build_commands', []),
             'build_output_dir': params.get('build_output_dir', 'dist'),
             'node_version': params.get('node_version', '18')
@@ -297,29 +735,32 @@ def deploy_static_service(params):
         logger.error(f"Static deployment error: {str(e)}")
         return {'success': False, 'error': str(e)}
 
-def deploy_dynamic_service(params):
+def deploy_dynamic_service(params, checkpoint=None):
     """Deploy dynamic service using ECS Fargate"""
+    checkpoint = checkpoint or DeploymentCheckpoint(params['deployment_id'])
     try:
         service_name = f"user-{params['user_id']}-project-{params['project_id']}-service-{params['service_id']}"
         cluster_name = 'haifu-dev-user-services'
         
-        # 1. Create CloudWatch log group
-        create_log_group(service_name)
-        
-        # 2. Create ECR repository
-        create_ecr_repository(service_name)
-        
-        # 3. Register ECS task definition
-        task_definition_arn = register_task_definition(params, service_name)
-        
-        # 4. Create or update ECS service
-        service_arn = create_ecs_service(params, service_name, cluster_name, task_definition_arn)
-        
-        # 5. Setup auto-scaling
-        setup_auto_scaling(service_name, cluster_name, params)
+        # Provisioning steps as a dependency graph: log group, ECR repository and task
+        # definition are independent; the service needs all three, auto-scaling needs the
+        # service and the image build only needs the repository.
+        steps = {
+            'log_group': ((), lambda results: create_log_group(service_name)),
+            'ecr_repository': ((), lambda results: create_ecr_repository(service_name)),
+            'task_definition': ((), lambda results: register_task_definition(params, service_name)),
+            'ecs_service': (
+                ('log_group', 'ecr_repository', 'task_definition'),
+                lambda results: create_ecs_service(params, service_name, cluster_name, results['task_definition'])
+            ),
+            'auto_scaling': (('ecs_service',), lambda results: setup_auto_scaling(service_name, cluster_name, params)),
+            'docker_build': (('ecr_repository',), lambda results: trigger_docker_build(params, service_name))
+        }
+        results, step_timings = run_step_graph(steps, checkpoint)
         
-        # 6. Trigger Docker image build (if source exists)
-        build_result = trigger_docker_build(params, service_name)
+        task_definition_arn = results['task_definition']
+        service_arn = results['ecs_service']
+        build_result = results['docker_build']
         
         return {
             'success': True,
@@ -331,7 +772,8 @@ def deploy_dynamic_service(params):
             'cpu': params.get('cpu', 256),
             'memory': params.get('memory', 512),
             'port': params.get('port', 80),
-            'build_status': build_result.get('status', 'PENDING')
+            'build_status': build_result.get('status', 'PENDING'),
+            'step_timings': step_timings
         }
         
     except Exception as e:
@@ -342,17 +784,18 @@ def deploy_dynamic_service(params):
 
 def register_task_definition(params, service_name):
     """Register ECS task definition"""
+    config = get_deployment_config()
     task_definition = {
         'family': f'haifu-dev-{service_name}',
         'networkMode': 'awsvpc',
         'requiresCompatibilities': ['FARGATE'],
         'cpu': str(params['cpu']),
         'memory': str(params['memory']),
-        'executionRoleArn': f"arn:aws:iam::{get_account_id()}:role/haifu-dev-ecs-execution-role",
-        'taskRoleArn': f"arn:aws:iam::{get_account_id()}:role/haifu-dev-ecs-task-role",
+        'executionRoleArn': config['ecs_execution_role_arn'],
+        'taskRoleArn': config['ecs_task_role_arn'],
         'containerDefinitions': [{
             'name': service_name,
-            'image': f"{get_account_id()}.dkr.ecr.ap-northeast-2.amazonaws.com/haifu-dev-{service_name}:latest",
+            'image': f"{config['account_id']}.dkr.ecr.{config['region']}.amazonaws.com/haifu-dev-{service_name}:latest",
             'cpu': params['cpu'],
             'memory': params['memory'],
             'essential': True,
@@ -362,21 +805,21 @@ def register_task_definition(params, service_name):
                 'logDriver': 'awslogs',
                 'options': {
                     'awslogs-group': f'/ecs/haifu-dev-{service_name}',
-                    'awslogs-region': 'ap-northeast-2',
+                    'awslogs-region': config['region'],
                     'awslogs-stream-prefix': 'ecs'
                 }
             }
         }]
     }
     
-    response = ecs_client.register_task_definition(**task_definition)
+    response = get_client('ecs').register_task_definition(**task_definition)
     return response['taskDefinition']['taskDefinitionArn']
 
 def create_ecs_service(params, service_name, cluster_name, task_definition_arn):
     """Create ECS service"""
     try:
         # Try to update existing service first
-        ecs_client.update_service(
+        get_client('ecs').update_service(
             cluster=cluster_name,
             service=f'haifu-dev-{service_name}',
             taskDefinition=task_definition_arn,
@@ -384,9 +827,9 @@ def create_ecs_service(params, service_name, cluster_name, task_definition_arn):
         )
         logger.info(f"Updated existing ECS service: haifu-dev-{service_name}")
         
-    except ecs_client.exceptions.ServiceNotFoundException:
+    except get_client('ecs').exceptions.ServiceNotFoundException:
         # Create new service if it doesn't exist
-        response = ecs_client.create_service(
+        response = get_client('ecs').create_service(
             cluster=cluster_name,
             serviceName=f'haifu-dev-{service_name}',
             taskDefinition=task_definition_arn,
@@ -403,12 +846,13 @@ def create_ecs_service(params, service_name, cluster_name, task_definition_arn):
         logger.info(f"Created new ECS service: {response['service']['serviceArn']}")
         return response['service']['serviceArn']
     
-    return f"arn:aws:ecs:ap-northeast-2:{get_account_id()}:service/{cluster_name}/haifu-dev-{service_name}"
+    config = get_deployment_config()
+    return f"arn:aws:ecs:{config['region']}:{config['account_id']}:service/{cluster_name}/haifu-dev-{service_name}"
 
 def setup_auto_scaling(service_name, cluster_name, params):
     """Setup auto-scaling for ECS service"""
     try:
-        autoscaling_client = boto3.client('application-autoscaling')
+        autoscaling_client = get_client('application-autoscaling')
         
         # Register scalable target
         autoscaling_client.register_scalable_target(
@@ -457,24 +901,24 @@ def create_log_group(service_name):
     """Create CloudWatch log group"""
     try:
         log_group_name = f'/ecs/haifu-dev-{service_name}'
-        logs_client.create_log_group(
+        get_client('logs').create_log_group(
             logGroupName=log_group_name,
             retentionInDays=7
         )
         logger.info(f"Created log group: {log_group_name}")
-    except logs_client.exceptions.ResourceAlreadyExistsException:
+    except get_client('logs').exceptions.ResourceAlreadyExistsException:
         logger.info(f"Log group already exists: /ecs/haifu-dev-{service_name}")
 
 def create_ecr_repository(service_name):
     """Create ECR repository"""
     try:
         repo_name = f'haifu-dev-{service_name}'
-        ecr_client.create_repository(
+        get_client('ecr').create_repository(
             repositoryName=repo_name,
             imageScanningConfiguration={'scanOnPush': True}
         )
         logger.info(f"Created ECR repository: {repo_name}")
-    except ecr_client.exceptions.RepositoryAlreadyExistsException:
+    except get_client('ecr').exceptions.RepositoryAlreadyExistsException:
         logger.info(f"ECR repository already exists: haifu-dev-{service_name}")
 
 def trigger_static_build(params, bucket_name):
@@ -514,7 +958,7 @@ def trigger_static_build(params, bucket_name):
         # Create temporary CodeBuild project
         source_location = f"haifu-github-snapshot/user/{params['user_id']}/{params['project_id']}/{params['service_id']}/"
         
-        codebuild_client.create_project(
+        get_client('codebuild').create_project(
             name=project_name,
             source={
                 'type': 'S3',
@@ -527,11 +971,11 @@ def trigger_static_build(params, bucket_name):
                 'image': 'aws/codebuild/standard:5.0',
                 'computeType': 'BUILD_GENERAL1_SMALL'
             },
-            serviceRole=f"arn:aws:iam::{get_account_id()}:role/haifu-dev-codebuild-role"
+            serviceRole=get_deployment_config()['codebuild_role_arn']
         )
         
         # Start build
-        build_response = codebuild_client.start_build(projectName=project_name)
+        build_response = get_client('codebuild').start_build(projectName=project_name)
         
         return {
             'success': True,
@@ -544,11 +988,23 @@ def trigger_static_build(params, bucket_name):
         return {'success': False, 'error': str(e)}
 
 def check_and_configure_bucket_access(bucket_name, source_key):
-    """Check and configure S3 bucket access for CloudFront"""
+    """Check and configure S3 bucket access for CloudFront (bucket-wide results are cached)"""
+    cached = _bucket_access_cache.get(bucket_name)
+    if cached and time.time() - cached[1] < BUCKET_ACCESS_CACHE_TTL_SECONDS:
+        logger.info(f"Using cached access mode for {bucket_name}: {cached[0]}")
+        return cached[0]
+    
+    mode = configure_bucket_access(bucket_name, source_key)
+    if mode in BUCKET_ACCESS_CACHEABLE_MODES:
+        _bucket_access_cache[bucket_name] = (mode, time.time())
+    return mode
+
+def configure_bucket_access(bucket_name, source_key):
+    """Determine and apply the bucket's access mode"""
     try:
         # 1. Check bucket public access block settings
         try:
-            response = s3_client.get_public_access_block(Bucket=bucket_name)
+            response = get_client('s3').get_public_access_block(Bucket=bucket_name)
             block_config = response['PublicAccessBlockConfiguration']
             logger.info(f"Current public access block: {block_config}")
             
@@ -564,7 +1020,7 @@ def check_and_configure_bucket_access(bucket_name, source_key):
         
         # 2. Try to disable public access block temporarily
         try:
-            s3_client.put_public_access_block(
+            get_client('s3').put_public_access_block(
                 Bucket=bucket_name,
                 PublicAccessBlockConfiguration={
                     'BlockPublicAcls': False,
@@ -575,8 +1031,8 @@ def check_and_configure_bucket_access(bucket_name, source_key):
             )
             logger.info(f"Disabled public access block for {bucket_name}")
             
-            # Wait a moment for the setting to take effect
-            time.sleep(2)
+            # Wait for the setting to take effect
+            wait_for_public_policy_allowed(bucket_name)
             
             # Now apply bucket policy
             bucket_policy = {
@@ -592,7 +1048,8 @@ def check_and_configure_bucket_access(bucket_name, source_key):
                 ]
             }
             
-            s3_client.put_bucket_policy(
+            retry_with_backoff(
+                get_client('s3').put_bucket_policy,
                 Bucket=bucket_name,
                 Policy=json.dumps(bucket_policy)
             )
@@ -604,29 +1061,12 @@ def check_and_configure_bucket_access(bucket_name, source_key):
             
         # 3. Try to set individual file ACLs as fallback
         try:
-            response = s3_client.list_objects_v2(
-                Bucket=bucket_name,
-                Prefix=source_key
-            )
-            
-            if 'Contents' in response:
-                success_count = 0
-                for obj in response['Contents']:
-                    try:
-                        s3_client.put_object_acl(
-                            Bucket=bucket_name,
-                            Key=obj['Key'],
-                            ACL='public-read'
-                        )
-                        success_count += 1
-                    except Exception as acl_error:
-                        logger.warning(f"Failed to set ACL for {obj['Key']}: {str(acl_error)}")
-                        
-                if success_count > 0:
-                    logger.info(f"Successfully set public-read ACL for {success_count} files")
-                    return 'acl_applied'
-                else:
-                    logger.warning("Failed to set ACLs for any files")
+            success_count, failure_count = apply_public_read_acls(bucket_name, source_key)
+            if success_count > 0:
+                logger.info(f"Successfully set public-read ACL for {success_count} files ({failure_count} failed)")
+                return 'acl_applied'
+            else:
+                logger.warning("Failed to set ACLs for any files")
                     
         except Exception as e:
             logger.warning(f"Failed to apply ACLs: {str(e)}")
@@ -637,12 +1077,69 @@ def check_and_configure_bucket_access(bucket_name, source_key):
         logger.error(f"Error configuring bucket access: {str(e)}")
         return 'error'
 
+def wait_for_public_policy_allowed(bucket_name):
+    """Poll the public access block with exponential backoff until public policies are allowed"""
+    delay = ACCESS_READY_BASE_DELAY_SECONDS
+    for attempt in range(ACCESS_READY_MAX_ATTEMPTS):
+        try:
+            block_config = get_client('s3').get_public_access_block(Bucket=bucket_name)['PublicAccessBlockConfiguration']
+            if not block_config.get('BlockPublicPolicy') and not block_config.get('RestrictPublicBuckets'):
+                return True
+        except get_client('s3').exceptions.ClientError as e:
+            # No configuration left at all means nothing blocks the policy
+            if e.response.get('Error', {}).get('Code') == 'NoSuchPublicAccessBlockConfiguration':
+                return True
+        time.sleep(delay)
+        delay *= 2
+    logger.warning(f"Public access block on {bucket_name} still active after {ACCESS_READY_MAX_ATTEMPTS} checks")
+    return False
+
+def retry_with_backoff(fn, *args, **kwargs):
+    """Call fn, retrying with exponential backoff while a just-changed bucket setting propagates"""
+    delay = ACCESS_READY_BASE_DELAY_SECONDS
+    for attempt in range(ACCESS_READY_MAX_ATTEMPTS):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == ACCESS_READY_MAX_ATTEMPTS - 1:
+                raise
+            logger.info(f"Retrying after {delay}s: {str(e)}")
+            time.sleep(delay)
+            delay *= 2
+
+def apply_public_read_acls(bucket_name, source_key):
+    """Set public-read on every object under the prefix (all pages) using a bounded pool"""
+    paginator = get_client('s3').get_paginator('list_objects_v2')
+    success_count = 0
+    failure_count = 0
+    
+    with ThreadPoolExecutor(max_workers=COPY_MAX_WORKERS) as executor:
+        futures = {}
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=source_key):
+            for obj in page.get('Contents', []):
+                future = executor.submit(
+                    contextvars.copy_context().run,
+                    get_client('s3').put_object_acl,
+                    Bucket=bucket_name,
+                    Key=obj['Key'],
+                    ACL='public-read'
+                )
+                futures[future] = obj['Key']
+        
+        for future in as_completed(futures):
+            try:
+                future.result()
+                success_count += 1
+            except Exception as acl_error:
+                failure_count += 1
+                logger.warning(f"Failed to set ACL for {futures[future]}: {str(acl_error)}")
+    
+    return success_count, failure_count
+
 def check_cloudfront_status(distribution_id):
     """Check CloudFront distribution status"""
     try:
-        cloudfront_client = boto3.client('cloudfront')
-        
-        response = cloudfront_client.get_distribution(Id=distribution_id)
+        response = get_client('cloudfront').get_distribution(Id=distribution_id)
         distribution = response['Distribution']
         
         status = distribution['Status']
@@ -666,67 +1163,50 @@ def check_cloudfront_status(distribution_id):
         }
 
 def create_cloudfront_distribution(bucket_name, source_path):
-    """Create CloudFront distribution for S3 bucket with specific path"""
+    """
+    Get a CloudFront distribution for S3 bucket with specific path.
+    Reuses the registered distribution for bucket+path: its config is updated in place
+    if the origin settings changed, otherwise the path is invalidated.
+    """
     try:
-        cloudfront_client = boto3.client('cloudfront')
-        
-        distribution_config = {
-            'CallerReference': f"{bucket_name}-{source_path.replace('/', '-')}-{int(time.time())}",
-            'Comment': f'CloudFront distribution for {bucket_name}/{source_path}',
-            'DefaultCacheBehavior': {
-                'TargetOriginId': bucket_name,
-                'ViewerProtocolPolicy': 'redirect-to-https',
-                'TrustedSigners': {
-                    'Enabled': False,
-                    'Quantity': 0
-                },
-                'ForwardedValues': {
-                    'QueryString': False,
-                    'Cookies': {'Forward': 'none'}
-                },
-                'MinTTL': 0,
-                'Compress': True
-            },
-            'Origins': {
-                'Quantity': 1,
-                'Items': [{
-                    'Id': bucket_name,
-                    'DomainName': f"{bucket_name}.s3-website.ap-northeast-2.amazonaws.com",
-                    'CustomOriginConfig': {
-                        'HTTPPort': 80,
-                        'HTTPSPort': 443,
-                        'OriginProtocolPolicy': 'http-only'
-                    }
-                }]
-            },
-            'Enabled': True,
-            'DefaultRootObject': f"{source_path.rstrip('/')}/public/index.html",
-            'CustomErrorResponses': {
-                'Quantity': 2,
-                'Items': [
-                    {
-                        'ErrorCode': 404,
-                        'ResponsePagePath': f"/{source_path.rstrip('/')}/public/index.html",
-                        'ResponseCode': '200',
-                        'ErrorCachingMinTTL': 300
-                    },
-                    {
-                        'ErrorCode': 403,
-                        'ResponsePagePath': f"/{source_path.rstrip('/')}/public/index.html",
-                        'ResponseCode': '200',
-                        'ErrorCachingMinTTL': 300
-                    }
-                ]
-            }
-        }
+        origin_key = f"{bucket_name}/{source_path}"
+        registry = get_resource('dynamodb').Table(CLOUDFRONT_REGISTRY_TABLE)
+        entry = registry.get_item(Key={'origin_key': origin_key}).get('Item')
+        
+        if entry:
+            reused = refresh_cloudfront_distribution(entry['distribution_id'], bucket_name, source_path)
+            if reused:
+                registry.update_item(
+                    Key={'origin_key': origin_key},
+                    UpdateExpression='SET updated_at = :now',
+                    ExpressionAttributeValues={':now': datetime.utcnow().isoformat()}
+                )
+                return reused
+            logger.warning(f"Registered distribution {entry['distribution_id']} is gone, creating a new one")
         
-        response = cloudfront_client.create_distribution(
-            DistributionConfig=distribution_config
-        )
+        distribution_config = build_distribution_config(bucket_name, source_path)
+        try:
+            response = get_client('cloudfront').create_distribution(
+                DistributionConfig=distribution_config
+            )
+            distribution = response['Distribution']
+        except get_client('cloudfront').exceptions.DistributionAlreadyExists:
+            # Created on an earlier attempt whose registry write never happened
+            distribution = find_distribution_by_comment(distribution_config['Comment'])
+            if not distribution:
+                raise
+        
+        distribution_id = distribution['Id']
+        domain_name = distribution['DomainName']
+        status = distribution['Status']
         
-        distribution_id = response['Distribution']['Id']
-        domain_name = response['Distribution']['DomainName']
-        status = response['Distribution']['Status']
+        registry.put_item(Item={
+            'origin_key': origin_key,
+            'distribution_id': distribution_id,
+            'domain_name': domain_name,
+            'created_at': datetime.utcnow().isoformat(),
+            'updated_at': datetime.utcnow().isoformat()
+        })
         
         logger.info(f"Created CloudFront distribution: {distribution_id} (Status: {status})")
         
@@ -734,6 +1214,7 @@ def create_cloudfront_distribution(bucket_name, source_path):
             'url': f"https://{domain_name}",
             'distribution_id': distribution_id,
             'status': status,  # InProgress, Deployed
+            'action': 'created',
             'message': 'CloudFront distribution created. Deployment in progress (5-15 minutes).'
         }
         
@@ -741,76 +1222,455 @@ def create_cloudfront_distribution(bucket_name, source_path):
         logger.error(f"CloudFront creation error: {str(e)}")
         return None
 
+def build_distribution_config(bucket_name, source_path, caller_reference=None):
+    """CloudFront config for a static site path; CallerReference is stable per bucket+path"""
+    root_object = f"{source_path.rstrip('/')}/public/index.html"
+    return {
+        'CallerReference': caller_reference or hashlib.sha256(f"{bucket_name}/{source_path}".encode('utf-8')).hexdigest(),
+        'Comment': f'CloudFront distribution for {bucket_name}/{source_path}',
+        'DefaultCacheBehavior': {
+            'TargetOriginId': bucket_name,
+            'ViewerProtocolPolicy': 'redirect-to-https',
+            'TrustedSigners': {
+                'Enabled': False,
+                'Quantity': 0
+            },
+            'ForwardedValues': {
+                'QueryString': False,
+                'Cookies': {'Forward': 'none'}
+            },
+            'MinTTL': 0,
+            'Compress': True
+        },
+        'Origins': {
+            'Quantity': 1,
+            'Items': [{
+                'Id': bucket_name,
+                'DomainName': f"{bucket_name}.s3-website.ap-northeast-2.amazonaws.com",
+                'CustomOriginConfig': {
+                    'HTTPPort': 80,
+                    'HTTPSPort': 443,
+                    'OriginProtocolPolicy': 'http-only'
+                }
+            }]
+        },
+        'Enabled': True,
+        'PriceClass': CLOUDFRONT_PRICE_CLASS,
+        'DefaultRootObject': root_object,
+        'CustomErrorResponses': {
+            'Quantity': 2,
+            'Items': [
+                {
+                    'ErrorCode': 404,
+                    'ResponsePagePath': f"/{root_object}",
+                    'ResponseCode': '200',
+                    'ErrorCachingMinTTL': 300
+                },
+                {
+                    'ErrorCode': 403,
+                    'ResponsePagePath': f"/{root_object}",
+                    'ResponseCode': '200',
+                    'ErrorCachingMinTTL': 300
+                }
+            ]
+        }
+    }
+
+def distribution_owned_fields(config):
+    """
+    The settings this deployer owns, normalized for comparison. get_distribution_config returns
+    every field with AWS defaults filled in, so whole-section comparisons never match.
+    """
+    origins = config.get('Origins', {}).get('Items', [])
+    return {
+        'origin_domains': sorted(origin['DomainName'] for origin in origins),
+        'default_root_object': (config.get('DefaultRootObject') or '').lstrip('/'),
+        'price_class': config.get('PriceClass') or CLOUDFRONT_PRICE_CLASS
+    }
+
+def refresh_cloudfront_distribution(distribution_id, bucket_name, source_path):
+    """Update an existing distribution if its owned settings drifted, then invalidate everything for the new content"""
+    try:
+        response = get_client('cloudfront').get_distribution_config(Id=distribution_id)
+    except get_client('cloudfront').exceptions.NoSuchDistribution:
+        return None
+    
+    current = response['DistributionConfig']
+    desired = build_distribution_config(bucket_name, source_path, caller_reference=current['CallerReference'])
+    action = 'invalidated'
+    
+    if distribution_owned_fields(current) != distribution_owned_fields(desired):
+        updated = {
+            **current,
+            'DefaultRootObject': desired['DefaultRootObject'],
+            'CustomErrorResponses': desired['CustomErrorResponses'],
+            'PriceClass': desired['PriceClass']
+        }
+        if distribution_owned_fields(current)['origin_domains'] != distribution_owned_fields(desired)['origin_domains']:
+            updated['Origins'] = desired['Origins']
+            updated['DefaultCacheBehavior'] = {**current['DefaultCacheBehavior'], 'TargetOriginId': bucket_name}
+        get_client('cloudfront').update_distribution(
+            Id=distribution_id,
+            IfMatch=response['ETag'],
+            DistributionConfig=updated
+        )
+        logger.info(f"Updated CloudFront distribution {distribution_id} in place")
+        action = 'updated'
+    
+    # New content was just copied, so every cached path may be stale
+    invalidation = get_client('cloudfront').create_invalidation(
+        DistributionId=distribution_id,
+        InvalidationBatch={
+            'Paths': {'Quantity': 1, 'Items': ['/*']},
+            'CallerReference': f"{distribution_id}-{int(time.time() * 1000)}"
+        }
+    )['Invalidation']
+    distribution = get_client('cloudfront').get_distribution(Id=distribution_id)['Distribution']
+    logger.info(f"Invalidated /* on CloudFront distribution {distribution_id}")
+    return {
+        'url': f"https://{distribution['DomainName']}",
+        'distribution_id': distribution_id,
+        'status': distribution['Status'],
+        'action': action,
+        'invalidation_id': invalidation['Id'],
+        'message': ('Existing CloudFront distribution updated. Propagation in progress.' if action == 'updated'
+                    else 'Existing CloudFront distribution reused. Cache invalidation in progress.')
+    }
+
+def find_distribution_by_comment(comment):
+    """Locate a distribution created by an earlier attempt (CloudFront has no lookup by CallerReference)"""
+    paginator = get_client('cloudfront').get_paginator('list_distributions')
+    for page in paginator.paginate():
+        for summary in page.get('DistributionList', {}).get('Items', []):
+            if summary.get('Comment') == comment:
+                return summary
+    return None
+
+def start_distribution_tracking(bucket_name, source_path, params, cloudfront_result):
+    """Put the distribution on the tracker's pending index for this deployment"""
+    now = int(time.time())
+    get_resource('dynamodb').Table(CLOUDFRONT_REGISTRY_TABLE).update_item(
+        Key={'origin_key': f"{bucket_name}/{source_path}"},
+        UpdateExpression='SET tracking_state = :pending, deployment_id = :did, service_id = :sid, '
+                         'website_url = :url, tracking_since = :now, next_check_at = :next, check_count = :zero',
+        ExpressionAttributeValues={
+            ':pending': 'PENDING',
+            ':did': params['deployment_id'],
+            ':sid': params['service_id'],
+            ':url': cloudfront_result.get('url'),
+            ':now': now,
+            ':next': now + CLOUDFRONT_TRACKING_BASE_DELAY_SECONDS,
+            ':zero': 0
+        }
+    )
+
+def track_pending_distributions():
+    """
+    Scheduled tracker: check every due pending distribution with paginated list_distributions
+    calls, finish the ones that are Deployed and back off on the rest.
+    """
+    registry = get_resource('dynamodb').Table(CLOUDFRONT_REGISTRY_TABLE)
+    now = time.time()
+    
+    pending = []
+    query_kwargs = {
+        'IndexName': CLOUDFRONT_PENDING_INDEX,
+        'KeyConditionExpression': Key('tracking_state').eq('PENDING')
+    }
+    while True:
+        response = registry.query(**query_kwargs)
+        pending.extend(response.get('Items', []))
+        if not response.get('LastEvaluatedKey'):
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    due = [item for item in pending if float(item.get('next_check_at', 0)) <= now]
+    summary = {'pending': len(pending), 'checked': len(due), 'deployed': 0, 'failed': 0}
+    if not due:
+        return summary
+    
+    statuses = list_distribution_statuses({item['distribution_id'] for item in due})
+    
+    for item in due:
+        status = statuses.get(item['distribution_id'])
+        try:
+            if status == 'Deployed':
+                finish_distribution_tracking(item, 'SUCCESS', f"Static service deployed via CloudFront: {item.get('website_url')}")
+                summary['deployed'] += 1
+            elif status is None:
+                finish_distribution_tracking(item, 'FAILED', f"CloudFront distribution {item['distribution_id']} no longer exists")
+                summary['failed'] += 1
+            elif now - float(item.get('tracking_since', now)) > CLOUDFRONT_TRACKING_TIMEOUT_SECONDS:
+                finish_distribution_tracking(item, 'FAILED', f"CloudFront distribution still {status} after {CLOUDFRONT_TRACKING_TIMEOUT_SECONDS}s")
+                summary['failed'] += 1
+            else:
+                check_count = int(item.get('check_count', 0)) + 1
+                delay = min(CLOUDFRONT_TRACKING_BASE_DELAY_SECONDS * 2 ** check_count, CLOUDFRONT_TRACKING_MAX_DELAY_SECONDS)
+                registry.update_item(
+                    Key={'origin_key': item['origin_key']},
+                    UpdateExpression='SET next_check_at = :next, check_count = :count',
+                    ExpressionAttributeValues={':next': int(now + delay), ':count': check_count}
+                )
+        except Exception as e:
+            logger.error(f"Failed to update tracking for {item['distribution_id']}: {str(e)}")
+    
+    logger.info(f"CloudFront tracker: {json.dumps(summary)}")
+    return summary
+
+def list_distribution_statuses(distribution_ids):
+    """Status per distribution ID from list_distributions pages, stopping once all are found"""
+    statuses = {}
+    paginator = get_client('cloudfront').get_paginator('list_distributions')
+    for page in paginator.paginate():
+        for summary in page.get('DistributionList', {}).get('Items', []):
+            if summary['Id'] in distribution_ids:
+                statuses[summary['Id']] = summary['Status']
+        if len(statuses) == len(distribution_ids):
+            break
+    return statuses
+
+def finish_distribution_tracking(item, status, message):
+    """Write the final deployment state (streamed to WebSocket subscribers) and drop the item from the pending index"""
+    update_deployment_status(item['deployment_id'], status, message)
+    get_resource('dynamodb').Table(CLOUDFRONT_REGISTRY_TABLE).update_item(
+        Key={'origin_key': item['origin_key']},
+        UpdateExpression='REMOVE tracking_state, next_check_at, check_count SET last_tracked_status = :status',
+        ExpressionAttributeValues={':status': status}
+    )
+
 def copy_all_files(bucket_name, source_key, dest_bucket):
-    """Copy ALL files from source S3 location to destination bucket"""
+    """
+    Copy ALL files from source S3 location to destination bucket.
+    Copies run on a bounded pool; objects whose source ETag matches the copy
+    manifest are skipped, and objects over 5 GB use multipart copy.
+    Each completed copy is recorded in the manifest as it finishes, so a copy
+    cut short by a timeout still lets the retry skip what already landed.
+    """
+    start = time.perf_counter()
+    previous = load_copy_manifest(dest_bucket)
+    failures = []
+    copied_count = 0
+    skipped_count = 0
+    copied_bytes = 0
+    futures = {}
+    
+    def collect(future, manifest):
+        nonlocal copied_count, copied_bytes
+        obj, dest_file = futures.pop(future)
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"Failed to copy {obj['Key']}: {str(e)}")
+            failures.append(dest_file)
+            return
+        copied_count += 1
+        copied_bytes += obj.get('Size', 0)
+        record_copy(manifest, dest_bucket, dest_file, obj['ETag'])
+    
     try:
-        # List all objects with pagination
-        paginator = s3_client.get_paginator('list_objects_v2')
+        # List all objects with pagination, submitting copies while listing continues
+        paginator = get_client('s3').get_paginator('list_objects_v2')
         pages = paginator.paginate(Bucket=bucket_name, Prefix=source_key)
         
-        copied_count = 0
-        for page in pages:
-            if 'Contents' not in page:
-                continue
-                
-            for obj in page['Contents']:
-                source_file = obj['Key']
-                # Remove the prefix to get relative path
-                dest_file = source_file.replace(source_key, '')
-                
-                # Skip if dest_file is empty (directory marker)
-                if not dest_file or dest_file.endswith('/'):
-                    continue
+        with get_resource('dynamodb').Table(COPY_MANIFEST_TABLE).batch_writer() as manifest, \
+                ThreadPoolExecutor(max_workers=COPY_MAX_WORKERS) as executor:
+            for page in pages:
+                for obj in page.get('Contents', []):
+                    # Remove the prefix to get relative path
+                    dest_file = obj['Key'][len(source_key):]
+                    
+                    # Skip if dest_file is empty (directory marker)
+                    if not dest_file or dest_file.endswith('/'):
+                        continue
+                    
+                    if previous.get(dest_file) == obj['ETag']:
+                        skipped_count += 1
+                        continue
+                    
+                    future = executor.submit(contextvars.copy_context().run, copy_object_any_size, bucket_name, obj, dest_bucket, dest_file)
+                    futures[future] = (obj, dest_file)
                 
-                # Copy file
-                s3_client.copy_object(
-                    CopySource={'Bucket': bucket_name, 'Key': source_file},
-                    Bucket=dest_bucket,
-                    Key=dest_file
-                )
-                copied_count += 1
-                logger.info(f"Copied: {source_file} -> {dest_file}")
-        
-        logger.info(f"Successfully copied {copied_count} files to {dest_bucket}")
-        
-        # If no files were copied, log the available files for debugging
-        if copied_count == 0:
-            logger.warning(f"No files copied. Checking what's available at {source_key}:")
-            response = s3_client.list_objects_v2(
-                Bucket=bucket_name,
-                Prefix=source_key,
-                MaxKeys=10
-            )
-            if 'Contents' in response:
-                for obj in response['Contents']:
-                    logger.info(f"Available file: {obj['Key']}")
+                # Record copies that finished while this page was listed
+                for future in [f for f in futures if f.done()]:
+                    collect(future, manifest)
+            
+            for future in as_completed(list(futures)):
+                collect(future, manifest)
         
     except Exception as e:
         logger.error(f"S3 copy error: {str(e)}")
         raise e
+    
+    finally:
+        elapsed = time.perf_counter() - start
+        summary = {
+            'source': f"s3://{bucket_name}/{source_key}",
+            'copied': copied_count,
+            'skipped': skipped_count,
+            'failed': len(failures),
+            'bytes': copied_bytes,
+            'seconds': round(elapsed, 2),
+            'objects_per_second': round(copied_count / elapsed, 1) if elapsed > 0 else 0,
+            'bytes_per_second': int(copied_bytes / elapsed) if elapsed > 0 else 0
+        }
+        logger.info(f"Copy summary for {dest_bucket}: {json.dumps(summary)}")
+    
+    if failures:
+        raise RuntimeError(f"Failed to copy {len(failures)} files to {dest_bucket}: {failures[:10]}")
+    
+    # If no files were found, log the available files for debugging
+    if copied_count == 0 and skipped_count == 0:
+        logger.warning(f"No files copied. Checking what's available at {source_key}:")
+        response = get_client('s3').list_objects_v2(
+            Bucket=bucket_name,
+            Prefix=source_key,
+            MaxKeys=10
+        )
+        if 'Contents' in response:
+            for obj in response['Contents']:
+                logger.info(f"Available file: {obj['Key']}")
+    
+    return summary
+
+def copy_object_any_size(source_bucket, obj, dest_bucket, dest_key):
+    """Server-side copy of one object, switching to multipart copy above the copy_object limit"""
+    if obj.get('Size', 0) <= MULTIPART_COPY_THRESHOLD:
+        get_client('s3').copy_object(
+            CopySource={'Bucket': source_bucket, 'Key': obj['Key']},
+            Bucket=dest_bucket,
+            Key=dest_key
+        )
+        return
+    
+    # Multipart copy does not carry metadata over, so copy it explicitly
+    head = get_client('s3').head_object(Bucket=source_bucket, Key=obj['Key'])
+    upload_kwargs = {'Bucket': dest_bucket, 'Key': dest_key, 'Metadata': head.get('Metadata', {})}
+    if head.get('ContentType'):
+        upload_kwargs['ContentType'] = head['ContentType']
+    upload_id = get_client('s3').create_multipart_upload(**upload_kwargs)['UploadId']
+    
+    try:
+        parts = []
+        size = obj['Size']
+        for part_number, offset in enumerate(range(0, size, MULTIPART_COPY_PART_SIZE), start=1):
+            end = min(offset + MULTIPART_COPY_PART_SIZE, size) - 1
+            response = get_client('s3').upload_part_copy(
+                Bucket=dest_bucket,
+                Key=dest_key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                CopySource={'Bucket': source_bucket, 'Key': obj['Key']},
+                CopySourceRange=f'bytes={offset}-{end}'
+            )
+            parts.append({'ETag': response['CopyPartResult']['ETag'], 'PartNumber': part_number})
+        
+        get_client('s3').complete_multipart_upload(
+            Bucket=dest_bucket,
+            Key=dest_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+    except Exception:
+        get_client('s3').abort_multipart_upload(Bucket=dest_bucket, Key=dest_key, UploadId=upload_id)
+        raise
+
+def load_copy_manifest(dest_bucket):
+    """Source ETags from earlier copies into dest_bucket, keyed by destination key"""
+    entries = {}
+    query_kwargs = {
+        'KeyConditionExpression': Key('dest_bucket').eq(dest_bucket),
+        'ProjectionExpression': 'dest_key, source_etag'
+    }
+    try:
+        table = get_resource('dynamodb').Table(COPY_MANIFEST_TABLE)
+        while True:
+            response = table.query(**query_kwargs)
+            entries.update((item['dest_key'], item['source_etag']) for item in response.get('Items', []))
+            if not response.get('LastEvaluatedKey'):
+                return entries
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    except Exception as e:
+        logger.warning(f"Failed to load copy manifest: {str(e)}")
+        return {}
+
+def record_copy(manifest, dest_bucket, dest_key, source_etag):
+    """Record one landed copy (the batch writer sends 25 at a time)"""
+    try:
+        manifest.put_item(Item={
+            'dest_bucket': dest_bucket,
+            'dest_key': dest_key,
+            'source_etag': source_etag,
+            'copied_at': datetime.utcnow().isoformat()
+        })
+    except Exception as e:
+        logger.warning(f"Failed to record copy of {dest_key}: {str(e)}")
 
 def handle_status(params):
     """Handle status request"""
     try:
-        table = dynamodb.Table('deployment-status')
+        table = get_resource('dynamodb').Table('deployment-status')
         
         if params.get('deployment_id'):
-            response = table.get_item(Key={'deployment_id': params['deployment_id']})
-            if 'Item' in response:
-                return {'success': True, 'deployment': response['Item']}
-            else:
+            response = table.get_item(
+                Key={'deployment_id': params['deployment_id']},
+                ProjectionExpression=', '.join(f'#{field}' for field in DEPLOYMENT_STATUS_FIELDS),
+                ExpressionAttributeNames={f'#{field}': field for field in DEPLOYMENT_STATUS_FIELDS}
+            )
+            if 'Item' not in response:
                 return {'success': False, 'error': 'Deployment not found'}
+            result = {'success': True, 'deployment': response['Item']}
+            if params.get('events'):
+                result.update(query_deployment_events(params['deployment_id'], params.get('limit'), params.get('cursor')))
+            return result
+        elif params.get('service_id'):
+            return query_service_deployments(table, params['service_id'], params.get('limit'), params.get('cursor'))
         else:
-            response = table.scan(
-                FilterExpression='service_id = :sid',
-                ExpressionAttributeValues={':sid': params['service_id']}
-            )
-            return {'success': True, 'deployments': response['Items']}
+            raise InvalidRequest('service_id or deployment_id is required')
             
+    except (InvalidRequest, InvalidCursor):
+        raise
     except Exception as e:
         logger.error(f"Status error: {str(e)}")
         return {'success': False, 'error': str(e)}
 
+def query_service_deployments(table, service_id, limit=None, cursor=None):
+    """Newest-first page of a service's deployments from the service_id+timestamp index"""
+    limit = page_limit(limit, STATUS_PAGE_DEFAULT_LIMIT, STATUS_PAGE_MAX_LIMIT)
+    
+    query_kwargs = {
+        'IndexName': DEPLOYMENT_SERVICE_INDEX,
+        'KeyConditionExpression': Key('service_id').eq(service_id),
+        'ScanIndexForward': False,
+        'Limit': limit
+    }
+    if cursor:
+        query_kwargs['ExclusiveStartKey'] = decode_cursor(cursor)
+    
+    response = table.query(**query_kwargs)
+    return {
+        'success': True,
+        'deployments': response.get('Items', []),
+        'count': response.get('Count', 0),
+        'next_cursor': encode_cursor(response.get('LastEvaluatedKey'))
+    }
+
+def query_deployment_events(deployment_id, limit=None, cursor=None):
+    """Oldest-first page of a deployment's event log"""
+    limit = page_limit(limit, STATUS_PAGE_MAX_LIMIT, STATUS_PAGE_MAX_LIMIT)
+    
+    query_kwargs = {
+        'KeyConditionExpression': Key('deployment_id').eq(deployment_id),
+        'Limit': limit
+    }
+    if cursor:
+        query_kwargs['ExclusiveStartKey'] = decode_cursor(cursor)
+    
+    response = get_resource('dynamodb').Table(DEPLOYMENT_EVENTS_TABLE).query(**query_kwargs)
+    return {
+        'events': response.get('Items', []),
+        'next_cursor': encode_cursor(response.get('LastEvaluatedKey'))
+    }
+
 def handle_delete(params):
     """Handle delete request"""
     try:
@@ -818,7 +1678,7 @@ def handle_delete(params):
         
         # Delete ECS service
         try:
-            ecs_client.delete_service(
+            get_client('ecs').delete_service(
                 cluster='haifu-dev-user-services',
                 service=f'haifu-dev-{service_name}',
                 force=True
@@ -832,59 +1692,116 @@ def handle_delete(params):
         logger.error(f"Delete error: {str(e)}")
         return {'success': False, 'error': str(e)}
 
-def update_deployment_status(deployment_id, status, message, user_id=None, project_id=None, service_id=None, service_type=None):
-    """Update deployment status in DynamoDB"""
+def update_deployment_status(deployment_id, status, message, user_id=None, project_id=None, service_id=None, service_type=None, step_timings=None, restart=False):
+    """
+    Partially update the current-state row (only the given fields; checkpoints and ids are kept),
+    bump its version and append a status event. Once the row is SUCCESS or FAILED, later writes
+    from concurrent or stale workers are rejected unless restart=True starts a new run.
+    Returns the new version, or None if the write was rejected or failed.
+    """
     try:
-        table = dynamodb.Table('deployment-status')
+        table = get_resource('dynamodb').Table('deployment-status')
         
-        item = {
-            'deployment_id': deployment_id,
+        fields = {
             'status': status,
             'message': message,
             'timestamp': datetime.utcnow().isoformat()
         }
         
         if user_id:
-            item['user_id'] = user_id
+            fields['user_id'] = user_id
         if project_id:
-            item['project_id'] = project_id
+            fields['project_id'] = project_id
         if service_id:
-            item['service_id'] = service_id
+            fields['service_id'] = service_id
         if service_type:
-            item['service_type'] = service_type
+            fields['service_type'] = service_type
+        if step_timings:
+            fields['step_timings'] = step_timings
+        
+        update_kwargs = {
+            'Key': {'deployment_id': deployment_id},
+            'UpdateExpression': 'SET ' + ', '.join(f'#{name} = :{name}' for name in fields)
+                                + ', #version = if_not_exists(#version, :zero) + :one',
+            'ExpressionAttributeNames': {**{f'#{name}': name for name in fields}, '#version': 'version'},
+            'ExpressionAttributeValues': {**{f':{name}': value for name, value in fields.items()}, ':zero': 0, ':one': 1},
+            'ReturnValues': 'UPDATED_NEW'
+        }
+        if not restart:
+            update_kwargs['ConditionExpression'] = 'attribute_not_exists(#status) OR NOT #status IN (:success, :failed)'
+            update_kwargs['ExpressionAttributeValues'].update({':success': 'SUCCESS', ':failed': 'FAILED'})
         
-        table.put_item(Item=item)
-        logger.info(f"Updated deployment status: {deployment_id} -> {status}")
+        try:
+            response = table.update_item(**update_kwargs)
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            logger.info(f"Deployment {deployment_id} already finished, ignoring {status} update")
+            return None
+        
+        version = int(response['Attributes']['version'])
+        write_deployment_events([build_deployment_event(deployment_id, 'status', status=status, message=message, version=version)])
+        logger.info(f"Updated deployment status: {deployment_id} -> {status} (v{version})")
+        return version
         
     except Exception as e:
         logger.error(f"Failed to update deployment status: {str(e)}")
+        return None
+
+def get_deployment_config():
+    """Cached account, region, network and role settings (refreshed after CONFIG_CACHE_TTL_SECONDS)"""
+    with _config_cache_lock:
+        if _config_cache['values'] is None or time.time() - _config_cache['loaded_at'] > CONFIG_CACHE_TTL_SECONDS:
+            _config_cache['values'] = load_deployment_config()
+            _config_cache['loaded_at'] = time.time()
+        return _config_cache['values']
+
+def load_deployment_config():
+    """Resolve deployment settings with one STS call and one batched SSM lookup"""
+    region = os.environ.get('AWS_REGION', 'ap-northeast-2')
+    with StepMetrics('sts_lookup'):
+        account_id = get_client('sts').get_caller_identity()['Account']
+    
+    parameters = {}
+    with StepMetrics('ssm_lookup'):
+        try:
+            response = get_client('ssm').get_parameters(Names=list(SSM_CONFIG_PARAMETERS.values()))
+            parameters = {p['Name']: p['Value'] for p in response.get('Parameters', [])}
+            if response.get('InvalidParameters'):
+                logger.warning(f"Missing SSM parameters: {response['InvalidParameters']}")
+        except Exception as e:
+            logger.warning(f"Failed to load SSM parameters, using environment defaults: {str(e)}")
+    
+    subnets = parameters.get(SSM_CONFIG_PARAMETERS['private_subnets']) or \
+        os.environ.get('PRIVATE_SUBNETS', 'subnet-04bdda4afc3d6a117,subnet-0b7a7ea12f4cdb141')
+    security_group = parameters.get(SSM_CONFIG_PARAMETERS['ecs_security_group']) or \
+        os.environ.get('ECS_SECURITY_GROUP', 'sg-0b29792d58925132b')
+    
+    logger.info(f"Loaded deployment config for account {account_id} in {region}")
+    return {
+        'account_id': account_id,
+        'region': region,
+        'private_subnets': subnets.split(','),
+        'ecs_security_group': security_group,
+        'ecs_execution_role_arn': os.environ.get('ECS_EXECUTION_ROLE_ARN', f"arn:aws:iam::{account_id}:role/haifu-dev-ecs-execution-role"),
+        'ecs_task_role_arn': os.environ.get('ECS_TASK_ROLE_ARN', f"arn:aws:iam::{account_id}:role/haifu-dev-ecs-task-role"),
+        'codebuild_role_arn': os.environ.get('CODEBUILD_ROLE_ARN', f"arn:aws:iam::{account_id}:role/haifu-dev-codebuild-role")
+    }
 
 def get_account_id():
     """Get AWS account ID"""
-    return boto3.client('sts').get_caller_identity()['Account']
+    return get_deployment_config()['account_id']
 
 def get_private_subnets():
     """Get private subnet IDs"""
-    try:
-        ssm_client = boto3.client('ssm')
-        response = ssm_client.get_parameter(Name='/haifu/vpc/private-subnets')
-        return response['Parameter']['Value'].split(',')
-    except:
-        return os.environ.get('PRIVATE_SUBNETS', 'subnet-04bdda4afc3d6a117,subnet-0b7a7ea12f4cdb141').split(',')
+    return get_deployment_config()['private_subnets']
 
 def get_ecs_security_group():
     """Get ECS security group ID"""
-    try:
-        ssm_client = boto3.client('ssm')
-        response = ssm_client.get_parameter(Name='/haifu/vpc/ecs-security-group')
-        return response['Parameter']['Value']
-    except:
-        return os.environ.get('ECS_SECURITY_GROUP', 'sg-0b29792d58925132b')
+    return get_deployment_config()['ecs_security_group']
 
-def create_success_response(data):
+def create_success_response(data, status_code=200):
     """Create successful HTTP response"""
     return {
-        'statusCode': 200,
+        'statusCode': status_code,
         'headers': {
             'Content-Type': 'application/json',
             'Access-Control-Allow-Origin': '*',
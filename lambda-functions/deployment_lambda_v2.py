@@ -1,8 +1,11 @@
 import json
+import base64
 import boto3
 import logging
 import uuid
+from boto3.dynamodb.conditions import Attr, Key
 from datetime import datetime
+from pagination import InvalidCursor, decode_cursor, encode_cursor, page_limit
 import os
 
 # Configure logging
@@ -15,6 +18,17 @@ ecs_client = boto3.client('ecs')
 s3_client = boto3.client('s3')
 cloudformation_client = boto3.client('cloudformation')
 
+# Status listing: service_id+timestamp GSI on the deployment status table
+DEPLOYMENT_SERVICE_INDEX = os.environ.get('DEPLOYMENT_SERVICE_INDEX', 'service-index')
+STATUS_PAGE_DEFAULT_LIMIT = 20
+STATUS_PAGE_MAX_LIMIT = 100
+
+# v2's status table is created outside Terraform, so the index may be missing; checked once per container
+_service_index_available = {}
+
+class InvalidRequest(ValueError):
+    """Client error detected after routing (bad status parameters); returned as 400"""
+
 def handler(event, context):
     """
     Enhanced Deployment Lambda function for hAIfu platform
@@ -72,6 +86,8 @@ def handler(event, context):
         
         return create_success_response(result)
         
+    except (InvalidRequest, InvalidCursor) as e:
+        return create_error_response(400, str(e))
     except Exception as e:
         logger.error(f"Unhandled error: {str(e)}", exc_info=True)
         return create_error_response(500, f"Internal server error: {str(e)}")
@@ -87,7 +103,6 @@ def parse_request_body(event):
         
         # Handle base64 encoded body
         if event.get('isBase64Encoded', False):
-            import base64
             raw_body = base64.b64decode(raw_body).decode('utf-8')
             logger.info(f"Decoded body: {raw_body}")
         
@@ -108,7 +123,9 @@ def extract_parameters(event, body, http_method):
             'project_id': query_params.get('project_id'),
             'service_id': query_params.get('service_id'),
             'service_type': query_params.get('service_type'),
-            'deployment_id': query_params.get('deployment_id')
+            'deployment_id': query_params.get('deployment_id'),
+            'limit': query_params.get('limit'),
+            'cursor': query_params.get('cursor')
         }
     else:
         # Convert all values to strings to ensure they exist
@@ -127,6 +144,8 @@ def extract_parameters(event, body, http_method):
             'port': body.get('port', 80),
             'min_capacity': body.get('min_capacity', 1),
             'max_capacity': body.get('max_capacity', 10),
+            'limit': body.get('limit'),
+            'cursor': body.get('cursor'),
             'build_output_dir': body.get('build_output_dir', 'dist'),
             'node_version': body.get('node_version', '18')
         }
@@ -183,12 +202,16 @@ def handle_deploy(params):
         else:
             result = deploy_dynamic_service(params)
         
-        # Update final status
+        # Update final status (put_item replaces the item, so keep the ids the service index needs)
         final_status = 'SUCCESS' if result['success'] else 'FAILED'
         update_deployment_status(
             deployment_id=deployment_id,
             status=final_status,
-            message=result.get('message', 'Deployment completed')
+            message=result.get('message', 'Deployment completed'),
+            user_id=params['user_id'],
+            project_id=params['project_id'],
+            service_id=params['service_id'],
+            service_type=service_type
         )
         
         return {
@@ -221,18 +244,79 @@ def handle_status(params):
                 return {'success': True, 'deployment': response['Item']}
             else:
                 return {'success': False, 'error': 'Deployment not found'}
+        elif params.get('service_id'):
+            # Get deployments for service (paginated, newest first)
+            return query_service_deployments(table, params['service_id'], params.get('limit'), params.get('cursor'))
         else:
-            # Get all deployments for service
-            response = table.scan(
-                FilterExpression='service_id = :sid',
-                ExpressionAttributeValues={':sid': params['service_id']}
-            )
-            return {'success': True, 'deployments': response['Items']}
+            raise InvalidRequest('service_id or deployment_id is required')
             
+    except (InvalidRequest, InvalidCursor):
+        raise
     except Exception as e:
         logger.error(f"Status error: {str(e)}")
         return {'success': False, 'error': str(e)}
 
+def has_service_index(table):
+    """Whether the status table has the service_id+timestamp index (DescribeTable, cached per table)"""
+    if table.name not in _service_index_available:
+        try:
+            indexes = table.global_secondary_indexes or []
+        except Exception as e:
+            logger.warning(f"Could not describe {table.name}: {str(e)}")
+            return False
+        _service_index_available[table.name] = any(
+            index['IndexName'] == DEPLOYMENT_SERVICE_INDEX for index in indexes
+        )
+        if not _service_index_available[table.name]:
+            logger.warning(f"{table.name} has no {DEPLOYMENT_SERVICE_INDEX}; status listing falls back to a filtered scan")
+    return _service_index_available[table.name]
+
+def query_service_deployments(table, service_id, limit=None, cursor=None):
+    """Newest-first page of a service's deployments from the service_id+timestamp index"""
+    limit = page_limit(limit, STATUS_PAGE_DEFAULT_LIMIT, STATUS_PAGE_MAX_LIMIT)
+    
+    if not has_service_index(table):
+        return scan_service_deployments(table, service_id, limit, cursor)
+    
+    query_kwargs = {
+        'IndexName': DEPLOYMENT_SERVICE_INDEX,
+        'KeyConditionExpression': Key('service_id').eq(service_id),
+        'ScanIndexForward': False,
+        'Limit': limit
+    }
+    if cursor:
+        query_kwargs['ExclusiveStartKey'] = decode_cursor(cursor)
+    
+    response = table.query(**query_kwargs)
+    return {
+        'success': True,
+        'deployments': response.get('Items', []),
+        'count': response.get('Count', 0),
+        'next_cursor': encode_cursor(response.get('LastEvaluatedKey'))
+    }
+
+def scan_service_deployments(table, service_id, limit, cursor=None):
+    """
+    Fallback for tables without the index: one filtered scan page
+    Limit applies before the filter, so a page can be short (or empty) while next_cursor is still set,
+    and ordering is newest-first within the page only
+    """
+    scan_kwargs = {
+        'FilterExpression': Attr('service_id').eq(service_id),
+        'Limit': limit
+    }
+    if cursor:
+        scan_kwargs['ExclusiveStartKey'] = decode_cursor(cursor)
+    
+    response = table.scan(**scan_kwargs)
+    items = sorted(response.get('Items', []), key=lambda item: item.get('timestamp', ''), reverse=True)
+    return {
+        'success': True,
+        'deployments': items,
+        'count': len(items),
+        'next_cursor': encode_cursor(response.get('LastEvaluatedKey'))
+    }
+
 def handle_delete(params):
     """Handle delete request"""
     try:
@@ -0,0 +1,28 @@
+import json
+import base64
+
+class InvalidCursor(ValueError):
+    """Cursor that did not come from encode_cursor; callers return it as 400"""
+
+def encode_cursor(last_evaluated_key):
+    """Encode a DynamoDB LastEvaluatedKey as an opaque pagination cursor"""
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key, default=str).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """Decode a pagination cursor back into an ExclusiveStartKey"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (ValueError, TypeError, AttributeError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(key, dict) or not key:
+        raise InvalidCursor('Invalid cursor')
+    return key
+
+def page_limit(limit, default, maximum):
+    """Clamp a client-supplied page size to 1..maximum, falling back to default"""
+    try:
+        return min(max(int(limit or default), 1), maximum)
+    except (TypeError, ValueError):
+        return default
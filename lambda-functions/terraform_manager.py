@@ -1,7 +1,10 @@
 import json
+import os
 import boto3
 import logging
+from boto3.dynamodb.conditions import Attr, Key
 from datetime import datetime
+from pagination import InvalidCursor, decode_cursor, encode_cursor, page_limit
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -9,6 +12,17 @@ logger.setLevel(logging.INFO)
 s3_client = boto3.client('s3')
 dynamodb = boto3.resource('dynamodb')
 
+SERVICE_REGISTRY_TABLE = 'haifu-dev-service-registry'
+# GSI on the registry table: hash key status, range key service_type.
+# Every active service shares one status value, so this is a single (hot) index partition;
+# fine at registry scale, where it is only read by service listing
+SERVICE_STATUS_INDEX = os.environ.get('SERVICE_STATUS_INDEX', 'status-index')
+SERVICE_PAGE_DEFAULT_LIMIT = 100
+SERVICE_PAGE_MAX_LIMIT = 1000
+
+# The registry table is created outside Terraform, so the index may be missing; checked once per container
+_status_index_available = {}
+
 def handler(event, context):
     """
     Terraform Manager Lambda
@@ -17,7 +31,7 @@ def handler(event, context):
     try:
         body = json.loads(event.get('body', '{}'))
         
-        action = body.get('action')  # 'create', 'update', 'destroy'
+        action = body.get('action')  # 'create', 'update', 'destroy', 'list_services'
         service_type = body.get('service_type')  # 'static' or 'dynamic'
         service_name = body.get('service_name')
         deployment_config = body.get('deployment_config', {})
@@ -28,6 +42,8 @@ def handler(event, context):
             result = update_service_config(service_type, service_name, deployment_config)
         elif action == 'destroy':
             result = destroy_service_config(service_type, service_name)
+        elif action == 'list_services':
+            result = list_services(body)
         else:
             return {
                 'statusCode': 400,
@@ -36,9 +52,14 @@ def handler(event, context):
         
         return {
             'statusCode': 200,
-            'body': json.dumps(result)
+            'body': json.dumps(result, default=str)
         }
         
+    except InvalidCursor as e:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': str(e)})
+        }
     except Exception as e:
         logger.error(f"Terraform manager error: {str(e)}")
         return {
@@ -219,7 +240,7 @@ def update_service_registry(service_name, service_type, status, config_path):
     """Update service registry in DynamoDB"""
     
     try:
-        table = dynamodb.Table('haifu-dev-service-registry')
+        table = dynamodb.Table(SERVICE_REGISTRY_TABLE)
         table.put_item(
             Item={
                 'service_name': service_name,
@@ -236,13 +257,91 @@ def get_all_active_services():
     """Get all active services from registry"""
     
     try:
-        table = dynamodb.Table('haifu-dev-service-registry')
-        response = table.scan(
-            FilterExpression='#status = :status',
-            ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={':status': 'active'}
-        )
-        return response.get('Items', [])
+        return list(iter_services(status='active'))
     except Exception as e:
-        logger.error(f"DynamoDB scan error: {str(e)}")
-        return []
\ No newline at end of file
+        logger.error(f"DynamoDB query error: {str(e)}")
+        return []
+
+def iter_services(status='active', service_type=None, projection=None):
+    """Stream registry items for a status (and optional type) without loading every page at once"""
+    for items, _ in iter_service_pages(status, service_type, projection):
+        yield from items
+
+def has_status_index(table):
+    """Whether the registry has the status+service_type index (DescribeTable, cached per table)"""
+    if table.name not in _status_index_available:
+        try:
+            indexes = table.global_secondary_indexes or []
+        except Exception as e:
+            logger.warning(f"Could not describe {table.name}: {str(e)}")
+            return False
+        _status_index_available[table.name] = any(
+            index['IndexName'] == SERVICE_STATUS_INDEX for index in indexes
+        )
+        if not _status_index_available[table.name]:
+            logger.warning(f"{table.name} has no {SERVICE_STATUS_INDEX}; service listing falls back to a filtered scan")
+    return _status_index_available[table.name]
+
+def iter_service_pages(status='active', service_type=None, projection=None, page_size=SERVICE_PAGE_DEFAULT_LIMIT, cursor=None):
+    """
+    Yield (items, next_cursor) pages from the status index, following LastEvaluatedKey.
+    Without the index, pages come from a filtered scan (Limit applies before the filter,
+    so scan pages can be short or empty while next_cursor is still set).
+    """
+    table = dynamodb.Table(SERVICE_REGISTRY_TABLE)
+    
+    if has_status_index(table):
+        key_condition = Key('status').eq(status)
+        if service_type:
+            key_condition = key_condition & Key('service_type').eq(service_type)
+        query_kwargs = {
+            'IndexName': SERVICE_STATUS_INDEX,
+            'KeyConditionExpression': key_condition,
+            'Limit': page_size
+        }
+        read = table.query
+    else:
+        filter_expression = Attr('status').eq(status)
+        if service_type:
+            filter_expression = filter_expression & Attr('service_type').eq(service_type)
+        query_kwargs = {
+            'FilterExpression': filter_expression,
+            'Limit': page_size
+        }
+        read = table.scan
+    if projection:
+        names = {f'#p{i}': attribute for i, attribute in enumerate(projection)}
+        query_kwargs['ProjectionExpression'] = ', '.join(names)
+        query_kwargs['ExpressionAttributeNames'] = names
+    if cursor:
+        query_kwargs['ExclusiveStartKey'] = decode_cursor(cursor)
+    
+    while True:
+        response = read(**query_kwargs)
+        last_key = response.get('LastEvaluatedKey')
+        yield response.get('Items', []), encode_cursor(last_key)
+        if not last_key:
+            return
+        query_kwargs['ExclusiveStartKey'] = last_key
+
+def list_services(body):
+    """Return one page of services; pass next_cursor back as cursor to continue"""
+    limit = page_limit(body.get('limit'), SERVICE_PAGE_DEFAULT_LIMIT, SERVICE_PAGE_MAX_LIMIT)
+    
+    projection = body.get('projection')
+    if isinstance(projection, str):
+        projection = [attribute.strip() for attribute in projection.split(',') if attribute.strip()]
+    
+    items, next_cursor = next(iter_service_pages(
+        status=body.get('status', 'active'),
+        service_type=body.get('service_type'),
+        projection=projection,
+        page_size=limit,
+        cursor=body.get('cursor')
+    ))
+    
+    return {
+        'services': items,
+        'count': len(items),
+        'next_cursor': next_cursor
+    }
@@ -0,0 +1,48 @@
+"""
+RepositoryAnalyzer 테스트
+매니페스트만으로 framework / 규칙 기반 설정이 결정되는지 확인합니다. (AWS 호출 없음)
+"""
+import json
+
+from agent_lambda import RepositoryAnalyzer
+
+def analyze_package(dependencies, scripts=None):
+    package = {"dependencies": dependencies, "scripts": scripts or {"start": "node dist/main.js"}}
+    return RepositoryAnalyzer().analyze({"package.json": json.dumps(package)})
+
+# =============================================================================
+# Scoped 패키지 (@scope/name)
+# =============================================================================
+def test_scoped_server_packages_map_to_framework():
+    assert analyze_package({"@nestjs/core": "^10.0.0"})["framework"] == "nestjs"
+    assert analyze_package({"@hapi/hapi": "^21.0.0"})["framework"] == "hapi"
+
+def test_scoped_server_package_gets_rule_config():
+    result = analyze_package({"@nestjs/core": "^10.0.0", "@nestjs/common": "^10.0.0"})
+    assert result["rule_config"] is not None
+    assert "node server framework: nestjs" in result["rule_reasons"]
+
+def test_unscoped_server_package():
+    assert analyze_package({"express": "^4.18.0"})["framework"] == "express"
+
+# =============================================================================
+# engines / null 필드
+# =============================================================================
+def test_node_runtime_uses_major_version_of_range():
+    def runtime(node_range):
+        package = {"dependencies": {"express": "^4.18.0"}, "engines": {"node": node_range}}
+        return RepositoryAnalyzer().analyze({"package.json": json.dumps(package)})["runtime"]
+    assert runtime(">=20.16") == "NODEJS_20"
+    assert runtime("^18.20") == "NODEJS_18"
+    assert runtime("~16.14.0") == "NODEJS_16"
+
+def test_null_package_fields_do_not_crash():
+    package = {"dependencies": None, "devDependencies": {"react": "^18.0.0"}, "engines": None, "scripts": None}
+    result = RepositoryAnalyzer().analyze({"package.json": json.dumps(package)})
+    assert result["framework"] == "react"
+
+if __name__ == "__main__":
+    for name, test_func in list(globals().items()):
+        if name.startswith("test_") and callable(test_func):
+            test_func()
+            print(f"✅ {name}")
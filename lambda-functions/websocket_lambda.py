@@ -1,13 +1,44 @@
 import json
+import os
+import random
+import time
+import uuid
 import boto3
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
 from datetime import datetime
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 dynamodb = boto3.resource('dynamodb')
-apigateway = boto3.client('apigatewaymanagementapi')
+
+# Management API clients per endpoint (the endpoint comes from the request or from SSM)
+WEBSOCKET_ENDPOINT_PARAMETER = '/haifu/websocket/endpoint'
+CONNECTIONS_TABLE = 'websocket-connections'
+CONNECTIONS_SERVICE_INDEX = 'service-index'
+FANOUT_MAX_WORKERS = int(os.environ.get('FANOUT_MAX_WORKERS', '10'))
+STATUS_FIELDS = ('deployment_id', 'service_id', 'service_type', 'status', 'message', 'current_step', 'timestamp', 'version')
+_management_clients = {}
+
+# broadcast(): API Gateway caps a WebSocket message at 128 KB; larger payloads are sent as chunks
+WEBSOCKET_MAX_PAYLOAD_BYTES = 128 * 1024
+BROADCAST_MAX_ATTEMPTS = 4
+BROADCAST_BASE_DELAY_SECONDS = 0.1
+BROADCAST_MAX_DELAY_SECONDS = 2.0
+THROTTLING_ERROR_CODES = ('LimitExceededException', 'TooManyRequestsException', 'ThrottlingException')
+_endpoint_cache = {'request': None, 'parameter': None}
+_deserializer = TypeDeserializer()
+
+# Build log tailing: cursors (log stream + nextForwardToken) are stored per connection
+LOG_FRAME_MAX_BYTES = 32 * 1024  # WebSocket frame size limit
+LOG_TAIL_MAX_EVENTS_PER_PASS = 2000
+LOG_TAIL_POLL_INTERVAL_SECONDS = 2
+LOG_TAIL_TICK_RESERVE_MS = 5000
+_clients = {}
 
 def handler(event, context):
     """
@@ -15,18 +46,32 @@ def handler(event, context):
     Handles real-time deployment status updates
     """
     try:
+        # DynamoDB Streams: deployment-status changes fan out to subscribers
+        records = event.get('Records') or []
+        if records and records[0].get('eventSource') == 'aws:dynamodb':
+            return handle_status_stream(event)
+        
+        # EventBridge schedule: tail build logs for subscribed connections
+        if event.get('source') == 'aws.events' and event.get('detail-type') == 'Scheduled Event':
+            return handle_log_tail_tick(context)
+        
         route_key = event.get('requestContext', {}).get('routeKey')
         connection_id = event.get('requestContext', {}).get('connectionId')
         
         logger.info(f"Route: {route_key}, Connection: {connection_id}")
         
+        request_context = event.get('requestContext', {})
+        if request_context.get('domainName') and request_context.get('stage'):
+            _endpoint_cache['request'] = f"https://{request_context['domainName']}/{request_context['stage']}"
+        
         if route_key == '$connect':
             return handle_connect(connection_id)
         elif route_key == '$disconnect':
             return handle_disconnect(connection_id)
         elif route_key == 'deploy_status':
             return handle_deploy_status(event, connection_id)
-        elif route_key == 'message':
+        elif route_key in ('message', 'subscribe_logs', 'unsubscribe_logs', 'tail_logs'):
+            # Routes are selected on $request.body.action, so each log action arrives as its own route
             return handle_message(event, connection_id)
         else:
             return {'statusCode': 400, 'body': 'Unknown route'}
@@ -41,8 +86,12 @@ def handle_connect(connection_id):
     return {'statusCode': 200}
 
 def handle_disconnect(connection_id):
-    """Handle WebSocket disconnection"""
+    """Handle WebSocket disconnection: drop the connection's log subscription so tailing stops"""
     logger.info(f"Client disconnected: {connection_id}")
+    try:
+        dynamodb.Table(CONNECTIONS_TABLE).delete_item(Key={'connection_id': connection_id})
+    except Exception as e:
+        logger.warning(f"Failed to remove subscription for {connection_id}: {str(e)}")
     return {'statusCode': 200}
 
 def handle_deploy_status(event, connection_id):
@@ -80,6 +129,8 @@ def handle_message(event, connection_id):
             return subscribe_to_logs(body, connection_id)
         elif action == 'unsubscribe_logs':
             return unsubscribe_from_logs(body, connection_id)
+        elif action == 'tail_logs':
+            return tail_logs(connection_id)
         else:
             return {'statusCode': 400, 'body': 'Invalid action'}
             
@@ -99,15 +150,14 @@ def subscribe_to_logs(body, connection_id):
         
         # Store subscription in DynamoDB
         table = dynamodb.Table('websocket-connections')
-        table.put_item(
-            Item={
-                'connection_id': connection_id,
-                'user_id': user_id,
-                'project_id': project_id,
-                'service_id': service_id,
-                'subscribed_at': datetime.utcnow().isoformat()
-            }
-        )
+        subscription = {
+            'connection_id': connection_id,
+            'user_id': user_id,
+            'project_id': project_id,
+            'service_id': str(service_id),  # service-index hash key is a string attribute
+            'subscribed_at': datetime.utcnow().isoformat()
+        }
+        table.put_item(Item=subscription)
         
         # Get current pipeline status
         pipeline_name = f'user-{user_id}-project-{project_id}-service-{service_id}-pipeline'
@@ -120,6 +170,12 @@ def subscribe_to_logs(body, connection_id):
             'logs': pipeline_logs
         })
         
+        # Send build output so far; later lines arrive via tail_logs or the scheduled tick
+        try:
+            tail_connection_logs(table, subscription, {})
+        except Exception as e:
+            logger.warning(f"Initial log tail failed: {str(e)}")
+        
         return {'statusCode': 200}
         
     except Exception as e:
@@ -140,7 +196,7 @@ def unsubscribe_from_logs(body, connection_id):
 def get_pipeline_logs(pipeline_name):
     """Get CodePipeline execution logs"""
     try:
-        codepipeline = boto3.client('codepipeline')
+        codepipeline = get_client('codepipeline')
         
         # Get pipeline executions
         response = codepipeline.list_pipeline_executions(
@@ -164,12 +220,377 @@ def get_pipeline_logs(pipeline_name):
         return []
 
 def send_message_to_client(connection_id, message):
-    """Send message to WebSocket client"""
+    """Send message to WebSocket client; returns the delivery outcome"""
+    outcome = broadcast(message, [connection_id])[connection_id]
+    if outcome != 'sent':
+        logger.error(f"Error sending message to {connection_id}: {outcome}")
+    return outcome
+
+def broadcast(message, connection_ids):
+    """
+    Send one message to many connections. The payload is serialized (and chunked, if over
+    the 128 KB limit) once, posted concurrently on a bounded pool, and throttled posts are
+    retried with jittered backoff. Returns {connection_id: 'sent' | 'gone' | 'throttled' | 'error'}.
+    """
+    connection_ids = list(dict.fromkeys(connection_ids))
+    if not connection_ids:
+        return {}
+    
+    payloads = chunk_payload(json.dumps(message, default=str))
+    client = get_management_client()
+    
+    def deliver(connection_id):
+        for payload in payloads:
+            outcome = post_with_retry(client, connection_id, payload)
+            if outcome != 'sent':
+                return outcome
+        return 'sent'
+    
+    with ThreadPoolExecutor(max_workers=min(FANOUT_MAX_WORKERS, len(connection_ids))) as executor:
+        return dict(zip(connection_ids, executor.map(deliver, connection_ids)))
+
+def chunk_payload(data):
+    """Split a serialized message into chunk envelopes that each fit in one WebSocket message"""
+    if len(data.encode('utf-8')) <= WEBSOCKET_MAX_PAYLOAD_BYTES:
+        return [data]
+    
+    # data is ASCII JSON; embedding it as a string can at most double it (escaped quotes/backslashes)
+    part_size = (WEBSOCKET_MAX_PAYLOAD_BYTES - 512) // 2
+    parts = [data[i:i + part_size] for i in range(0, len(data), part_size)]
+    chunk_id = str(uuid.uuid4())
+    return [
+        json.dumps({'type': 'chunk', 'chunk_id': chunk_id, 'index': index, 'total': len(parts), 'data': part})
+        for index, part in enumerate(parts)
+    ]
+
+def post_with_retry(client, connection_id, payload):
+    """post_to_connection with full-jitter exponential backoff on throttling"""
+    for attempt in range(BROADCAST_MAX_ATTEMPTS):
+        try:
+            client.post_to_connection(ConnectionId=connection_id, Data=payload)
+            return 'sent'
+        except client.exceptions.GoneException:
+            return 'gone'
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in THROTTLING_ERROR_CODES:
+                logger.warning(f"Failed to post to {connection_id}: {str(e)}")
+                return 'error'
+            if attempt == BROADCAST_MAX_ATTEMPTS - 1:
+                return 'throttled'
+            delay = min(BROADCAST_MAX_DELAY_SECONDS, BROADCAST_BASE_DELAY_SECONDS * 2 ** attempt)
+            time.sleep(random.uniform(0, delay))
+        except Exception as e:
+            logger.warning(f"Failed to post to {connection_id}: {str(e)}")
+            return 'error'
+
+def get_websocket_endpoint():
+    """Management API endpoint: from a WebSocket request if seen, else the SSM parameter (cached)"""
+    if _endpoint_cache['request']:
+        return _endpoint_cache['request']
+    if _endpoint_cache['parameter'] is None:
+        try:
+            response = boto3.client('ssm').get_parameter(Name=WEBSOCKET_ENDPOINT_PARAMETER)
+            _endpoint_cache['parameter'] = response['Parameter']['Value']
+        except Exception as e:
+            logger.warning(f"Could not read {WEBSOCKET_ENDPOINT_PARAMETER}: {str(e)}")
+            _endpoint_cache['parameter'] = os.environ.get('WEBSOCKET_API_ENDPOINT', '')
+    return _endpoint_cache['parameter']
+
+def get_management_client():
+    """Cached apigatewaymanagementapi client for the current endpoint"""
+    endpoint = get_websocket_endpoint()
+    if endpoint not in _management_clients:
+        _management_clients[endpoint] = boto3.client('apigatewaymanagementapi', endpoint_url=endpoint or None)
+    return _management_clients[endpoint]
+
+def handle_status_stream(event):
+    """
+    Push deployment status changes from the deployment-status stream to service subscribers.
+    Records whose fan-out failed (lookup error, exception, throttled posts) are returned as
+    batchItemFailures so Lambda retries from the earliest of them.
+    """
+    updates_by_service = {}
+    failed = set()
+    for record in event.get('Records', []):
+        sequence_number = record.get('dynamodb', {}).get('SequenceNumber')
+        try:
+            if record.get('eventName') not in ('INSERT', 'MODIFY'):
+                continue
+            new_image = deserialize_image(record['dynamodb'].get('NewImage'))
+            old_image = deserialize_image(record['dynamodb'].get('OldImage'))
+        except Exception as e:
+            logger.error(f"Could not read stream record {sequence_number}: {str(e)}")
+            failed.add(sequence_number)
+            continue
+        
+        # Checkpoint-only writes do not change what subscribers see
+        if new_image.get('status') == old_image.get('status') and new_image.get('message') == old_image.get('message'):
+            continue
+        if not new_image.get('service_id'):
+            continue
+        
+        update = {'type': 'deployment_status'}
+        update.update({field: new_image[field] for field in STATUS_FIELDS if field in new_image})
+        updates_by_service.setdefault(str(new_image['service_id']), []).append((sequence_number, update))
+    
+    table = dynamodb.Table(CONNECTIONS_TABLE)
+    deliveries = 0
+    gone = set()
+    for service_id, updates in updates_by_service.items():
+        try:
+            connection_ids = get_service_connections(table, service_id)
+        except Exception as e:
+            logger.error(f"Subscriber lookup failed for service {service_id}: {str(e)}")
+            failed.update(sequence_number for sequence_number, _ in updates)
+            continue
+        for sequence_number, update in updates:
+            try:
+                outcomes = broadcast(update, [cid for cid in connection_ids if cid not in gone])
+            except Exception as e:
+                logger.error(f"Status fan-out failed for service {service_id}: {str(e)}")
+                failed.add(sequence_number)
+                continue
+            gone.update(cid for cid, outcome in outcomes.items() if outcome == 'gone')
+            if any(outcome == 'throttled' for outcome in outcomes.values()):
+                failed.add(sequence_number)
+            deliveries += len(outcomes)
+    
     try:
-        apigateway.post_to_connection(
-            ConnectionId=connection_id,
-            Data=json.dumps(message)
-        )
+        prune_connections(table, gone)
     except Exception as e:
-        logger.error(f"Error sending message: {str(e)}")
-        raise e
\ No newline at end of file
+        # Stale rows are pruned again by the next fan-out that reaches them
+        logger.warning(f"Failed to prune connections: {str(e)}")
+    logger.info(f"Status fan-out: {deliveries} deliveries to {len(updates_by_service)} services, "
+                f"pruned {len(gone)}, {len(failed)} failed records")
+    failed = sorted((sequence_number for sequence_number in failed if sequence_number), key=int)
+    return {'batchItemFailures': [{'itemIdentifier': sequence_number} for sequence_number in failed]}
+
+def deserialize_image(image):
+    """Convert a stream image from DynamoDB JSON to plain values"""
+    return {key: _deserializer.deserialize(value) for key, value in (image or {}).items()}
+
+def get_service_connections(table, service_id):
+    """Connection ids subscribed to a service, via the service_id index"""
+    return [item['connection_id'] for item in get_service_subscriptions(table, service_id, projection='connection_id')]
+
+def get_service_subscriptions(table, service_id, projection=None):
+    """Subscription items for a service, via the service_id index"""
+    items = []
+    query_kwargs = {
+        'IndexName': CONNECTIONS_SERVICE_INDEX,
+        'KeyConditionExpression': Key('service_id').eq(service_id)
+    }
+    if projection:
+        query_kwargs['ProjectionExpression'] = projection
+    while True:
+        response = table.query(**query_kwargs)
+        items.extend(response.get('Items', []))
+        if not response.get('LastEvaluatedKey'):
+            return items
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def prune_connections(table, connection_ids):
+    """Delete stale connections in one batch"""
+    if not connection_ids:
+        return
+    with table.batch_writer() as batch:
+        for connection_id in connection_ids:
+            batch.delete_item(Key={'connection_id': connection_id})
+
+def get_client(service):
+    """Cached boto3 client per service (reused across warm invocations)"""
+    if service not in _clients:
+        _clients[service] = boto3.client(service)
+    return _clients[service]
+
+def tail_logs(connection_id):
+    """Client-requested tail: push build log lines written since this connection's cursor"""
+    table = dynamodb.Table(CONNECTIONS_TABLE)
+    connection = table.get_item(Key={'connection_id': connection_id}).get('Item')
+    if not connection:
+        return {'statusCode': 404, 'body': 'Not subscribed'}
+    tail_connection_logs(table, connection, {})
+    return {'statusCode': 200}
+
+def handle_log_tail_tick(context):
+    """
+    Scheduled tick: tail all subscriptions every few seconds until the invocation is nearly over.
+    Subscribed services are listed once per invocation; each pass re-queries their subscriptions
+    on the service index, each pipeline's latest build is resolved once per invocation, and each
+    build's log stream is read once per pass for all of its viewers.
+    """
+    table = dynamodb.Table(CONNECTIONS_TABLE)
+    service_ids = list_subscribed_services(table)
+    builds = {}  # latest build per pipeline; a build started later is picked up by the next tick
+    passes = 0
+    frames = 0
+    
+    while service_ids:
+        connections = [
+            connection for service_id in service_ids
+            for connection in get_service_subscriptions(table, service_id)
+        ]
+        if not connections:
+            break
+        
+        try:
+            frames += tail_build_logs(table, connections, builds)
+        except Exception as e:
+            logger.warning(f"Log tail pass failed: {str(e)}")
+        passes += 1
+        
+        remaining_ms = context.get_remaining_time_in_millis() if context else 0
+        if remaining_ms < LOG_TAIL_TICK_RESERVE_MS + LOG_TAIL_POLL_INTERVAL_SECONDS * 1000:
+            break
+        time.sleep(LOG_TAIL_POLL_INTERVAL_SECONDS)
+    
+    logger.info(f"Log tail tick: {passes} passes, {frames} frames")
+    return {'passes': passes, 'frames': frames}
+
+def list_subscribed_services(table):
+    """Distinct subscribed service ids; the service index is sparse, so this reads subscriptions only"""
+    service_ids = set()
+    scan_kwargs = {'IndexName': CONNECTIONS_SERVICE_INDEX, 'ProjectionExpression': 'service_id'}
+    while True:
+        response = table.scan(**scan_kwargs)
+        service_ids.update(item['service_id'] for item in response.get('Items', []))
+        if not response.get('LastEvaluatedKey'):
+            return sorted(service_ids)
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def tail_connection_logs(table, connection, builds):
+    """Read new log events for one connection's latest build, push them as frames and save the cursor"""
+    return tail_build_logs(table, [connection], builds)
+
+def tail_build_logs(table, connections, builds):
+    """
+    Tail logs for many connections with one read per build: viewers of the same build at the
+    same cursor share a single get_log_events pass, and its frames are broadcast to all of them.
+    Connections that miss a frame keep their cursor so the lines are retried on the next pass.
+    """
+    groups = {}
+    for connection in connections:
+        pipeline_name = f"user-{connection['user_id']}-project-{connection['project_id']}-service-{connection['service_id']}-pipeline"
+        if pipeline_name not in builds:
+            builds[pipeline_name] = get_latest_build(pipeline_name)
+        build = builds[pipeline_name]
+        if not build or not build.get('log_group') or not build.get('log_stream'):
+            continue
+        cursor = connection.get('log_cursor') or {}
+        next_token = cursor.get('next_token') if cursor.get('build_id') == build['build_id'] else None
+        groups.setdefault((pipeline_name, next_token), []).append(connection)
+    
+    frames = 0
+    gone = []
+    for (pipeline_name, start_token), viewers in groups.items():
+        build = builds[pipeline_name]
+        lines, next_token = read_log_events(build['log_group'], build['log_stream'], start_token)
+        
+        pending = {connection['connection_id']: connection for connection in viewers}
+        for frame_lines in coalesce_lines(lines):
+            frame = {
+                'type': 'build_logs',
+                'service_id': viewers[0]['service_id'],
+                'build_id': build['build_id'],
+                'build_status': build.get('build_status'),
+                'lines': frame_lines
+            }
+            for connection_id, outcome in broadcast(frame, list(pending)).items():
+                if outcome == 'gone':
+                    gone.append(connection_id)
+                if outcome != 'sent':
+                    del pending[connection_id]
+            if not pending:
+                break
+            frames += 1
+        
+        if not next_token or next_token == start_token:
+            continue
+        new_cursor = {'build_id': build['build_id'], 'next_token': next_token}
+        for connection_id, connection in pending.items():
+            table.update_item(
+                Key={'connection_id': connection_id},
+                UpdateExpression='SET log_cursor = :cursor',
+                ExpressionAttributeValues={':cursor': new_cursor}
+            )
+            connection['log_cursor'] = new_cursor
+    
+    prune_connections(table, gone)
+    return frames
+
+def get_latest_build(pipeline_name):
+    """Latest CodeBuild build (id, log group/stream, status) of the pipeline's latest execution"""
+    try:
+        codepipeline = get_client('codepipeline')
+        executions = codepipeline.list_pipeline_executions(pipelineName=pipeline_name, maxResults=1)
+        summaries = executions.get('pipelineExecutionSummaries', [])
+        if not summaries:
+            return None
+        
+        actions = codepipeline.list_action_executions(
+            pipelineName=pipeline_name,
+            filter={'pipelineExecutionId': summaries[0]['pipelineExecutionId']}
+        ).get('actionExecutionDetails', [])
+        build_actions = [
+            action for action in actions
+            if action.get('input', {}).get('actionTypeId', {}).get('provider') == 'CodeBuild'
+            and action.get('output', {}).get('executionResult', {}).get('externalExecutionId')
+        ]
+        if not build_actions:
+            return None
+        latest = max(build_actions, key=lambda action: action.get('lastUpdateTime') or action.get('startTime'))
+        build_id = latest['output']['executionResult']['externalExecutionId']
+        
+        builds = get_client('codebuild').batch_get_builds(ids=[build_id]).get('builds', [])
+        if not builds:
+            return None
+        logs = builds[0].get('logs', {})
+        return {
+            'build_id': build_id,
+            'build_status': builds[0].get('buildStatus'),
+            'log_group': logs.get('groupName'),
+            'log_stream': logs.get('streamName')
+        }
+    except Exception as e:
+        logger.error(f"Error resolving build for {pipeline_name}: {str(e)}")
+        return None
+
+def read_log_events(log_group, log_stream, next_token=None):
+    """New log lines after next_token (from the start of the stream without one), plus the next cursor"""
+    logs_client = get_client('logs')
+    lines = []
+    while len(lines) < LOG_TAIL_MAX_EVENTS_PER_PASS:
+        kwargs = {'logGroupName': log_group, 'logStreamName': log_stream, 'startFromHead': True}
+        if next_token:
+            kwargs['nextToken'] = next_token
+        try:
+            response = logs_client.get_log_events(**kwargs)
+        except logs_client.exceptions.ResourceNotFoundException:
+            # CodeBuild creates the stream once the build starts writing
+            break
+        lines.extend(event['message'].rstrip('\n') for event in response.get('events', []))
+        
+        # The forward token stops changing once the end of the stream is reached
+        if response.get('nextForwardToken') == next_token or not response.get('events'):
+            next_token = response.get('nextForwardToken', next_token)
+            break
+        next_token = response['nextForwardToken']
+    return lines, next_token
+
+def coalesce_lines(lines, max_bytes=LOG_FRAME_MAX_BYTES):
+    """Group lines into frames whose encoded size stays under max_bytes"""
+    budget = max_bytes - 512  # room for the frame envelope
+    frame, size = [], 0
+    for line in lines:
+        encoded_size = len(json.dumps(line)) + 2
+        if encoded_size > budget:
+            # Worst case every character is escaped to \uXXXX (6 bytes)
+            line = line[:budget // 6] + ' ...[truncated]'
+            encoded_size = len(json.dumps(line)) + 2
+        if frame and size + encoded_size > budget:
+            yield frame
+            frame, size = [], 0
+        frame.append(line)
+        size += encoded_size
+    if frame:
+        yield frame
@@ -6,4 +6,6 @@ locals {
   }
   
   name_prefix = "${var.project_name}-${var.environment}"
+  
+  websocket_endpoint_parameter = "/haifu/websocket/endpoint"
 }
\ No newline at end of file
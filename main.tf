@@ -296,14 +296,64 @@ module "dynamodb" {
   
   tables = [
     {
-      name         = "deployment-status"
-      hash_key     = "deployment_id"
-      range_key    = ""
-      billing_mode = "PAY_PER_REQUEST"
+      name             = "deployment-status"
+      hash_key         = "deployment_id"
+      range_key        = ""
+      billing_mode     = "PAY_PER_REQUEST"
+      stream_view_type = "NEW_AND_OLD_IMAGES"
       attributes = [
         {
           name = "deployment_id"
           type = "S"
+        },
+        {
+          name = "service_id"
+          type = "S"
+        },
+        {
+          name = "timestamp"
+          type = "S"
+        }
+      ]
+      global_secondary_indexes = [
+        {
+          name            = "service-index"
+          hash_key        = "service_id"
+          range_key       = "timestamp"
+          projection_type = "ALL"
+        }
+      ]
+    },
+    {
+      name          = "deployment-events"
+      hash_key      = "deployment_id"
+      range_key     = "event_key"
+      billing_mode  = "PAY_PER_REQUEST"
+      ttl_attribute = "expires_at"
+      attributes = [
+        {
+          name = "deployment_id"
+          type = "S"
+        },
+        {
+          name = "event_key"
+          type = "S"
+        }
+      ]
+    },
+    {
+      name         = "copy-manifests"
+      hash_key     = "dest_bucket"
+      range_key    = "dest_key"
+      billing_mode = "PAY_PER_REQUEST"
+      attributes = [
+        {
+          name = "dest_bucket"
+          type = "S"
+        },
+        {
+          name = "dest_key"
+          type = "S"
         }
       ]
     },
@@ -378,6 +428,67 @@ module "dynamodb" {
           projection_type = "ALL"
         }
       ]
+    },
+    {
+      name         = "cloudfront-distributions"
+      hash_key     = "origin_key"
+      range_key    = ""
+      billing_mode = "PAY_PER_REQUEST"
+      attributes = [
+        {
+          name = "origin_key"
+          type = "S"
+        },
+        {
+          name = "tracking_state"
+          type = "S"
+        }
+      ]
+      global_secondary_indexes = [
+        {
+          name            = "pending-index"
+          hash_key        = "tracking_state"
+          range_key       = null
+          projection_type = "ALL"
+        }
+      ]
+    },
+    {
+      name         = "websocket-connections"
+      hash_key     = "connection_id"
+      range_key    = ""
+      billing_mode = "PAY_PER_REQUEST"
+      attributes = [
+        {
+          name = "connection_id"
+          type = "S"
+        },
+        {
+          name = "service_id"
+          type = "S"
+        }
+      ]
+      global_secondary_indexes = [
+        {
+          name            = "service-index"
+          hash_key        = "service_id"
+          range_key       = null
+          projection_type = "ALL"
+        }
+      ]
+    },
+    {
+      name          = "analysis-cache"
+      hash_key      = "cache_key"
+      range_key     = ""
+      billing_mode  = "PAY_PER_REQUEST"
+      ttl_attribute = "expires_at"
+      attributes = [
+        {
+          name = "cache_key"
+          type = "S"
+        }
+      ]
     }
   ]
   
@@ -399,16 +510,25 @@ module "lambda" {
       memory_size                   = 512
       reserved_concurrent_executions = 0
       vpc_config                    = false
+      # Streaming endpoint comes from configuration only, never from the request.
+      # WEBSOCKET_API_ENDPOINT would need module.websocket_api (a cycle), so point at the SSM parameter instead.
+      environment_variables = {
+        WEBSOCKET_ENDPOINT_PARAMETER = local.websocket_endpoint_parameter
+      }
     },
     {
       name                           = "deployment"
-      filename                      = "lambda-functions/deployment_lambda_debug.zip"
-      handler                       = "deployment_lambda.handler"
+      filename                      = "lambda-functions/deployment_lambda_complete.zip"
+      handler                       = "deployment_lambda_complete.handler"
       runtime                       = "python3.11"
       timeout                       = 900
       memory_size                   = 1024
       reserved_concurrent_executions = 0
       vpc_config                    = false
+      environment_variables = {
+        DEPLOYMENT_QUEUE_URL    = module.deployment_queue.queue_url
+        DEPLOYMENT_MAX_ATTEMPTS = "3"
+      }
     },
     {
       name                           = "websocket"
@@ -428,6 +548,59 @@ module "lambda" {
   tags = local.common_tags
 }
 
+# Deployment job queue: /deploy enqueues, the deployment Lambda consumes
+module "deployment_queue" {
+  source = "./modules/sqs"
+  
+  name_prefix                = local.name_prefix
+  queue_name                 = "deployment-jobs"
+  visibility_timeout_seconds = 5400  # 6x deployment Lambda timeout
+  enable_dlq                 = true
+  max_receive_count          = 3
+  
+  tags = local.common_tags
+}
+
+resource "aws_lambda_event_source_mapping" "deployment_jobs" {
+  event_source_arn        = module.deployment_queue.queue_arn
+  function_name           = module.lambda.lambda_function_arns["deployment"]
+  batch_size              = 1
+  function_response_types = ["ReportBatchItemFailures"]
+}
+
+# Status changes on deployment-status are pushed to WebSocket subscribers
+resource "aws_lambda_event_source_mapping" "deployment_status_stream" {
+  event_source_arn                   = module.dynamodb.table_stream_arns["deployment-status"]
+  function_name                      = module.lambda.lambda_function_arns["websocket"]
+  starting_position                  = "LATEST"
+  batch_size                         = 100
+  maximum_batching_window_in_seconds = 1
+  function_response_types            = ["ReportBatchItemFailures"]
+}
+
+# Build log tailing for WebSocket subscribers (the tick keeps polling within one invocation)
+resource "aws_cloudwatch_event_rule" "log_tail_tick" {
+  name                = "${local.name_prefix}-log-tail-tick"
+  description         = "Tail CodeBuild logs for subscribed WebSocket connections"
+  schedule_expression = "rate(1 minute)"
+  
+  tags = local.common_tags
+}
+
+resource "aws_cloudwatch_event_target" "log_tail_tick" {
+  rule      = aws_cloudwatch_event_rule.log_tail_tick.name
+  target_id = "WebSocketLogTail"
+  arn       = module.lambda.lambda_function_arns["websocket"]
+}
+
+resource "aws_lambda_permission" "allow_log_tail_tick" {
+  statement_id  = "AllowExecutionFromLogTailTick"
+  action        = "lambda:InvokeFunction"
+  function_name = module.lambda.lambda_function_names["websocket"]
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.log_tail_tick.arn
+}
+
 module "websocket_api" {
   source = "./modules/api-gateway-websocket"
   
@@ -438,6 +611,16 @@ module "websocket_api" {
   tags = local.common_tags
 }
 
+# WebSocket management endpoint for Lambdas that push to connections.
+# Read from SSM at runtime: an environment variable would make the lambda module depend on websocket_api.
+resource "aws_ssm_parameter" "websocket_endpoint" {
+  name  = local.websocket_endpoint_parameter
+  type  = "String"
+  value = replace(module.websocket_api.websocket_stage_url, "wss://", "https://")
+  
+  tags = local.common_tags
+}
+
 # Agent HTTP API
 module "agent_http_api" {
   source = "./modules/api-gateway-http"
@@ -450,7 +633,9 @@ module "agent_http_api" {
     { route_key = "POST /main" },
     { route_key = "POST /chat" },
     { route_key = "POST /deployment" },
-    { route_key = "POST /cost" }
+    { route_key = "POST /deployment_batch" },
+    { route_key = "POST /cost" },
+    { route_key = "POST /cost_batch" }
   ]
   
   cors_allow_origins = ["*"]
@@ -20,6 +20,9 @@ variable "routes" {
   }))
   default = [
     { route_key = "deploy_status" },
+    { route_key = "subscribe_logs" },
+    { route_key = "unsubscribe_logs" },
+    { route_key = "tail_logs" },
     { route_key = "$connect" },
     { route_key = "$disconnect" }
   ]
@@ -6,6 +6,9 @@ resource "aws_dynamodb_table" "tables" {
   hash_key     = var.tables[count.index].hash_key
   range_key    = var.tables[count.index].range_key != "" ? var.tables[count.index].range_key : null
   
+  stream_enabled   = var.tables[count.index].stream_view_type != null
+  stream_view_type = var.tables[count.index].stream_view_type
+  
   dynamic "attribute" {
     for_each = var.tables[count.index].attributes
     content {
@@ -24,6 +27,14 @@ resource "aws_dynamodb_table" "tables" {
     }
   }
   
+  dynamic "ttl" {
+    for_each = var.tables[count.index].ttl_attribute != null ? [1] : []
+    content {
+      attribute_name = var.tables[count.index].ttl_attribute
+      enabled        = true
+    }
+  }
+  
   tags = merge(var.tags, {
     Name = var.name_prefix != null && var.name_prefix != "" ? "${var.name_prefix}-${var.tables[count.index].name}" : var.tables[count.index].name
   })
@@ -6,4 +6,9 @@ output "table_names" {
 output "table_arns" {
   description = "DynamoDB table ARNs"
   value       = { for i, table in var.tables : table.name => aws_dynamodb_table.tables[i].arn }
-}
\ No newline at end of file
+}
+
+output "table_stream_arns" {
+  description = "DynamoDB stream ARNs (null for tables without streams)"
+  value       = { for i, table in var.tables : table.name => aws_dynamodb_table.tables[i].stream_arn }
+}
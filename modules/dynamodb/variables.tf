@@ -21,6 +21,8 @@ variable "tables" {
       range_key       = optional(string)
       projection_type = string
     })), [])
+    ttl_attribute = optional(string)
+    stream_view_type = optional(string)
   }))
   default = []
 }
@@ -69,6 +69,8 @@ resource "aws_iam_role_policy" "lambda_deployment_policy" {
           "ecs:*",
           "ecr:*",
           "codebuild:*",
+          "codepipeline:ListPipelineExecutions",
+          "codepipeline:ListActionExecutions",
           "logs:*",
           "application-autoscaling:*",
           "sts:GetCallerIdentity",
@@ -140,6 +142,13 @@ resource "aws_lambda_function" "functions" {
     }
   }
   
+  dynamic "environment" {
+    for_each = length(var.lambdas[count.index].environment_variables) > 0 ? [1] : []
+    content {
+      variables = var.lambdas[count.index].environment_variables
+    }
+  }
+  
   tags = var.tags
 }
 
@@ -215,4 +224,33 @@ resource "aws_lambda_permission" "allow_eventbridge" {
   function_name = aws_lambda_function.functions[index([for l in var.lambdas : l.name], "deployment")].function_name
   principal     = "events.amazonaws.com"
   source_arn    = aws_cloudwatch_event_rule.deployment_event[0].arn
-}
\ No newline at end of file
+}
+
+# Scheduled CloudFront readiness tracker (deployment lambda)
+resource "aws_cloudwatch_event_rule" "cloudfront_tracker" {
+  count = var.enable_eventbridge && length([for l in var.lambdas : l if l.name == "deployment"]) > 0 ? 1 : 0
+  
+  name                = "${var.name_prefix}-cloudfront-tracker"
+  description         = "Check pending CloudFront distributions for static deployments"
+  schedule_expression = var.cloudfront_tracker_schedule
+  
+  tags = var.tags
+}
+
+resource "aws_cloudwatch_event_target" "cloudfront_tracker" {
+  count = var.enable_eventbridge && length([for l in var.lambdas : l if l.name == "deployment"]) > 0 ? 1 : 0
+  
+  rule      = aws_cloudwatch_event_rule.cloudfront_tracker[0].name
+  target_id = "CloudFrontTracker"
+  arn       = aws_lambda_function.functions[index([for l in var.lambdas : l.name], "deployment")].arn
+}
+
+resource "aws_lambda_permission" "allow_cloudfront_tracker" {
+  count = var.enable_eventbridge && length([for l in var.lambdas : l if l.name == "deployment"]) > 0 ? 1 : 0
+  
+  statement_id  = "AllowExecutionFromCloudFrontTracker"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.functions[index([for l in var.lambdas : l.name], "deployment")].function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.cloudfront_tracker[0].arn
+}
@@ -14,6 +14,7 @@ variable "lambdas" {
     memory_size                   = number
     reserved_concurrent_executions = number
     vpc_config                    = bool
+    environment_variables         = optional(map(string), {})
   }))
   default = []
 }
@@ -42,6 +43,12 @@ variable "enable_eventbridge" {
   default     = false
 }
 
+variable "cloudfront_tracker_schedule" {
+  description = "Schedule expression for the CloudFront readiness tracker"
+  type        = string
+  default     = "rate(1 minute)"
+}
+
 variable "tags" {
   description = "Tags to apply to resources"
   type        = map(string)
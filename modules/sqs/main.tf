@@ -6,13 +6,10 @@ resource "aws_sqs_queue" "main" {
   receive_wait_time_seconds = var.receive_wait_time_seconds
   visibility_timeout_seconds = var.visibility_timeout_seconds
 
-  dynamic "redrive_policy" {
-    for_each = var.enable_dlq ? [1] : []
-    content {
-      deadLetterTargetArn = aws_sqs_queue.dlq[0].arn
-      maxReceiveCount     = var.max_receive_count
-    }
-  }
+  redrive_policy = var.enable_dlq ? jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.dlq[0].arn
+    maxReceiveCount     = var.max_receive_count
+  }) : null
 
   tags = var.tags
 }
@@ -76,7 +76,9 @@ output "agent_api_routes" {
     main       = "${module.agent_http_api.invoke_url}/main"
     chat       = "${module.agent_http_api.invoke_url}/chat"
     deployment = "${module.agent_http_api.invoke_url}/deployment"
+    deployment_batch = "${module.agent_http_api.invoke_url}/deployment_batch"
     cost       = "${module.agent_http_api.invoke_url}/cost"
+    cost_batch = "${module.agent_http_api.invoke_url}/cost_batch"
   }
 }
 